@@ -1,11 +1,15 @@
 import streamlit as st
 import time
 import os
-import plotly.graph_objects as go
 from dotenv import load_dotenv
-from src.agents.investigator import OsintInvestigatorAgent
-from src.agents.auditor import PolicyAuditorAgent
-from src.utils.risk_engine import calculate_trust_score
+from src.pipeline.service import CasePipeline, CaseService, CaseServiceClient, Overloaded, cacheable_case, case_key
+from src.utils.audit_schema import render_audit_markdown
+from src.utils.cache import ResponseCache
+from src.utils.case_store import CaseStore
+from src.utils.entity_index import EntityIndex
+from src.utils.review_similarity import ReviewSimilarityIndex, analyze_review_similarity
+from src.utils.review_velocity import analyze_review_velocity
+from src.utils.spatial_index import SpatialIndex
 
 # Load Environment Variables
 load_dotenv()
@@ -50,6 +54,8 @@ gemini_key_env = os.getenv("GEMINI_API_KEY", "")
 maps_key = st.sidebar.text_input("Google Maps API Key", value=maps_key_env, type="password")
 serp_key = st.sidebar.text_input("SerpApi Key", value=serp_key_env, type="password")
 gemini_key = st.sidebar.text_input("Gemini API Key", value=gemini_key_env, type="password")
+skip_conclusive = st.sidebar.checkbox("Skip Gemini when heuristics are conclusive", value=False,
+                                      help="Only listings in the uncertain heuristic band get the full LLM audit.")
 
 st.sidebar.markdown("---")
 st.sidebar.caption("v2.0.0 | Google Trust & Safety")
@@ -61,14 +67,24 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
-st.markdown("""
+status_banner = st.empty() # Filled once we know the current case's measured latency
+
+def render_status_banner(case=None):
+    """System status strip. LATENCY is the measured per-stage time of the current case."""
+    latency = "—"
+    if case and case.get('stage_ms'):
+        stages = " · ".join(f"{stage} {ms:.0f}ms" for stage, ms in case['stage_ms'].items())
+        latency = f"{case['wall_ms']:.0f}ms ({stages})"
+    status_banner.markdown(f"""
 <div style="background-color: #e8f0fe; padding: 12px 20px; border-radius: 8px; border-left: 5px solid #1a73e8; margin-bottom: 25px; font-family: 'Roboto', sans-serif;">
     <span style="font-weight: 500; color: #1a73e8;">SYSTEM STATUS:</span> 🟢 <b>Online</b> &nbsp;&nbsp;|&nbsp;&nbsp; 
     <span style="font-weight: 500; color: #1a73e8;">MODE:</span> <b>Enterprise Live Feed</b> &nbsp;&nbsp;|&nbsp;&nbsp; 
-    <span style="font-weight: 500; color: #1a73e8;">LATENCY:</span> 23ms
+    <span style="font-weight: 500; color: #1a73e8;">LATENCY:</span> {latency}
 </div>
 """, unsafe_allow_html=True)
 
+render_status_banner()
+
 # ---------------- INPUT SECTION ---------------- #
 with st.form(key='investigation_form'):
     col_search, col_btn = st.columns([4, 1])
@@ -81,106 +97,298 @@ with st.form(key='investigation_form'):
         # Form submit button
         start_btn = st.form_submit_button("🚀 Run Investigation", use_container_width=True)
 
+# ---------------- CACHES ---------------- #
+# Shared by every analyst session on this server: API responses and finished cases
+CASE_TTL = 3600
+SESSION_CASE_LIMIT = 20
+
+@st.cache_resource
+def get_case_store():
+    # Every finished case is kept for history/analytics; skipped if pyarrow isn't installed
+    try:
+        return CaseStore(os.getenv("SENTINEL_CASE_STORE", ".cache/cases"), flush_every=1)
+    except ImportError as e:
+        print(f"Case Store disabled: {e}")
+        return None
+
+@st.cache_resource
+def get_case_service():
+    # With SENTINEL_SERVICE_URL the console is a thin client of `python -m src.pipeline.service`.
+    # Otherwise the same single-flight service runs in-process, shared by every session.
+    url = os.getenv("SENTINEL_SERVICE_URL")
+    if url:
+        return CaseServiceClient(url)
+    cache = ResponseCache(path=os.getenv("SENTINEL_CACHE_PATH", ".cache/responses.sqlite"), ttls={"case": CASE_TTL})
+    pipeline = CasePipeline(
+        cache=cache,
+        entity_index=EntityIndex(os.getenv("SENTINEL_ENTITY_INDEX", ".cache/entities.sqlite")),
+        review_index=ReviewSimilarityIndex(os.getenv("SENTINEL_REVIEW_INDEX", ".cache/reviews.sqlite")),
+        spatial_index=SpatialIndex(os.getenv("SENTINEL_SPATIAL_INDEX", ".cache/places.sqlite")),
+    )
+    return CaseService(pipeline, cache=cache, case_store=get_case_store())
+
+case_service = get_case_service()
+
+if "cases" not in st.session_state:
+    st.session_state.cases = {}
+
+def remember_case(key, case):
+    st.session_state.cases[key] = case
+    st.session_state.current_case = key
+    while len(st.session_state.cases) > SESSION_CASE_LIMIT:
+        st.session_state.cases.pop(next(iter(st.session_state.cases)))
+
+# ---------------- LAZY FIGURES ---------------- #
+# Plotly/pandas are only imported (and figures only built) when a view needs them
+@st.cache_data(show_spinner=False)
+def build_gauge(trust_score):
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Indicator(
+        mode = "gauge+number",
+        value = trust_score,
+        domain = {'x': [0, 1], 'y': [0, 1]},
+        title = {'text': "Trust Score"},
+        gauge = {
+            'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': "darkblue"},
+            'bar': {'color': "#1a73e8"},
+            'bgcolor': "white",
+            'borderwidth': 2,
+            'bordercolor': "gray",
+            'steps': [
+                {'range': [0, 40], 'color': '#ff4b4b'}, # Red
+                {'range': [40, 70], 'color': '#ffa726'}, # Orange
+                {'range': [70, 100], 'color': '#00c853'} # Green
+            ],
+            'threshold': {
+                'line': {'color': "black", 'width': 4},
+                'thickness': 0.75,
+                'value': trust_score
+            }
+        }
+    ))
+    fig.update_layout(height=250, margin=dict(l=20, r=20, t=30, b=20))
+    return fig
+
+@st.cache_data(show_spinner=False)
+def build_velocity_timeline(key, reviews):
+    """`key` identifies the case so the hash of `reviews` is rarely the deciding factor."""
+    import pandas as pd
+    import plotly.graph_objects as go
+    df_reviews = pd.DataFrame(reviews)
+    if 'time' not in df_reviews.columns:
+        return None
+    df_reviews['datetime'] = pd.to_datetime(df_reviews['time'], unit='s')
+    df_reviews = df_reviews.sort_values('datetime')
+    
+    # Plot 1: Review Velocity (Timeline)
+    fig_timeline = go.Figure()
+    fig_timeline.add_trace(go.Scatter(
+        x=df_reviews['datetime'], 
+        y=df_reviews['rating'],
+        mode='markers+lines',
+        marker=dict(size=10, color=df_reviews['rating'], colorscale='Viridis'),
+        name='Review'
+    ))
+    fig_timeline.update_layout(
+        title="Review Velocity Timeline (Burst Detection)",
+        xaxis_title="Date",
+        yaxis_title="Star Rating",
+        height=300
+    )
+    return fig_timeline
+
+# ---------------- VIEWS ---------------- #
+def render_case_card(place_data):
+    st.markdown(f"### {place_data.get('name', 'Unknown')}")
+    st.markdown(f"📍 **Address**: {place_data.get('address', 'N/A')}")
+    st.markdown(f"📞 **Phone**: {place_data.get('phone', 'N/A')}")
+    website = place_data.get('website', 'N/A')
+    st.markdown(f"🌐 **Website**: [{website}]({website})")
+    
+    # Display Rating Star
+    rating = place_data.get('rating', 0)
+    reviews = len(place_data.get('reviews', []))
+    st.metric("Maps Rating", f"{rating} / 5.0", delta=f"{reviews} Reviews found")
+
+def render_review_integrity(key, place_data, review_links=None):
+    st.subheader("Suspicious Pattern Detection")
+    reviews = place_data.get('reviews', [])
+    if reviews and len(reviews) > 0:
+        fig_timeline = build_velocity_timeline(key, reviews)
+        if fig_timeline is not None:
+            st.plotly_chart(fig_timeline, use_container_width=True)
+            
+            # Burst Warning (same analysis the risk engine scores on)
+            velocity = analyze_review_velocity(reviews)
+            if velocity['burst']:
+                burst_day = time.strftime("%Y-%m-%d", time.gmtime(velocity['burst_start']))
+                st.error(f"🚨 CRITICAL: High Velocity Detected. {velocity['max_in_window']['24h']} Reviews in < 24 Hours (from {burst_day}). Typical of `Review Buying`.")
+
+            v_1h, v_24h, v_7d = st.columns(3)
+            v_1h.metric("Peak Reviews / 1h", velocity['max_in_window']['1h'])
+            v_24h.metric("Peak Reviews / 24h", velocity['max_in_window']['24h'])
+            v_7d.metric("Peak Reviews / 7d", velocity['max_in_window']['7d'])
+        else:
+            st.info("No timestamp data available for velocity analysis.")
+            
+        # Template Warning (copy-paste text here or on other listings)
+        similar = review_links or analyze_review_similarity(reviews)
+        if similar['duplicate_reviews'] >= 2 or similar['cross_listing_reviews']:
+            st.warning(
+                f"📋 Template Reviews: {similar['duplicate_reviews']} near-duplicates in this listing, "
+                f"{similar['cross_listing_reviews']} reused on {similar['linked_listings']} other listing(s)."
+            )
+            for example in similar['examples']:
+                st.caption(f"“{example}…”")
+
+        # Display Review Text with detection
+        st.markdown("#### recent_reviews_sample")
+        for r in reviews[:3]:
+            st.markdown(f"> *\"{r.get('text')}\"* - **{r.get('rating')} Stars**")
+    else:
+        st.info("No reviews found for this business.")
+
+def render_osint_footprint(osint_data):
+    if osint_data:
+        osint_cols = st.columns(3)
+        # Handle cases where we have fewer results than columns
+        count = min(len(osint_data), 6)
+        for i in range(count):
+            result = osint_data[i]
+            col_idx = i % 3
+            with osint_cols[col_idx]:
+                 st.markdown(f"""
+                <div class="risk-card">
+                    <b>{result.get('title', 'Unknown Source')}</b><br>
+                    <a href="{result.get('link', '#')}" target="_blank" style="color: #1a73e8; text-decoration: none;">View Source</a><br>
+                    <small style="color: #5f6368;">{result.get('snippet', '')[:120]}...</small>
+                </div>
+                """, unsafe_allow_html=True)
+    else:
+        st.warning("No external OSINT signals found.")
+
 # ---------------- EXECUTION LOGIC ---------------- #
-if start_btn and query:
-    # Initialize Agents with provided keys
-    investigator = OsintInvestigatorAgent(maps_key, serp_key)
-    auditor = PolicyAuditorAgent(gemini_key)
+def run_pipeline(query, col_left, col_right):
+    """
+    Runs the case on the investigation service, streaming its events into the two
+    columns. Returns (case, cached); stops the script on not-found/quota/overload.
+    """
+    try:
+        events = case_service.stream(query, skip_conclusive=skip_conclusive, keys=(maps_key, serp_key, gemini_key))
+    except Overloaded as e:
+        st.error(f"The investigation service is at capacity. Please retry in {e.retry_after}s.")
+        st.stop()
 
+    status, case_card, audit_status, reasoning, streamed = None, None, None, None, ""
+    for event in events:
+        if event['type'] == "case":
+            if audit_status:
+                reasoning.empty()
+                audit_status.update(label="Audit Complete", state="complete", expanded=False)
+            return event['case'], event.get('cached', False)
+
+        if event['type'] == "error":
+            current = audit_status or status
+            if current:
+                deferred = ("Audit Deferred" if audit_status else "Investigation Deferred") if event['error'] == "quota" else None
+                current.update(label=deferred or "Investigation Failed", state="error")
+            (col_right if audit_status else col_left).error(event['message'])
+            st.stop()
+
+        if status is None:
+            # Step 1: Investigation (rendered event by event as the agent works)
+            with col_left:
+                status = st.status("🕵️ Agent A: Investigating...", expanded=True)
+                case_card = st.empty()
+            status.write("Initializing Maps API connection...")
+
+        if event.get('agent') == "investigator":
+            if event['type'] == "log":
+                status.text(event['message'])
+            elif event['type'] == "place":
+                # Display Basic Info as soon as Maps answers, before OSINT finishes
+                with case_card.container():
+                    render_case_card(event['place_data'])
+            elif event['type'] == "osint":
+                status.update(label=f"🕵️ Agent A: {len(event['osint_data'])} external signals so far...")
+        elif event['type'] == "investigated":
+            status.update(label="Investigation Complete", state="complete", expanded=False)
+            case_card.empty() # Redrawn with the final record below
+        elif event['type'] == "audit_skipped":
+            col_right.info("Heuristics were conclusive: Gemini audit skipped.")
+        elif event.get('agent') == "auditor":
+            # Step 2: Audit, showing Gemini's output while it is still being generated
+            if audit_status is None:
+                with col_right:
+                    audit_status = st.status("🤖 Agent B: Auditing Compliance...", expanded=True)
+                audit_status.write("Loading Misrepresentation Policy guidelines...")
+                reasoning = audit_status.empty()
+            if event['type'] == "log":
+                audit_status.text(event['message'])
+            elif event['type'] == "token":
+                streamed += event['text']
+                reasoning.code(streamed, language="json")
+
+    # No "case" or "error" event: the service connection dropped mid-stream
+    if audit_status or status:
+        (audit_status or status).update(label="Investigation Failed", state="error")
+    st.error("Investigation service closed the stream without a result")
+    st.stop()
+
+case = None
+if start_btn and query:
+    key = case_key(query, (maps_key, serp_key, gemini_key), skip_conclusive)
     # Layout: 2 Columns for Live Feed
     col_left, col_right = st.columns([1, 1])
-
     with col_left:
         st.subheader("📂 Case File")
-        
-        # Step 1: Investigation
-        with st.status("🕵️ Agent A: Investigating...", expanded=True) as status:
-            st.write("Initializing Maps API connection...")
-            place_data, osint_data = investigator.investigate(query)
-            
-            for log in investigator.logs:
-                st.text(log)
-                time.sleep(0.1) 
-            
-            if place_data:
-                status.update(label="Investigation Complete", state="complete", expanded=False)
-            else:
-                status.update(label="Investigation Failed", state="error")
-                st.error("Business not found on Google Maps. Please check the query.")
-                st.stop()
-
-        # Display Basic Info
-        with st.container():
-            st.markdown(f"### {place_data.get('name', 'Unknown')}")
-            st.markdown(f"📍 **Address**: {place_data.get('address', 'N/A')}")
-            st.markdown(f"📞 **Phone**: {place_data.get('phone', 'N/A')}")
-            website = place_data.get('website', 'N/A')
-            st.markdown(f"🌐 **Website**: [{website}]({website})")
-            
-            # Display Rating Star
-            rating = place_data.get('rating', 0)
-            reviews = len(place_data.get('reviews', []))
-            st.metric("Maps Rating", f"{rating} / 5.0", delta=f"{reviews} Reviews found")
+    with col_right:
+        st.subheader("⚖️ Policy Audit")
 
+    case, cached = run_pipeline(query, col_left, col_right)
+    if gemini_key and not cacheable_case(case):
+        # A fallback audit or SerpApi error is never pinned in the shared cache for other analysts
+        col_right.caption("Degraded run (fallback audit or search error): not shared, re-run once the APIs recover.")
+    elif cached:
+        col_right.caption("Loaded from the shared case cache.")
+    remember_case(key, case)
+elif st.session_state.get("current_case") in st.session_state.cases:
+    # Rerun (view switch, expander...): redraw from the session, don't re-investigate
+    key = st.session_state.current_case
+    case = st.session_state.cases[key]
+    col_left, col_right = st.columns([1, 1])
+    with col_left:
+        st.subheader("📂 Case File")
     with col_right:
         st.subheader("⚖️ Policy Audit")
-        
-        # Step 2: Audit
-        if place_data:
-            with st.status("🤖 Agent B: Auditing Compliance...", expanded=True) as status:
-                st.write("Loading Misrepresentation Policy guidelines...")
-                
-                # Run Audit
-                audit_report = auditor.audit(place_data, osint_data)
-                
-                for log in auditor.logs:
-                    st.text(log)
-                    time.sleep(0.1)
-                
-                status.update(label="Audit Complete", state="complete", expanded=False)
+        st.caption(f"Showing results for: {case['query']}")
+
+if case:
+    render_status_banner(case)
+    place_data, osint_data, audit = case['place_data'], case['osint_data'], case['audit']
+    trust_score, breakdown = case['trust_score'], case['breakdown']
+
+    with col_left:
+        render_case_card(place_data)
+    with col_right:
+        st.success(f"Verdict: **{audit['verdict']}** → {audit['action']}")
 
     # ---------------- RESULTS SECTION ---------------- #
     st.markdown("---")
     st.subheader("📊 Final Risk Assessment")
 
-    # Calculate Score
-    trust_score, breakdown = calculate_trust_score(place_data, osint_data, audit_report)
-
     # Display Score
     score_col, summary_col = st.columns([1, 2])
     
     with score_col:
         # Plotly Gauge
-        fig = go.Figure(go.Indicator(
-            mode = "gauge+number",
-            value = trust_score,
-            domain = {'x': [0, 1], 'y': [0, 1]},
-            title = {'text': "Trust Score"},
-            gauge = {
-                'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': "darkblue"},
-                'bar': {'color': "#1a73e8"},
-                'bgcolor': "white",
-                'borderwidth': 2,
-                'bordercolor': "gray",
-                'steps': [
-                    {'range': [0, 40], 'color': '#ff4b4b'}, # Red
-                    {'range': [40, 70], 'color': '#ffa726'}, # Orange
-                    {'range': [70, 100], 'color': '#00c853'} # Green
-                ],
-                'threshold': {
-                    'line': {'color': "black", 'width': 4},
-                    'thickness': 0.75,
-                    'value': trust_score
-                }
-            }
-        ))
-        fig.update_layout(height=250, margin=dict(l=20, r=20, t=30, b=20))
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(build_gauge(trust_score), use_container_width=True)
 
     with summary_col:
         st.markdown("### 📋 Executive Summary")
-        st.markdown(f"**Analysis ID**: {int(time.time())}")
-        st.markdown(audit_report)
+        st.markdown(f"**Analysis ID**: {case['analysis_id']}")
+        # The report is only rendered here; everything else works off the typed verdict
+        st.markdown(render_audit_markdown(audit, place_data))
         
         with st.expander("Risk Factor Breakdown", expanded=True):
             if not breakdown:
@@ -188,68 +396,12 @@ if start_btn and query:
             for item in breakdown:
                 st.markdown(f"- ⚠️ {item}")
 
-    # ---------------- DEEP DIVE TABS ---------------- #
+    # ---------------- DEEP DIVE VIEWS ---------------- #
+    # A radio instead of st.tabs: tabs execute every body on each rerun, this only builds the visible one
     st.markdown("---")
-    tab1, tab2 = st.tabs(["🔍 Review Integrity Analysis", "🌐 OSINT Footprint"])
+    view = st.radio("Deep Dive", ["🔍 Review Integrity Analysis", "🌐 OSINT Footprint"], horizontal=True, label_visibility="collapsed", key="deep_dive_view")
     
-    with tab1:
-        st.subheader("Suspicious Pattern Detection")
-        reviews = place_data.get('reviews', [])
-        if reviews and len(reviews) > 0:
-            # Prepare data for plotting
-            import pandas as pd
-            df_reviews = pd.DataFrame(reviews)
-            if 'time' in df_reviews.columns:
-                df_reviews['datetime'] = pd.to_datetime(df_reviews['time'], unit='s')
-                df_reviews = df_reviews.sort_values('datetime')
-                
-                # Plot 1: Review Velocity (Timeline)
-                fig_timeline = go.Figure()
-                fig_timeline.add_trace(go.Scatter(
-                    x=df_reviews['datetime'], 
-                    y=df_reviews['rating'],
-                    mode='markers+lines',
-                    marker=dict(size=10, color=df_reviews['rating'], colorscale='Viridis'),
-                    name='Review'
-                ))
-                fig_timeline.update_layout(
-                    title="Review Velocity Timeline (Burst Detection)",
-                    xaxis_title="Date",
-                    yaxis_title="Star Rating",
-                    height=300
-                )
-                st.plotly_chart(fig_timeline, use_container_width=True)
-                
-                # Burst Warning
-                if len(reviews) >= 3:
-                     timestamps = sorted([r.get('time', 0) for r in reviews], reverse=True)
-                     if (timestamps[0] - timestamps[2]) < 86400:
-                         st.error("🚨 CRITICAL: High Velocity Detected. 3+ Reviews in < 24 Hours. Typical of `Review Buying`.")
-            else:
-                st.info("No timestamp data available for velocity analysis.")
-                
-            # Display Review Text with detection
-            st.markdown("#### recent_reviews_sample")
-            for r in reviews[:3]:
-                st.markdown(f"> *\"{r.get('text')}\"* - **{r.get('rating')} Stars**")
-        else:
-            st.info("No reviews found for this business.")
-
-    with tab2:
-        if osint_data:
-            osint_cols = st.columns(3)
-            # Handle cases where we have fewer results than columns
-            count = min(len(osint_data), 6)
-            for i in range(count):
-                result = osint_data[i]
-                col_idx = i % 3
-                with osint_cols[col_idx]:
-                     st.markdown(f"""
-                    <div class="risk-card">
-                        <b>{result.get('title', 'Unknown Source')}</b><br>
-                        <a href="{result.get('link', '#')}" target="_blank" style="color: #1a73e8; text-decoration: none;">View Source</a><br>
-                        <small style="color: #5f6368;">{result.get('snippet', '')[:120]}...</small>
-                    </div>
-                    """, unsafe_allow_html=True)
-        else:
-            st.warning("No external OSINT signals found.")
+    if view == "🔍 Review Integrity Analysis":
+        render_review_integrity(key, place_data, case.get('review_links'))
+    else:
+        render_osint_footprint(osint_data)
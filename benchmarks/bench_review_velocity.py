@@ -0,0 +1,67 @@
+"""
+Compares the legacy burst check (sort in Python, look at the latest three reviews),
+a pure-Python loop computing the same full-history metrics, and the vectorized
+review_velocity module (end to end, and on pre-extracted arrays).
+
+    python -m benchmarks.bench_review_velocity
+"""
+import random
+import statistics
+import timeit
+from src.utils.review_velocity import analyze_review_velocity, analyze_velocity_arrays, review_arrays, WINDOWS, DAY
+
+
+def legacy_latest_three(reviews):
+    timestamps = sorted([r.get('time', 0) for r in reviews], reverse=True)
+    return len(timestamps) >= 3 and (timestamps[0] - timestamps[2]) < DAY
+
+
+def python_full_history(reviews):
+    """Loop equivalent of analyze_review_velocity: two-pointer window maxima + gap stats."""
+    pairs = sorted((r.get('time') or 0, r.get('rating') or 0) for r in reviews)
+    times = [t for t, _ in pairs]
+    max_in_window = {}
+    for label, window in WINDOWS.items():
+        best, j = 0, 0
+        for i in range(len(times)):
+            while j < len(times) and times[j] < times[i] + window:
+                j += 1
+            best = max(best, j - i)
+        max_in_window[label] = best
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    if gaps:
+        statistics.median(gaps)
+        min(gaps)
+    return max_in_window["24h"] >= 3
+
+
+def make_reviews(n, seed=7):
+    rng = random.Random(seed)
+    start = 1_600_000_000
+    reviews = [{"time": start + rng.randint(0, 3 * 365 * DAY), "rating": rng.randint(1, 5)} for _ in range(n)]
+    # Plant one burst in the middle of the history
+    for i in range(4):
+        reviews.append({"time": start + 400 * DAY + i * 600, "rating": 5})
+    return reviews
+
+
+def per_call_ms(fn, runs):
+    return timeit.timeit(fn, number=runs) / runs * 1e3
+
+
+def main():
+    print(f"{'reviews':>8} {'legacy(latest 3)':>17} {'python loop':>12} {'vectorized':>11} {'arrays only':>12}   burst found (legacy/loop/vec)")
+    for n in (10, 100, 1000, 5000, 20000):
+        reviews = make_reviews(n)
+        times, ratings = review_arrays(reviews)
+        runs = max(5, 20000 // n)
+        t_legacy = per_call_ms(lambda: legacy_latest_three(reviews), runs)
+        t_loop = per_call_ms(lambda: python_full_history(reviews), runs)
+        t_vec = per_call_ms(lambda: analyze_review_velocity(reviews), runs)
+        t_arr = per_call_ms(lambda: analyze_velocity_arrays(times, ratings), runs)
+        found = (legacy_latest_three(reviews), python_full_history(reviews), analyze_review_velocity(reviews)['burst'])
+        print(f"{n:>8} {t_legacy:>15.3f}ms {t_loop:>10.3f}ms {t_vec:>9.3f}ms {t_arr:>10.3f}ms   {found}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Offline stand-ins for Google Maps, SerpApi and Gemini.
+
+They replay mock_data-style payloads through the *real* service code paths
+(googlemaps.Client surface, serpapi.GoogleSearch surface, and a requests.Session
+surface underneath PooledHttpClient), with configurable latency distributions,
+error rates and 429s, so benchmarks see realistic I/O behaviour instead of the
+instant is_demo shortcuts.
+"""
+import copy
+import json
+import random
+import threading
+import time
+import zlib
+from src.utils.mock_data import SCENARIOS
+
+
+class LatencyModel:
+    """Log-normal latency: `median_ms` typical, `sigma` controls the tail. `scale` speeds up whole runs."""
+
+    def __init__(self, median_ms, sigma=0.5, error_rate=0.0, rate_429=0.0, scale=1.0, seed=None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample(self):
+        """Sleeps for one latency draw and returns the outcome: "ok", "error" or "429"."""
+        with self.lock:
+            delay = self.rng.lognormvariate(0, self.sigma) * self.median_ms / 1000.0 * self.scale
+            roll = self.rng.random()
+        time.sleep(delay)
+        if roll < self.rate_429:
+            return "429"
+        if roll < self.rate_429 + self.error_rate:
+            return "error"
+        return "ok"
+
+
+def synthetic_place(place_id):
+    """A mock_data scenario with a unique identity, so caches and indexes behave like real traffic."""
+    n = int(place_id.rsplit("-", 1)[-1])
+    base = SCENARIOS["suspicious_locksmith" if n % 2 else "legit_coffee"]
+    place = copy.deepcopy({k: v for k, v in base.items() if k != "osint_findings"})
+    place["name"] = f"{base['name']} #{n}"
+    place["address"] = f"{n} {base['address']}"
+    place["phone"] = f"+1 555-{n % 1000:03d}-{n % 10000:04d}"
+    return place
+
+
+class FakeMapsClient:
+    """googlemaps.Client surface used by MapsService: places(), find_place() and place()."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def _call(self):
+        outcome = self.latency.sample()
+        if outcome == "429":
+            raise RuntimeError("OVER_QUERY_LIMIT")
+        if outcome == "error":
+            raise RuntimeError("Fake Maps transport error")
+
+    def places(self, query):
+        self._call()
+        n = zlib.crc32(query.encode()) % 1_000_000
+        place = synthetic_place(f"fake-{n}")
+        return {"results": [{"place_id": f"fake-{n}", "name": place["name"], "formatted_address": place["address"]}]}
+
+    def find_place(self, input, input_type, fields=None):
+        self._call()
+        n = zlib.crc32(input.encode()) % 1_000_000
+        return {"candidates": [{"place_id": f"fake-{n}"}]}
+
+    def place(self, place_id, fields):
+        self._call()
+        place = synthetic_place(place_id)
+        result = {
+            "name": place["name"],
+            "formatted_address": place["address"],
+            "formatted_phone_number": place["phone"],
+            "website": place["website"],
+            "rating": place["rating"],
+            "user_ratings_total": len(place["reviews"]),
+            "reviews": place["reviews"],
+            "types": place["types"],
+            "geometry": {"location": {"lat": 37.0, "lng": -122.0}},
+        }
+        # Like the real API, only the requested fields come back ("type" asks for "types")
+        requested = {"types" if f == "type" else f for f in fields}
+        return {"result": {k: v for k, v in result.items() if k in requested}}
+
+
+def fake_google_search(latency):
+    """Returns a class with the serpapi.GoogleSearch surface bound to `latency`."""
+
+    class FakeGoogleSearch:
+        def __init__(self, params):
+            self.params = params
+
+        def get_dict(self):
+            outcome = latency.sample()
+            if outcome == "429":
+                return {"error": "Your account has run out of searches."}
+            if outcome == "error":
+                raise RuntimeError("Fake SerpApi transport error")
+            q = self.params["q"]
+            return {"organic_results": [
+                {"title": f"Result {i} for {q}", "link": f"https://example.com/{zlib.crc32(q.encode()) % 10_000}/{i}", "snippet": "Listed in directory."}
+                for i in range(self.params.get("num", 3))
+            ]}
+
+    return FakeGoogleSearch
+
+
+class _FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body or {}
+        self.headers = headers or {}
+        self.text = json.dumps(self.body)
+
+    def json(self):
+        return self.body
+
+    def iter_lines(self, decode_unicode=False):
+        yield "data: " + json.dumps(self.body)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeGeminiSession:
+    """requests.Session surface for PooledHttpClient; answers generateContent with schema-valid verdicts."""
+
+    def __init__(self, latency, retry_after=1):
+        self.latency = latency
+        self.retry_after = retry_after
+
+    def request(self, method, url, **kwargs):
+        outcome = self.latency.sample()
+        if outcome == "429":
+            return _FakeResponse(429, headers={"Retry-After": str(self.retry_after * self.latency.scale)})
+        if outcome == "error":
+            return _FakeResponse(503)
+        prompt = kwargs["json"]["contents"][0]["parts"][0]["text"]
+        verdict = {
+            "verdict": "High" if "locksmith" in prompt.lower() else "Low",
+            "action": "Suspend Listing" if "locksmith" in prompt.lower() else "No Action",
+            "vector_scores": {"ghost_business": 0.5, "lead_gen": 0.5, "review_fraud": 0.5, "osint_gap": 0.5},
+            "evidence": [{"vector": "lead_gen", "finding": "Synthetic benchmark finding."}],
+        }
+        listings = prompt.count("### LISTING")
+        if listings:
+            verdict = [dict(verdict, id=f"L{i}") for i in range(listings)]
+        return _FakeResponse(200, {"candidates": [{"content": {"parts": [{"text": json.dumps(verdict)}]}, "finishReason": "STOP"}]})
@@ -0,0 +1,188 @@
+"""
+Pipeline load test against the offline fakes in benchmarks/fakes.py.
+
+Runs the real BatchRunner (investigator -> auditor -> risk engine) at several
+concurrency levels and reports throughput, p50/p95/p99 latency per stage
+(maps, serp, gemini, scoring, end-to-end) and traced memory per case.
+
+    python -m benchmarks.load_test --cases 200 --concurrency 1,8,32 --time-scale 0.1
+"""
+import argparse
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+import src.pipeline.batch as batch
+import src.services.serp_api as serp_api
+from src.pipeline.batch import BatchRunner
+from src.services.http_client import PooledHttpClient, RetryPolicy
+from benchmarks.fakes import LatencyModel, FakeMapsClient, FakeGeminiSession, fake_google_search
+
+FAKE_KEY = "AIza-offline-benchmark-key" # Passes googlemaps' key format check; never leaves the process
+
+
+class StageRecorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds, failed=False):
+        with self.lock:
+            self.samples[stage].append(seconds)
+            if failed:
+                self.errors[stage] += 1
+
+
+# Upstream-calling methods per stage; helpers like merge_results aren't I/O and aren't sampled
+STAGE_METHODS = {
+    "maps": {"get_place_details", "search_place", "get_place_details_by_id"},
+    "serp": {"search_business_footprint", "search_name_address", "search_phone"},
+    "gemini": {"analyze_policy_compliance", "analyze_policy_compliance_batch"},
+}
+
+
+class _Timed:
+    """Proxy timing each upstream call on a service as one `stage` sample."""
+
+    def __init__(self, service, stage, recorder):
+        self._service = service
+        self._stage = stage
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        attr = getattr(self._service, name)
+        if name not in STAGE_METHODS[self._stage]:
+            return attr
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = attr(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self._recorder.record(self._stage, time.perf_counter() - start, failed)
+        return timed
+
+
+class FakeBackedRunner(BatchRunner):
+    def __init__(self, latencies, recorder, **kwargs):
+        super().__init__(FAKE_KEY, FAKE_KEY, FAKE_KEY, **kwargs)
+        self.latencies = latencies
+        self.recorder = recorder
+        self.gemini_http = PooledHttpClient(retry=RetryPolicy(max_retries=3, base_delay=0.05 * latencies["gemini"].scale))
+        self.gemini_http.session = FakeGeminiSession(latencies["gemini"])
+
+    def _agents(self):
+        fresh = not hasattr(self.local, 'investigator')
+        investigator, auditor = super()._agents()
+        if fresh:
+            # Swap the innermost services for timed, fake-backed ones; throttling stays on top
+            maps = investigator.maps_service._service
+            maps.client = FakeMapsClient(self.latencies["maps"])
+            maps.is_demo = False
+            investigator.maps_service._service = _Timed(maps, "maps", self.recorder)
+            investigator.serp_service._service = _Timed(investigator.serp_service._service, "serp", self.recorder)
+            gemini = auditor.gemini_service._service
+            gemini.http = self.gemini_http
+            auditor.gemini_service._service = _Timed(gemini, "gemini", self.recorder)
+        return investigator, auditor
+
+
+class _MemorySink:
+    def __init__(self):
+        self.records = []
+
+    def finished_ids(self):
+        return set()
+
+    def write(self, record):
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))]
+
+
+def run_level(concurrency, cases, latencies, audit_batch_size, triage=False):
+    recorder = StageRecorder()
+    runner = FakeBackedRunner(
+        latencies, recorder, workers=concurrency, audit_batch_size=audit_batch_size, triage=triage,
+        limits={"maps": concurrency, "serp": concurrency, "gemini": concurrency},
+    )
+
+    # Time the (CPU-only) scoring stage where the runner calls it
+    score = batch.calculate_trust_score
+
+    def timed_score(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return score(*args, **kwargs)
+        finally:
+            recorder.record("scoring", time.perf_counter() - start)
+
+    sink = _MemorySink()
+    queue = ({"case_id": f"case-{i}", "query": f"benchmark listing {i}"} for i in range(cases))
+    batch.calculate_trust_score = timed_score
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        summary = runner.run(queue, sink)
+    finally:
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        batch.calculate_trust_score = score
+
+    for record in sink.records:
+        recorder.record("end_to_end", record['elapsed'], record['status'] == "error")
+    return summary, elapsed, peak, recorder
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test of the SentinelMap pipeline.")
+    parser.add_argument("--cases", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated worker counts")
+    parser.add_argument("--maps-ms", type=float, default=150)
+    parser.add_argument("--serp-ms", type=float, default=600)
+    parser.add_argument("--gemini-ms", type=float, default=2500)
+    parser.add_argument("--sigma", type=float, default=0.5, help="log-normal tail width")
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--rate-429", type=float, default=0.02)
+    parser.add_argument("--time-scale", type=float, default=1.0, help="multiply every latency (0.1 = 10x faster run)")
+    parser.add_argument("--audit-batch-size", type=int, default=1)
+    parser.add_argument("--triage", action="store_true", help="contact+rating first pass, reviews only on escalation")
+    args = parser.parse_args(argv)
+
+    def model(median_ms, seed):
+        return LatencyModel(median_ms, args.sigma, args.error_rate, args.rate_429, args.time_scale, seed=seed)
+
+    latencies = {"maps": model(args.maps_ms, 1), "serp": model(args.serp_ms, 2), "gemini": model(args.gemini_ms, 3)}
+    serp_api.GoogleSearch = fake_google_search(latencies["serp"])
+
+    # Warm-up so imports, pools and numpy init don't land in the first level's numbers
+    run_level(2, 4, latencies, args.audit_batch_size, args.triage)
+
+    print(f"{args.cases} cases | maps {args.maps_ms}ms serp {args.serp_ms}ms gemini {args.gemini_ms}ms "
+          f"(x{args.time_scale}) | errors {args.error_rate:.0%} 429s {args.rate_429:.0%}")
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        summary, elapsed, peak, recorder = run_level(concurrency, args.cases, latencies, args.audit_batch_size, args.triage)
+        print(f"\n=== concurrency {concurrency}: {args.cases / elapsed:.1f} cases/s, {elapsed:.2f}s total, "
+              f"peak traced memory {peak / 1024:.0f} KiB ({peak / max(1, concurrency) / 1024:.1f} KiB per in-flight case) | {summary}")
+        print(f"{'stage':>12} {'calls':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for stage in ("maps", "serp", "gemini", "scoring", "end_to_end"):
+            samples = recorder.samples.get(stage, [])
+            print(f"{stage:>12} {len(samples):>7} {recorder.errors.get(stage, 0):>7} "
+                  f"{percentile(samples, 50) * 1e3:>9.2f} {percentile(samples, 95) * 1e3:>9.2f} {percentile(samples, 99) * 1e3:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,10 @@
-from src.services.gemini_api import GeminiService
+from src.services.gemini_api import GeminiService, AsyncGeminiService
 from src.utils.mock_data import POLICIES
 import time
 
 class PolicyAuditorAgent:
-    def __init__(self, gemini_key):
-        self.gemini_service = GeminiService(gemini_key)
+    def __init__(self, gemini_key, cache=None):
+        self.gemini_service = GeminiService(gemini_key, cache=cache)
         self.logs = []
 
     def log(self, message):
@@ -21,7 +21,69 @@ class PolicyAuditorAgent:
         
         # Step 2: Reasoning
         self.log("Step 2: Sending data to Gemini Pro for reasoning...")
-        analysis = self.gemini_service.analyze_policy_compliance(place_data, osint_data, POLICIES)
-        self.log("Analysis Complete.")
+        verdict = self.gemini_service.analyze_policy_compliance(place_data, osint_data, POLICIES)
+        self.log(f"Analysis Complete. Verdict: {verdict['verdict']} -> {verdict['action']}")
         
-        return analysis
+        return verdict
+
+    def audit_stream(self, place_data, osint_data):
+        """
+        Generator version of audit(). Yields {"type": "log"} lines, {"type": "token"}
+        chunks from Gemini's streaming endpoint as they arrive, and finally
+        {"type": "result", "audit"}.
+        """
+        self.logs = []
+        self.log("Received case file from Investigator.")
+        self.log("Loading Policy Framework: 'Google Maps User Contributed Content Policy'...")
+        self.log("Step 2: Streaming data to Gemini Pro for reasoning...")
+        for message in self.logs:
+            yield {"type": "log", "message": message}
+
+        for event in self.gemini_service.stream_policy_compliance(place_data, osint_data, POLICIES):
+            if event['type'] == "token":
+                yield event
+            else:
+                verdict = event['audit']
+
+        self.log(f"Analysis Complete. Verdict: {verdict['verdict']} -> {verdict['action']}")
+        yield {"type": "log", "message": self.logs[-1]}
+        yield {"type": "result", "audit": verdict}
+
+    def audit_batch(self, cases, max_batch_size=8):
+        """
+        Audits a list of (place_data, osint_data) cases with packed Gemini prompts.
+        Returns one verdict per case, in order.
+        """
+        self.logs = []
+        self.log(f"Received {len(cases)} case files from Investigator.")
+        self.log("Loading Policy Framework: 'Google Maps User Contributed Content Policy'...")
+        self.log(f"Sending cases to Gemini Pro in packs of up to {max_batch_size}...")
+        verdicts = self.gemini_service.analyze_policy_compliance_batch(cases, POLICIES, max_batch_size=max_batch_size)
+        self.log("Batch Analysis Complete.")
+        return verdicts
+
+
+class AsyncPolicyAuditorAgent(PolicyAuditorAgent):
+    """PolicyAuditorAgent over AsyncGeminiService: audit() and audit_batch() are coroutines."""
+
+    def __init__(self, gemini_key, cache=None):
+        self.gemini_service = AsyncGeminiService(gemini_key, cache=cache)
+        self.logs = []
+
+    async def audit(self, place_data, osint_data):
+        self.logs = []
+        self.log("Received case file from Investigator.")
+        self.log("Loading Policy Framework: 'Google Maps User Contributed Content Policy'...")
+        self.log("Step 2: Sending data to Gemini Pro for reasoning...")
+        verdict = await self.gemini_service.analyze_policy_compliance(place_data, osint_data, POLICIES)
+        self.log(f"Analysis Complete. Verdict: {verdict['verdict']} -> {verdict['action']}")
+        return verdict
+
+    async def audit_batch(self, cases, max_batch_size=8):
+        self.logs = []
+        self.log(f"Received {len(cases)} case files from Investigator.")
+        self.log("Loading Policy Framework: 'Google Maps User Contributed Content Policy'...")
+        self.log(f"Sending cases to Gemini Pro in packs of up to {max_batch_size}...")
+        verdicts = await self.gemini_service.analyze_policy_compliance_batch(cases, POLICIES, max_batch_size=max_batch_size)
+        self.log("Batch Analysis Complete.")
+        return verdicts
@@ -1,39 +1,266 @@
-from src.services.maps_api import MapsService
-from src.services.serp_api import SerpApiService
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from src.services.maps_api import MapsService, AsyncMapsService
+from src.services.serp_api import SerpApiService, AsyncSerpApiService
+from src.utils.metrics import submit
 import time
 
+
+def _discard(future):
+    """Cancels a speculative lookup we no longer want; if it already started, its outcome is still observed."""
+    future.cancel()
+    future.add_done_callback(_drop_result)
+
+
+def _drop_result(future):
+    if not future.cancelled() and future.exception():
+        print(f"Discarded speculative lookup failed: {future.exception()}")
+
+
 class OsintInvestigatorAgent:
-    def __init__(self, maps_key, serp_key):
-        self.maps_service = MapsService(maps_key)
-        self.serp_service = SerpApiService(serp_key)
+    def __init__(self, maps_key, serp_key, cache=None, entity_index=None):
+        self.maps_service = MapsService(maps_key, cache=cache)
+        self.serp_service = SerpApiService(serp_key, cache=cache)
+        self.entity_index = entity_index # Optional EntityIndex: fed every listing, consulted for known-bad
         self.logs = []
+        self._emitted = 0 # Log lines already yielded by investigate_stream
 
     def log(self, message):
         timestamp = time.strftime("%H:%M:%S")
         self.logs.append(f"[{timestamp}] [INVESTIGATOR] {message}")
 
-    def investigate(self, place_query):
+    def investigate(self, place_query, place_id=None, tier="full"):
+        for event in self.investigate_stream(place_query, place_id=place_id, tier=tier):
+            if event['type'] == "result":
+                return event['place_data'], event['osint_data']
+
+    def investigate_stream(self, place_query, place_id=None, tier="full"):
+        """
+        Generator version of investigate(). A known place_id skips the Text Search;
+        `tier` picks the Place Details fields (see MapsService). Yields events as they happen:
+            {"type": "log", "message"}          every log line
+            {"type": "place", "place_data"}     as soon as Place Details lands
+            {"type": "osint", "osint_data"}     merged signals so far, after each SerpApi query
+            {"type": "result", "place_data", "osint_data"}   always last
+        """
         self.logs = [] # Reset logs
-        self.log(f"Starting investigation for query: {place_query}")
+        self._emitted = 0
+        self.log(f"Starting investigation for query: {place_query or place_id}")
         
+        # Demo services answer instantly, nothing to overlap
+        if self.maps_service.is_demo:
+            yield from self._investigate_sequential(place_query, place_id, tier)
+            return
+
+        # Step 1: Get Ground Truth
+        self.log("Step 1: Fetching official Maps data...")
+        yield from self._flush_logs()
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            if place_id:
+                # Caller already knows the listing: straight to Details, nothing to speculate on
+                hit = {"place_id": place_id}
+            else:
+                try:
+                    hit = self.maps_service.search_place(place_query)
+                except Exception as e:
+                    raise self.maps_service.upstream_error(e)
+
+                if not hit:
+                    self.log("ERROR: Business not found on Maps.")
+                    yield from self._finish(None, None)
+                    return
+
+            # Fire the Name + Address search off the Text Search hit while Details is in flight
+            details_future = submit(pool, self.maps_service.get_place_details_by_id, hit['place_id'], tier)
+            known_bad, name_future = [], None
+            if hit.get('name'):
+                known_bad = self._known_bad({"name": hit.get('name'), "address": hit.get('formatted_address')})
+                name_future = None if known_bad else self._submit_name_search(pool, hit.get('name'), hit.get('formatted_address'))
+
+            try:
+                place_data = details_future.result()
+            except Exception as e:
+                raise self.maps_service.upstream_error(e)
+
+            yield from self._target_acquired(place_data)
+
+            # Step 2: Digital Footprint
+            known_bad = known_bad or self._known_bad(place_data)
+            if known_bad:
+                # Already confirmed bad: no point paying to rediscover the same links
+                if name_future:
+                    _discard(name_future)
+                self.log(f"Known-bad {known_bad[0]['kind']} ({known_bad[0]['key']}): skipping SerpApi lookups.")
+                osint_results = []
+            elif self.serp_service.is_demo:
+                osint_results = self.serp_service.get_demo_footprint(place_data.get('name'))
+            else:
+                phone_future = submit(pool, self.serp_service.search_phone, place_data.get('phone'))
+
+                # Speculation missed: Details disagrees with the Text Search hit
+                if (place_data.get('name'), place_data.get('address')) != (hit.get('name'), hit.get('formatted_address')):
+                    if name_future:
+                        _discard(name_future)
+                    name_future = self._submit_name_search(pool, place_data.get('name'), place_data.get('address'))
+
+                try:
+                    # Stream whichever query lands first; merge order stays name -> phone
+                    found = {}
+                    futures = {future: query for future, query in ((name_future, "name_address"), (phone_future, "phone")) if future}
+                    for future in as_completed(futures):
+                        found[futures[future]] = future.result()
+                        osint_results = self.serp_service.merge_results(found.get("name_address", []), found.get("phone", []))
+                        if len(found) < len(futures):
+                            yield {"type": "osint", "osint_data": osint_results}
+                except Exception as e:
+                    osint_results = self.serp_service.error_results(e)
+
+        yield from self._finish(place_data, osint_results)
+
+    def _flush_logs(self):
+        while self._emitted < len(self.logs):
+            self._emitted += 1
+            yield {"type": "log", "message": self.logs[self._emitted - 1]}
+
+    def _target_acquired(self, place_data):
+        self._log_target(place_data)
+        yield from self._flush_logs()
+        yield {"type": "place", "place_data": place_data}
+
+    def _log_target(self, place_data):
+        self.log(f"Target Acquired: {place_data.get('name')} ({place_data.get('address')})")
+        self.log("Step 2: Searching Digital Footprint (SerpApi)...")
+
+    def _known_bad(self, place_data):
+        return self.entity_index.known_bad(place_data) if self.entity_index else []
+
+    def _finish(self, place_data, osint_results):
+        if place_data:
+            self._record_findings(place_data, osint_results)
+            yield from self._flush_logs()
+            yield {"type": "osint", "osint_data": osint_results}
+        yield from self._flush_logs()
+        yield {"type": "result", "place_data": place_data, "osint_data": osint_results}
+
+    def _record_findings(self, place_data, osint_results):
+        self.log(f"Found {len(osint_results)} external signals.")
+        if self.entity_index:
+            self.entity_index.add_listing(place_data, osint_results)
+
+    def _submit_name_search(self, pool, name, address):
+        if self.serp_service.is_demo:
+            return None
+        return submit(pool, self.serp_service.search_name_address, name, address)
+
+    def _investigate_sequential(self, place_query, place_id=None, tier="full"):
         # Step 1: Get Ground Truth
         self.log("Step 1: Fetching official Maps data...")
-        place_data = self.maps_service.get_place_details(place_query)
+        yield from self._flush_logs()
+        place_data = self.maps_service.get_place_details(place_query, place_id=place_id, tier=tier)
         
         if not place_data:
             self.log("ERROR: Business not found on Maps.")
-            return None, None
+            yield from self._finish(None, None)
+            return
             
-        self.log(f"Target Acquired: {place_data.get('name')} ({place_data.get('address')})")
+        yield from self._target_acquired(place_data)
         
         # Step 2: Digital Footprint
-        self.log("Step 2: Searching Digital Footprint (SerpApi)...")
-        osint_results = self.serp_service.search_business_footprint(
+        yield from self._finish(place_data, self._search_footprint(place_data))
+
+    def _search_footprint(self, place_data):
+        return self.serp_service.search_business_footprint(
             place_data.get('name'), 
             place_data.get('phone'),
             place_data.get('address')
         )
-        
-        self.log(f"Found {len(osint_results)} external signals.")
-        
+
+
+class AsyncOsintInvestigatorAgent(OsintInvestigatorAgent):
+    """
+    Same investigation as OsintInvestigatorAgent, as a coroutine over the async
+    services, so one event loop can keep many cases in flight. Cancelling
+    investigate() (e.g. a per-case asyncio.timeout) cancels its in-flight lookups.
+    Logs are per run, so use one agent per concurrent case.
+    """
+
+    def __init__(self, maps_key, serp_key, cache=None, entity_index=None):
+        self.maps_service = AsyncMapsService(maps_key, cache=cache)
+        self.serp_service = AsyncSerpApiService(serp_key, cache=cache)
+        self.entity_index = entity_index
+        self.logs = []
+        self._emitted = 0
+
+    async def investigate(self, place_query, place_id=None, tier="full"):
+        """Returns (place_data, osint_data), or (None, None) when the listing isn't found."""
+        self.logs = []
+        self.log(f"Starting investigation for query: {place_query or place_id}")
+        self.log("Step 1: Fetching official Maps data...")
+
+        if self.maps_service.is_demo:
+            place_data = await self.maps_service.get_place_details(place_query, place_id=place_id, tier=tier)
+            if not place_data:
+                self.log("ERROR: Business not found on Maps.")
+                return None, None
+            self._log_target(place_data)
+            return self._complete(place_data, await self._search_footprint(place_data))
+
+        if place_id:
+            hit = {"place_id": place_id}
+        else:
+            try:
+                hit = await self.maps_service.search_place(place_query)
+            except Exception as e:
+                raise self.maps_service.upstream_error(e)
+            if not hit:
+                self.log("ERROR: Business not found on Maps.")
+                return None, None
+
+        # Same speculation as the threaded path: Name + Address search off the hit while Details is in flight
+        details_task = asyncio.create_task(self.maps_service.get_place_details_by_id(hit['place_id'], tier))
+        known_bad, name_task, phone_task = [], None, None
+        try:
+            if hit.get('name'):
+                known_bad = self._known_bad({"name": hit.get('name'), "address": hit.get('formatted_address')})
+                if not known_bad and not self.serp_service.is_demo:
+                    name_task = asyncio.create_task(self.serp_service.search_name_address(hit.get('name'), hit.get('formatted_address')))
+
+            try:
+                place_data = await details_task
+            except Exception as e:
+                raise self.maps_service.upstream_error(e)
+            self._log_target(place_data)
+
+            known_bad = known_bad or self._known_bad(place_data)
+            if known_bad:
+                self.log(f"Known-bad {known_bad[0]['kind']} ({known_bad[0]['key']}): skipping SerpApi lookups.")
+                return self._complete(place_data, [])
+            if self.serp_service.is_demo:
+                return self._complete(place_data, self.serp_service.get_demo_footprint(place_data.get('name')))
+
+            phone_task = asyncio.create_task(self.serp_service.search_phone(place_data.get('phone')))
+            if name_task is None or (place_data.get('name'), place_data.get('address')) != (hit.get('name'), hit.get('formatted_address')):
+                if name_task:
+                    _discard(name_task)
+                name_task = asyncio.create_task(self.serp_service.search_name_address(place_data.get('name'), place_data.get('address')))
+            try:
+                osint_results = self.serp_service.merge_results(await name_task, await phone_task)
+            except Exception as e:
+                osint_results = self.serp_service.error_results(e)
+            return self._complete(place_data, osint_results)
+        finally:
+            # Early return, error or cancellation: nothing we started outlives the case
+            for task in (details_task, name_task, phone_task):
+                if task and not task.done():
+                    task.cancel()
+
+    async def _search_footprint(self, place_data):
+        return await self.serp_service.search_business_footprint(
+            place_data.get('name'),
+            place_data.get('phone'),
+            place_data.get('address')
+        )
+
+    def _complete(self, place_data, osint_results):
+        self._record_findings(place_data, osint_results)
         return place_data, osint_results
@@ -0,0 +1,180 @@
+"""
+Event-loop batch runner: same pipeline, records and sinks as BatchRunner, but every
+case is a coroutine on one event loop instead of a thread. A single process can
+keep hundreds of cases in flight. Connections are bounded per host by the shared
+async clients, and calls per service by asyncio semaphores.
+
+Usage:
+    python -m src.pipeline.batch queue.csv results.jsonl --async --in-flight 300 --case-timeout 120
+"""
+import asyncio
+import inspect
+import time
+from src.agents.investigator import AsyncOsintInvestigatorAgent
+from src.agents.auditor import AsyncPolicyAuditorAgent
+from src.pipeline.batch import BatchRunner, ASYNC_LIMITS, STATUSES, record_failure
+from src.services.async_http_client import close_async_clients
+from src.utils.metrics import trace
+from src.utils.risk_engine import TRIAGE_ESCALATE_BELOW
+
+IN_FLIGHT = 200
+
+
+class _AsyncThrottledService:
+    """Proxies an async service so every coroutine method call holds the service's semaphore."""
+
+    def __init__(self, service, semaphore):
+        self._service = service
+        self._semaphore = semaphore
+
+    def __getattr__(self, name):
+        attr = getattr(self._service, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        async def throttled(*args, **kwargs):
+            async with self._semaphore:
+                return await attr(*args, **kwargs)
+        return throttled
+
+
+class AsyncBatchRunner(BatchRunner):
+    def __init__(self, maps_key=None, serp_key=None, gemini_key=None, in_flight=IN_FLIGHT, case_timeout=None, limits=None, cache=None, audit_batch_size=1, entity_index=None, triage=False, escalate_below=TRIAGE_ESCALATE_BELOW, escalation=None, review_index=None, spatial_index=None):
+        super().__init__(
+            maps_key, serp_key, gemini_key, workers=in_flight, cache=cache, audit_batch_size=audit_batch_size,
+            entity_index=entity_index, triage=triage, escalate_below=escalate_below, escalation=escalation, review_index=review_index,
+            spatial_index=spatial_index,
+        )
+        self.in_flight = in_flight
+        self.case_timeout = case_timeout # Seconds per case; on expiry its in-flight calls are cancelled
+        self.limits = {**ASYNC_LIMITS, **(limits or {})}
+        self.semaphores = None # Created on the runner's event loop
+
+    def _agents(self):
+        # Agents keep per-run logs, so every case gets its own (cheap: clients are shared)
+        maps_key, serp_key, gemini_key = self.keys
+        investigator = AsyncOsintInvestigatorAgent(maps_key, serp_key, cache=self.cache, entity_index=self.entity_index)
+        investigator.maps_service = _AsyncThrottledService(investigator.maps_service, self.semaphores['maps'])
+        investigator.serp_service = _AsyncThrottledService(investigator.serp_service, self.semaphores['serp'])
+        auditor = AsyncPolicyAuditorAgent(gemini_key, cache=self.cache)
+        auditor.gemini_service = _AsyncThrottledService(auditor.gemini_service, self.semaphores['gemini'])
+        return investigator, auditor
+
+    async def run_case(self, case):
+        investigator, auditor = self._agents()
+        record = await self.investigate_case(case, investigator)
+        if record['status'] == "needs_audit":
+            record = (await self._audit_records([record], lambda cases: self._audit_one(auditor, cases[0])))[0]
+        return [record]
+
+    async def _audit_one(self, auditor, case):
+        async with asyncio.timeout(self.case_timeout):
+            return [await auditor.audit(*case)]
+
+    async def investigate_case(self, case, investigator=None):
+        investigator = investigator or self._agents()[0]
+        record = {"case_id": case['case_id'], "query": case['query']}
+        start = time.time()
+        with trace() as case_trace:
+            try:
+                async with asyncio.timeout(self.case_timeout):
+                    tier = "rating" if self.triage else "full"
+                    place_data, osint_data = await investigator.investigate(case['query'], place_id=case.get('place_id'), tier=tier)
+                    if not place_data:
+                        record['status'] = "not_found"
+                    else:
+                        if self.triage:
+                            place_data = await self._escalate(investigator, case, place_data, osint_data, record)
+                        self._investigated(record, place_data, osint_data)
+            except TimeoutError:
+                record['status'] = "error"
+                record['error'] = f"TimeoutError: case exceeded {self.case_timeout}s"
+            except Exception as e:
+                record_failure(record, e)
+        self._timed(record, start, case_trace)
+        return record
+
+    async def _escalate(self, investigator, case, place_data, osint_data, record):
+        if not self._needs_review_pull(place_data, osint_data, record):
+            return place_data
+        maps = investigator.maps_service
+        if place_data.get('place_id'):
+            full = await maps.get_place_details_by_id(place_data['place_id'], tier="full")
+        else:
+            full = await maps.get_place_details(case['query'], tier="full")
+        return full or place_data
+
+    async def audit_batch(self, records):
+        _, auditor = self._agents()
+        return await self._audit_records(records, lambda cases: auditor.audit_batch(cases, max_batch_size=self.audit_batch_size))
+
+    async def _audit_records(self, records, audit):
+        start = time.time()
+        with trace() as pack_trace:
+            try:
+                verdicts = await audit([(r['place_data'], r['osint_data']) for r in records])
+            except TimeoutError:
+                verdicts = [TimeoutError(f"audit exceeded {self.case_timeout}s")] * len(records)
+            except Exception as e:
+                verdicts = [e] * len(records)
+        return self._apply_verdicts(records, verdicts, start, pack_trace)
+
+    def run(self, cases, sink, on_record=None):
+        """BatchRunner.run() on a fresh event loop, with up to `in_flight` cases at once."""
+        return asyncio.run(self._run(cases, sink, on_record))
+
+    async def _run(self, cases, sink, on_record):
+        self.semaphores = {name: asyncio.Semaphore(n) for name, n in self.limits.items()}
+        done = sink.finished_ids()
+        summary = dict.fromkeys(("skipped",) + STATUSES, 0)
+        in_flight = set()
+        awaiting_audit = []
+        batched = self.audit_batch_size > 1
+
+        def drain(finished):
+            for task in finished:
+                for record in task.result():
+                    if record['status'] == "needs_audit":
+                        awaiting_audit.append(record)
+                        continue
+                    sink.write(record)
+                    summary[record['status']] += 1
+                    if on_record:
+                        on_record(record)
+            while len(awaiting_audit) >= self.audit_batch_size:
+                pack = awaiting_audit[:self.audit_batch_size]
+                del awaiting_audit[:self.audit_batch_size]
+                in_flight.add(asyncio.create_task(self.audit_batch(pack)))
+
+        async def investigate_only(case):
+            return [await self.investigate_case(case)]
+
+        try:
+            job = investigate_only if batched else self.run_case
+            for case in cases:
+                if case['case_id'] in done:
+                    summary['skipped'] += 1
+                    continue
+                done.add(case['case_id'])
+                in_flight.add(asyncio.create_task(job(case)))
+                if len(in_flight) >= self.in_flight:
+                    finished, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    in_flight.difference_update(finished)
+                    drain(finished)
+            while in_flight or awaiting_audit:
+                if not in_flight:
+                    in_flight.add(asyncio.create_task(self.audit_batch(awaiting_audit[:])))
+                    awaiting_audit.clear()
+                finished, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                in_flight.difference_update(finished)
+                drain(finished)
+        finally:
+            # Interrupted: cancel what's left so its HTTP calls don't outlive the loop
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            await close_async_clients()
+            sink.close()
+        if self.escalation:
+            summary['llm_calls_avoided'] = self.escalation.avoided()
+        return summary
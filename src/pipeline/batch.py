@@ -0,0 +1,510 @@
+"""
+Headless batch runner.
+
+Reads a CSV/JSONL queue of queries, drives the Investigator -> Auditor -> Risk Engine
+pipeline with bounded per-service concurrency and streams one record per case to
+JSONL (or Parquet) as soon as it completes. Re-running against the same output
+skips cases that already finished, so a crashed run can simply be restarted.
+Cases whose API quota ran out are written as "deferred" and picked up again by
+the next run (see src/utils/quota.py for the shared ledger across processes).
+
+Usage:
+    python -m src.pipeline.batch queue.csv results.jsonl --workers 16
+    python -m src.pipeline.batch queue.csv results.jsonl --async --in-flight 300   # see async_batch.py
+    python -m src.pipeline.batch queue.csv results.jsonl --processes 4             # see workers.py
+    python -m src.pipeline.batch queue.csv results.jsonl --processes 4 --quota-ledger .cache/quota.sqlite
+"""
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from src.agents.investigator import OsintInvestigatorAgent
+from src.agents.auditor import PolicyAuditorAgent
+from src.pipeline.escalation import EscalationScheduler, CONCLUSIVE_BELOW, CONCLUSIVE_FROM
+from src.services.async_http_client import get_shared_async_client
+from src.services.http_client import get_shared_client, QuotaExceededError
+from src.utils.cache import ResponseCache
+from src.utils.case_store import CaseStore
+from src.utils.entity_index import EntityIndex
+from src.utils.prescreen import PreScreen
+from src.utils.review_similarity import ReviewSimilarityIndex
+from src.utils.spatial_index import SpatialIndex
+from src.utils.metrics import trace, serve_metrics, write_prometheus
+from src.utils.risk_engine import calculate_trust_score, needs_review_pull, TRIAGE_ESCALATE_BELOW
+
+DEFAULT_LIMITS = {"maps": 4, "serp": 4, "gemini": 2}
+ASYNC_LIMITS = {"maps": 32, "serp": 32, "gemini": 16} # Coroutines are cheap; see async_batch.py
+
+# Statuses that count as "done" on resume. Errored and deferred cases are retried.
+FINISHED_STATUSES = {"ok", "not_found"}
+STATUSES = ("ok", "not_found", "deferred", "error")
+
+
+def record_failure(record, error):
+    """Marks a failed case: "deferred" when an API quota ran out, "error" otherwise."""
+    record['status'] = "deferred" if isinstance(error, QuotaExceededError) else "error"
+    record['error'] = f"{type(error).__name__}: {error}"
+
+
+def normalize_query(query):
+    return " ".join(str(query).lower().split())
+
+
+def read_queue(path):
+    """
+    Yields {"case_id", "query", "place_id"} dicts from a CSV (needs a `query` or
+    `place_id` column) or JSONL file. A known `place_id` skips the Text Search.
+    `case_id` is optional and defaults to the normalized query.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+
+        for row in rows:
+            place_id = (row.get('place_id') or '').strip() or None
+            query = (row.get('query') or '').strip() or place_id
+            if not query:
+                continue
+            yield {"case_id": row.get('case_id') or normalize_query(query), "query": query, "place_id": place_id}
+
+
+class _ThrottledService:
+    """Proxies a service so every method call holds the service's semaphore."""
+
+    def __init__(self, service, semaphore):
+        self._service = service
+        self._semaphore = semaphore
+
+    def __getattr__(self, name):
+        attr = getattr(self._service, name)
+        if not callable(attr):
+            return attr
+
+        def throttled(*args, **kwargs):
+            with self._semaphore:
+                return attr(*args, **kwargs)
+        return throttled
+
+
+class JsonlSink:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+
+    def finished_ids(self):
+        done = set()
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue # Torn last line from a crash
+                if record.get('status') in FINISHED_STATUSES:
+                    done.add(record.get('case_id'))
+        return done
+
+    def write(self, record):
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, 'a', encoding='utf-8')
+            self.file.write(json.dumps(record, default=str) + "\n")
+            self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+
+class ParquetSink:
+    """
+    Writes row groups into numbered part files under a directory.
+    Nested fields (place_data, osint_data, audit, breakdown) are stored as JSON strings.
+    Rows still buffered at crash time are simply re-run on resume.
+    """
+
+    COLUMNS = ["case_id", "query", "status", "trust_score", "breakdown", "audit",
+               "place_data", "osint_data", "error", "elapsed", "stage_ms", "triage"]
+    JSON_COLUMNS = {"breakdown", "audit", "place_data", "osint_data", "stage_ms", "triage"}
+
+    def __init__(self, path, flush_every=500):
+        try:
+            import pyarrow # noqa: F401
+        except ImportError:
+            raise ImportError("Parquet output requires `pyarrow` (pip install pyarrow)")
+        self.path = path
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.buffer = []
+        os.makedirs(path, exist_ok=True)
+
+    def _parts(self):
+        return sorted(p for p in os.listdir(self.path) if p.endswith('.parquet'))
+
+    def finished_ids(self):
+        import pyarrow.parquet as pq
+        done = set()
+        for part in self._parts():
+            table = pq.read_table(os.path.join(self.path, part), columns=['case_id', 'status'])
+            for case_id, status in zip(table['case_id'].to_pylist(), table['status'].to_pylist()):
+                if status in FINISHED_STATUSES:
+                    done.add(case_id)
+        return done
+
+    def write(self, record):
+        with self.lock:
+            self.buffer.append(record)
+            if len(self.buffer) >= self.flush_every:
+                self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        columns = {}
+        for col in self.COLUMNS:
+            values = [r.get(col) for r in self.buffer]
+            if col in self.JSON_COLUMNS:
+                values = [json.dumps(v, default=str) for v in values]
+            columns[col] = values
+        # Unique per writer and sortable by time, so two runs on one directory never replace each other's parts
+        part = os.path.join(self.path, f"part-{time.time_ns():020d}-{os.getpid()}.parquet")
+        pq.write_table(pa.table(columns), part + ".tmp")
+        os.replace(part + ".tmp", part) # Atomic: a part is either complete or absent
+        self.buffer = []
+
+    def close(self):
+        with self.lock:
+            self._flush()
+
+
+def open_sink(path):
+    if path.endswith('.jsonl') or path.endswith('.json'):
+        return JsonlSink(path)
+    return ParquetSink(path)
+
+
+class BatchRunner:
+    def __init__(self, maps_key=None, serp_key=None, gemini_key=None, workers=8, limits=None, cache=None, audit_batch_size=1, entity_index=None, triage=False, escalate_below=TRIAGE_ESCALATE_BELOW, escalation=None, review_index=None, spatial_index=None):
+        self.keys = (maps_key, serp_key, gemini_key)
+        self.review_index = review_index # Optional ReviewSimilarityIndex: template reviews across listings
+        self.spatial_index = spatial_index # Optional SpatialIndex: stacked pins and same-category clusters
+        self.escalation = escalation # Optional EscalationScheduler: Gemini only for the uncertain band
+        self.triage = triage # Cheap contact+rating fetch first, reviews only for low first-pass scores
+        self.escalate_below = escalate_below
+        self.entity_index = entity_index
+        self.audit_batch_size = audit_batch_size
+        self.cache = cache # Shared by every worker thread
+        self.workers = workers
+        limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.semaphores = {name: threading.BoundedSemaphore(n) for name, n in limits.items()}
+        self.local = threading.local()
+
+    def _agents(self):
+        # Agents keep per-run logs, so each worker thread gets its own pair
+        if not hasattr(self.local, 'investigator'):
+            maps_key, serp_key, gemini_key = self.keys
+            investigator = OsintInvestigatorAgent(maps_key, serp_key, cache=self.cache, entity_index=self.entity_index)
+            investigator.maps_service = _ThrottledService(investigator.maps_service, self.semaphores['maps'])
+            investigator.serp_service = _ThrottledService(investigator.serp_service, self.semaphores['serp'])
+            auditor = PolicyAuditorAgent(gemini_key, cache=self.cache)
+            auditor.gemini_service = _ThrottledService(auditor.gemini_service, self.semaphores['gemini'])
+            self.local.investigator = investigator
+            self.local.auditor = auditor
+        return self.local.investigator, self.local.auditor
+
+    def run_case(self, case):
+        """Investigate + audit + score one case. Returns a list holding its record."""
+        record = self.investigate_case(case)
+        if record['status'] == "needs_audit":
+            _, auditor = self._agents()
+            record = self._audit_records([record], lambda cases: [auditor.audit(*cases[0])])[0]
+        return [record]
+
+    def investigate_case(self, case):
+        investigator, _ = self._agents()
+        record = {"case_id": case['case_id'], "query": case['query']}
+        start = time.time()
+        with trace() as case_trace:
+            try:
+                tier = "rating" if self.triage else "full"
+                place_data, osint_data = investigator.investigate(case['query'], place_id=case.get('place_id'), tier=tier)
+                if not place_data:
+                    record['status'] = "not_found"
+                else:
+                    if self.triage:
+                        place_data = self._escalate(investigator, case, place_data, osint_data, record)
+                    self._investigated(record, place_data, osint_data)
+            except Exception as e:
+                record_failure(record, e)
+        self._timed(record, start, case_trace)
+        return record
+
+    def _investigated(self, record, place_data, osint_data, signed=None):
+        """
+        Index lookups + escalation triage for a found listing; leaves it "needs_audit" unless conclusive.
+        `signed`: the listing's review signatures, if already computed.
+        """
+        record.update({"status": "needs_audit", "place_data": place_data, "osint_data": osint_data})
+        if self.entity_index:
+            record['entity_links'] = self.entity_index.links(place_data, osint_data)
+        if self.review_index:
+            record['review_links'] = self.review_index.add_listing(place_data, signed)
+        if self.spatial_index:
+            record['spatial_links'] = self.spatial_index.add_listing(place_data)
+        if self.escalation:
+            verdict = self.escalation.triage(
+                place_data, osint_data, entity_links=record.get('entity_links'),
+                review_links=record.get('review_links'), spatial_links=record.get('spatial_links'),
+            )
+            if verdict:
+                self._score_record(record, verdict) # Heuristics were conclusive: no Gemini call
+
+    def _timed(self, record, start, case_trace):
+        record['elapsed'] = round(time.time() - start, 3)
+        record['stage_ms'] = {stage: round(seconds * 1000, 1) for stage, seconds in case_trace.stage_totals().items()}
+
+    def _escalate(self, investigator, case, place_data, osint_data, record):
+        """Scores the triage fetch (no reviews, no audit) and pulls the full tier only if it warrants it."""
+        if not self._needs_review_pull(place_data, osint_data, record):
+            return place_data
+        maps = investigator.maps_service
+        if place_data.get('place_id'):
+            full = maps.get_place_details_by_id(place_data['place_id'], tier="full")
+        else:
+            full = maps.get_place_details(case['query'], tier="full") # Demo data has no place_id
+        return full or place_data
+
+    def _needs_review_pull(self, place_data, osint_data, record):
+        links = self.entity_index.links(place_data, osint_data) if self.entity_index else None
+        spatial = self.spatial_index.links(place_data) if self.spatial_index else None
+        score, _ = calculate_trust_score(place_data, osint_data, None, entity_links=links, spatial_links=spatial)
+        escalated = needs_review_pull(place_data, score, self.escalate_below)
+        record['triage'] = {"score": score, "escalated": escalated}
+        return escalated
+
+    def audit_batch(self, records):
+        """Audits already-investigated records with one packed Gemini prompt per pack."""
+        _, auditor = self._agents()
+        return self._audit_records(records, lambda cases: auditor.audit_batch(cases, max_batch_size=self.audit_batch_size))
+
+    def _audit_records(self, records, audit):
+        start = time.time()
+        with trace() as pack_trace:
+            try:
+                verdicts = audit([(r['place_data'], r['osint_data']) for r in records])
+            except Exception as e:
+                verdicts = [e] * len(records)
+        return self._apply_verdicts(records, verdicts, start, pack_trace)
+
+    def _apply_verdicts(self, records, verdicts, start, pack_trace):
+        share = (time.time() - start) / len(records)
+        # A packed prompt's Gemini time is split evenly across the listings in it
+        gemini_ms = round(pack_trace.stage_totals().get("gemini", 0.0) * 1000 / len(records), 1)
+        for record, verdict in zip(records, verdicts):
+            stage_ms = record.setdefault('stage_ms', {})
+            if gemini_ms:
+                stage_ms['gemini'] = gemini_ms
+            if isinstance(verdict, Exception):
+                record_failure(record, verdict)
+            else:
+                self._score_record(record, verdict)
+            record['elapsed'] = round(record['elapsed'] + share, 3)
+        return records
+
+    def _score_record(self, record, verdict):
+        with trace() as score_trace:
+            trust_score, breakdown = calculate_trust_score(
+                record['place_data'], record['osint_data'], verdict,
+                entity_links=record.get('entity_links'), review_links=record.get('review_links'),
+                spatial_links=record.get('spatial_links'),
+            )
+        record.setdefault('stage_ms', {})['scoring'] = round(score_trace.stage_totals().get("scoring", 0.0) * 1000, 3)
+        record.update({
+            "status": "ok",
+            "trust_score": trust_score,
+            "breakdown": breakdown,
+            "audit": verdict,
+        })
+
+    def run(self, cases, sink, on_record=None):
+        """
+        Runs every case not already finished in `sink`. Keeps at most 2x`workers`
+        cases in flight so huge queues are streamed rather than materialized.
+        With audit_batch_size > 1, investigated cases are queued and audited in packs.
+        Returns a summary of status counts.
+        """
+        done = sink.finished_ids()
+        summary = dict.fromkeys(("skipped",) + STATUSES, 0)
+        in_flight = set()
+        awaiting_audit = []
+        batched = self.audit_batch_size > 1
+
+        def drain(pool, futures):
+            for future in futures:
+                for record in future.result():
+                    if record['status'] == "needs_audit":
+                        awaiting_audit.append(record)
+                        continue
+                    sink.write(record)
+                    summary[record['status']] += 1
+                    if on_record:
+                        on_record(record)
+            while len(awaiting_audit) >= self.audit_batch_size:
+                pack = awaiting_audit[:self.audit_batch_size]
+                del awaiting_audit[:self.audit_batch_size]
+                in_flight.add(pool.submit(self.audit_batch, pack))
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                job = (lambda case: [self.investigate_case(case)]) if batched else self.run_case
+                for case in cases:
+                    if case['case_id'] in done:
+                        summary['skipped'] += 1
+                        continue
+                    done.add(case['case_id']) # Dedupe repeats within the queue
+                    in_flight.add(pool.submit(job, case))
+                    if len(in_flight) >= self.workers * 2:
+                        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        in_flight.difference_update(finished)
+                        drain(pool, finished)
+                while in_flight or awaiting_audit:
+                    if not in_flight:
+                        in_flight.add(pool.submit(self.audit_batch, awaiting_audit[:]))
+                        awaiting_audit.clear()
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    in_flight.difference_update(finished)
+                    drain(pool, finished)
+        finally:
+            sink.close()
+        if self.escalation:
+            summary['llm_calls_avoided'] = self.escalation.avoided()
+        return summary
+
+
+def run_batch(input_path, output_path, maps_key=None, serp_key=None, gemini_key=None, workers=8, limits=None, cache=None, audit_batch_size=1, entity_index=None, on_record=None, triage=False, escalate_below=TRIAGE_ESCALATE_BELOW, escalation=None, review_index=None, spatial_index=None, async_mode=False, in_flight=None, case_timeout=None, processes=None, gemini_rpm=None):
+    options = dict(
+        limits=limits, cache=cache, audit_batch_size=audit_batch_size, entity_index=entity_index,
+        triage=triage, escalate_below=escalate_below, escalation=escalation, review_index=review_index,
+        spatial_index=spatial_index,
+    )
+    if async_mode:
+        # Imported here: async_batch builds on this module
+        from src.pipeline.async_batch import AsyncBatchRunner, IN_FLIGHT
+        runner = AsyncBatchRunner(maps_key, serp_key, gemini_key, in_flight=in_flight or IN_FLIGHT, case_timeout=case_timeout, **options)
+    elif processes:
+        from src.pipeline.workers import ProcessBatchRunner
+        runner = ProcessBatchRunner(maps_key, serp_key, gemini_key, processes=processes, workers=workers, gemini_rpm=gemini_rpm, **options)
+    else:
+        runner = BatchRunner(maps_key, serp_key, gemini_key, workers=workers, **options)
+    return runner.run(read_queue(input_path), open_sink(output_path), on_record=on_record)
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Run a queue of listings through the SentinelMap pipeline.")
+    parser.add_argument("input", help="CSV (with a `query` column) or JSONL of queries")
+    parser.add_argument("output", help="results .jsonl file, or a directory for Parquet parts")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--async", dest="async_mode", action="store_true", help="run cases as coroutines on one event loop (needs aiohttp)")
+    parser.add_argument("--processes", type=int, help="warm worker processes, each running --workers threads (see workers.py)")
+    parser.add_argument("--in-flight", type=int, help="cases in flight at once with --async (default 200)")
+    parser.add_argument("--case-timeout", type=float, help="seconds before an --async case is cancelled")
+    # Per-service call limits; defaults differ between threads and --async (see ASYNC_LIMITS)
+    parser.add_argument("--maps-concurrency", type=int)
+    parser.add_argument("--serp-concurrency", type=int)
+    parser.add_argument("--gemini-concurrency", type=int)
+    parser.add_argument("--gemini-rpm", type=int, help="client-side Gemini requests/minute cap")
+    parser.add_argument("--audit-batch-size", type=int, default=1, help="listings packed into one Gemini prompt")
+    parser.add_argument("--cache", help="SQLite file for the shared API response cache")
+    parser.add_argument("--quota-ledger", help="SQLite file of per-key API quotas shared by every process (see quota.py)")
+    parser.add_argument("--entity-index", help="SQLite file for the cross-listing phone/address/domain index")
+    parser.add_argument("--review-index", help="SQLite file for the cross-listing near-duplicate review index")
+    parser.add_argument("--spatial-index", help="SQLite file for the listing pin index (stacked pins, same-category clusters)")
+    parser.add_argument("--triage", action="store_true", help="fetch contact+rating fields first; pull reviews only for low first-pass scores")
+    parser.add_argument("--escalate-below", type=int, default=TRIAGE_ESCALATE_BELOW, help="first-pass score below which --triage pulls reviews")
+    parser.add_argument("--skip-conclusive", action="store_true", help="only send the uncertain band of heuristic scores to Gemini")
+    parser.add_argument("--conclusive-below", type=int, default=CONCLUSIVE_BELOW, help="heuristic score at or below which Gemini is skipped")
+    parser.add_argument("--conclusive-from", type=int, default=CONCLUSIVE_FROM, help="heuristic score at or above which Gemini is skipped")
+    parser.add_argument("--prescreen", help="trained pre-screen model (.npz): confident verdicts skip Gemini")
+    parser.add_argument("--case-store", help="directory of the columnar case store to append finished cases to")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port while the batch runs")
+    parser.add_argument("--metrics-file", help="write Prometheus metrics here at the end (node_exporter textfile format)")
+    args = parser.parse_args(argv)
+    if args.processes and args.async_mode:
+        parser.error("--processes and --async are alternatives")
+
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+    if args.quota_ledger:
+        # Via the environment, so worker processes (and their services) share the same ledger
+        os.environ["SENTINEL_QUOTA_LEDGER"] = args.quota_ledger
+
+    # Size the shared Maps and Gemini pools before any worker builds its services
+    if args.async_mode:
+        get_shared_async_client("gemini", limit_per_host=args.gemini_concurrency or ASYNC_LIMITS['gemini'], requests_per_minute=args.gemini_rpm)
+    else:
+        get_shared_client("maps", pool_size=args.maps_concurrency or DEFAULT_LIMITS['maps'])
+        get_shared_client("gemini", pool_size=args.gemini_concurrency or DEFAULT_LIMITS['gemini'], requests_per_minute=args.gemini_rpm)
+
+    cache = ResponseCache(path=args.cache) if args.cache else None
+    entity_index = EntityIndex(args.entity_index) if args.entity_index else None
+    review_index = ReviewSimilarityIndex(args.review_index) if args.review_index else None
+    spatial_index = SpatialIndex(args.spatial_index) if args.spatial_index else None
+
+    prescreen = PreScreen.load(args.prescreen) if args.prescreen else None
+    escalation = None
+    if args.skip_conclusive:
+        escalation = EscalationScheduler(args.conclusive_below, args.conclusive_from, prescreen=prescreen)
+    elif prescreen:
+        # Pre-screen only: no heuristic score is conclusive on its own
+        escalation = EscalationScheduler(conclusive_below=-1, conclusive_from=101, prescreen=prescreen)
+
+    limits = {"maps": args.maps_concurrency, "serp": args.serp_concurrency, "gemini": args.gemini_concurrency}
+    limits = {name: n for name, n in limits.items() if n}
+
+    case_store = CaseStore(args.case_store) if args.case_store else None
+
+    def progress(record):
+        print(f"[{record['status'].upper()}] {record['case_id']} ({record['elapsed']}s) score={record.get('trust_score')}")
+        if case_store and record['status'] == "ok":
+            case_store.append(record)
+
+    try:
+        summary = run_batch(
+            args.input, args.output,
+            maps_key=os.getenv("GOOGLE_MAPS_API_KEY"),
+            serp_key=os.getenv("SERPAPI_KEY"),
+            gemini_key=os.getenv("GEMINI_API_KEY"),
+            workers=args.workers, limits=limits, cache=cache,
+            audit_batch_size=args.audit_batch_size, entity_index=entity_index, on_record=progress,
+            triage=args.triage, escalate_below=args.escalate_below, escalation=escalation, review_index=review_index,
+            spatial_index=spatial_index, async_mode=args.async_mode, in_flight=args.in_flight, case_timeout=args.case_timeout,
+            processes=args.processes, gemini_rpm=args.gemini_rpm,
+        )
+    finally:
+        if case_store:
+            case_store.close()
+    print(f"Batch complete: {summary}")
+    if cache:
+        print(f"Cache: {cache.stats()}")
+    if escalation:
+        print(f"Escalation: {escalation.summary()}")
+    if summary.get('deferred'):
+        print(f"{summary['deferred']} case(s) deferred on API quota: re-run the same command to pick them up.")
+    if args.metrics_file:
+        write_prometheus(args.metrics_file)
+
+
+if __name__ == "__main__":
+    main()
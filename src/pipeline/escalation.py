@@ -0,0 +1,122 @@
+"""
+Tiered escalation: score with the deterministic heuristics first, and only send
+listings in the uncertain band to the Gemini auditor.
+
+    heuristic score <= conclusive_below   -> already a fraud pattern; no LLM call
+    heuristic score >= conclusive_from    -> clean on every heuristic; no LLM call
+    anything in between                   -> local pre-screen, if one is loaded and confident
+    otherwise                             -> full PolicyAuditorAgent.audit
+
+Skipped cases get a verdict with source="heuristic", built from the breakdown, so
+every downstream consumer still sees a normal verdict dict. The Risk Engine does
+not re-apply a penalty for it (the heuristics already did). A pre-screen verdict
+(source="prescreen") stands in for Gemini's, so its penalty does apply.
+"""
+import threading
+from src.utils.audit_schema import parse_audit_verdict
+from src.utils.metrics import count
+from src.utils.risk_engine import calculate_trust_score
+
+CONCLUSIVE_BELOW = 30
+CONCLUSIVE_FROM = 100
+
+# Which threat vector each heuristic penalty is evidence for
+PENALTY_VECTORS = (
+    ("Website", "ghost_business"),
+    ("Phone Number", "ghost_business"),
+    ("Digital Footprint", "osint_gap"),
+    ("Review Velocity", "review_fraud"),
+    ("Review Text", "review_fraud"),
+    ("Known-Bad", "lead_gen"),
+    ("shared with", "lead_gen"),
+    ("Pin Stacked", "ghost_business"),
+    ("Same-Category", "ghost_business"),
+)
+
+
+def _breakdown_evidence(breakdown):
+    """Verdict evidence from the risk engine's penalty lines, each mapped to its fraud vector."""
+    evidence = []
+    for item in breakdown:
+        vector = next((v for needle, v in PENALTY_VECTORS if needle in item), "osint_gap")
+        evidence.append({"vector": vector, "finding": item.split(": ", 1)[-1] + "."})
+    return evidence
+
+
+def heuristic_verdict(score, breakdown, conclusive_low):
+    """Verdict dict for a case the heuristics settled on their own."""
+    evidence = _breakdown_evidence(breakdown)
+    return parse_audit_verdict({
+        # No LLM reasoning behind it, so a likely fraud goes to a human check rather than straight to suspension
+        "verdict": "High" if conclusive_low else "Low",
+        "action": "Video Verify" if conclusive_low else "No Action",
+        "vector_scores": {e['vector']: 1.0 for e in evidence},
+        "evidence": evidence,
+        "discrepancies": [f"Gemini audit skipped: heuristic score {score} was conclusive."],
+    }, source="heuristic")
+
+
+def prescreen_verdict(verdict, confidence, breakdown):
+    """Verdict dict for a case the local pre-screen (src/utils/prescreen.py) was confident about."""
+    evidence = _breakdown_evidence(breakdown)
+    return parse_audit_verdict({
+        "verdict": verdict,
+        # As with heuristic verdicts: without LLM reasoning, risk goes to a human check
+        "action": "No Action" if verdict == "Low" else "Video Verify",
+        "vector_scores": {e['vector']: 1.0 for e in evidence},
+        "evidence": evidence,
+        "discrepancies": [f"Gemini audit skipped: local pre-screen predicted {verdict} with confidence {confidence:.2f}."],
+    }, source="prescreen")
+
+
+class EscalationScheduler:
+    def __init__(self, conclusive_below=CONCLUSIVE_BELOW, conclusive_from=CONCLUSIVE_FROM, prescreen=None):
+        self.conclusive_below = conclusive_below
+        self.conclusive_from = conclusive_from
+        self.prescreen = prescreen # Optional PreScreen: settles confident cases of the uncertain band locally
+        self.lock = threading.Lock()
+        self.counts = {"audited": 0, "skipped_low": 0, "skipped_high": 0, "prescreened": 0}
+
+    def triage(self, place_data, osint_data, entity_links=None, review_links=None, spatial_links=None):
+        """
+        Returns None when the case needs the Gemini audit, otherwise the heuristic
+        verdict to use in its place.
+        """
+        score, breakdown = calculate_trust_score(
+            place_data, osint_data, None, entity_links=entity_links, review_links=review_links, spatial_links=spatial_links
+        )
+        if score <= self.conclusive_below:
+            outcome = "skipped_low"
+        elif score >= self.conclusive_from:
+            outcome = "skipped_high"
+        else:
+            outcome = "audited"
+        verdict = None
+        if outcome == "audited" and self.prescreen:
+            predicted, confidence = self.prescreen.predict(
+                place_data, osint_data, entity_links=entity_links, review_links=review_links, spatial_links=spatial_links
+            )
+            if self.prescreen.confident(predicted, confidence):
+                outcome = "prescreened"
+                verdict = prescreen_verdict(predicted, confidence, breakdown)
+        with self.lock:
+            self.counts[outcome] += 1
+        count("sentinel_escalation_total", outcome=outcome)
+        if outcome == "audited":
+            return None
+        if verdict:
+            return verdict
+        return heuristic_verdict(score, breakdown, outcome == "skipped_low")
+
+    def avoided(self):
+        """LLM calls avoided so far."""
+        with self.lock:
+            return self.counts['skipped_low'] + self.counts['skipped_high'] + self.counts['prescreened']
+
+    def summary(self):
+        with self.lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        counts['llm_calls_avoided'] = counts['skipped_low'] + counts['skipped_high'] + counts['prescreened']
+        counts['avoided_share'] = round(counts['llm_calls_avoided'] / total, 3) if total else 0.0
+        return counts
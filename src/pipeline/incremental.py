@@ -0,0 +1,225 @@
+"""
+Incremental re-investigation for monitored listings.
+
+Keeps a per-place_id snapshot (contact fields, reviews keyed by author+time, the raw
+results of each SerpApi query, the last verdict and score) and on a re-check only:
+    * calls Place Details by place_id (no Text Search),
+    * re-runs a SerpApi query if the field it searches on changed,
+    * re-audits with Gemini if the fingerprint of the audit inputs changed,
+    * recomputes the trust score if any signal changed.
+A listing whose API quota runs out mid-check is written as "deferred" and its
+snapshot is left untouched, so the next sweep retries it.
+
+Usage:
+    python -m src.pipeline.incremental portfolio.csv sweep.jsonl
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+from src.agents.investigator import OsintInvestigatorAgent
+from src.agents.auditor import PolicyAuditorAgent
+from src.pipeline.batch import normalize_query, record_failure
+from src.services.http_client import QuotaExceededError
+from src.utils.cache import make_key
+from src.utils.risk_engine import calculate_trust_score
+
+CONTACT_FIELDS = ("name", "address", "phone", "website")
+
+
+def review_key(review):
+    return f"{review.get('author_name')}|{review.get('time')}"
+
+
+class SnapshotStore:
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS snapshots (place_id TEXT PRIMARY KEY, snapshot TEXT NOT NULL, updated_at REAL NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS queries (query TEXT PRIMARY KEY, place_id TEXT NOT NULL)")
+
+    def get(self, place_id):
+        with self.lock:
+            row = self.conn.execute("SELECT snapshot FROM snapshots WHERE place_id = ?", (place_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def place_id_for(self, query):
+        with self.lock:
+            row = self.conn.execute("SELECT place_id FROM queries WHERE query = ?", (normalize_query(query),)).fetchone()
+        return row[0] if row else None
+
+    def put(self, snapshot, query=None):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)",
+                (snapshot['place_id'], json.dumps(snapshot, default=str), time.time())
+            )
+            if query:
+                self.conn.execute("INSERT OR REPLACE INTO queries VALUES (?, ?)", (normalize_query(query), snapshot['place_id']))
+
+
+class IncrementalInvestigator:
+    def __init__(self, investigator, auditor, store):
+        self.investigator = investigator
+        self.auditor = auditor
+        self.store = store
+
+    def check(self, query=None, place_id=None):
+        """
+        Re-checks one listing. Returns a result dict with place_data, osint_data, audit,
+        trust_score, breakdown, plus `changes` (what differed) and `calls` (what was fetched).
+        Returns None if the listing can't be found.
+        """
+        maps = self.investigator.maps_service
+        calls = {"text_search": 0, "details": 0, "serp": 0, "gemini": 0}
+
+        # Step 1: Ground truth, by place_id whenever we know it
+        if maps.is_demo:
+            place_data = maps.get_place_details(query or place_id)
+            place_id = place_id or f"demo:{place_data['name']}"
+        else:
+            place_id = place_id or self.store.place_id_for(query)
+            if not place_id:
+                calls["text_search"] += 1
+                hit = maps.search_place(query)
+                if not hit:
+                    return None
+                place_id = hit['place_id']
+            calls["details"] += 1
+            place_data = maps.get_place_details_by_id(place_id)
+
+        previous = self.store.get(place_id) or {}
+        snapshot = {"place_id": place_id}
+
+        # Step 2: Contact delta
+        contact = {field: place_data.get(field) for field in CONTACT_FIELDS}
+        old_contact = previous.get('contact', {})
+        changed_fields = [field for field in CONTACT_FIELDS if contact[field] != old_contact.get(field)]
+        snapshot['contact'] = contact
+
+        # Step 3: Review delta. Details only returns the latest few, so history accumulates here.
+        reviews = dict(previous.get('reviews', {}))
+        new_reviews = [r for r in place_data.get('reviews', []) if review_key(r) not in reviews]
+        for review in new_reviews:
+            reviews[review_key(review)] = review
+        snapshot['reviews'] = reviews
+        place_data = {**place_data, "reviews": sorted(reviews.values(), key=lambda r: r.get('time') or 0, reverse=True)}
+
+        # Step 4: OSINT delta. Each query re-runs only if what it searches on changed.
+        osint = dict(previous.get('osint', {}))
+        serp = self.investigator.serp_service
+        if serp.is_demo:
+            osint = {"name_address": serp.get_demo_footprint(contact['name'] or ''), "phone": []}
+        else:
+            searches = {
+                "name_address": (("name", "address"), lambda: serp.search_name_address(contact['name'], contact['address'])),
+                "phone": (("phone",), lambda: serp.search_phone(contact['phone'])),
+            }
+            for name, (fields, search) in searches.items():
+                if name in osint and not set(fields) & set(changed_fields):
+                    continue
+                calls["serp"] += 1
+                try:
+                    osint[name] = search()
+                except QuotaExceededError:
+                    raise # Never audit a footprint we didn't fetch: the whole check is deferred
+                except Exception as e:
+                    print(f"SerpApi Error: {e}")
+                    osint.pop(name, None) # Retry on the next sweep
+        snapshot['osint'] = osint
+        if serp.is_demo:
+            osint_data = osint['name_address']
+        else:
+            osint_data = serp.merge_results(osint.get('name_address', []), osint.get('phone', []))
+        osint_changed = osint != previous.get('osint')
+
+        # Step 5: Audit only if its inputs changed
+        fingerprint = make_key(contact, sorted(reviews), [r.get('link') or r.get('title') for r in osint_data])
+        # Only a real Gemini verdict is reused; a fallback from an outage is retried on every sweep
+        if (previous.get('audit') or {}).get('source') == "gemini" and previous.get('fingerprint') == fingerprint:
+            audit = previous['audit']
+        else:
+            calls["gemini"] += 1
+            audit = self.auditor.audit(place_data, osint_data)
+        snapshot['fingerprint'] = fingerprint
+        snapshot['audit'] = audit
+
+        # Step 6: Rescore only if a signal moved
+        changes = {
+            "contact_fields": changed_fields,
+            "new_reviews": len(new_reviews),
+            "osint": osint_changed,
+            "audit": calls["gemini"] > 0,
+        }
+        entity_index = self.investigator.entity_index
+        entity_links = None
+        if entity_index:
+            entity_index.add_listing(place_data, osint_data)
+            entity_links = entity_index.links(place_data, osint_data)
+            # Other listings joining a ring is a change too, even if this one didn't move
+            changes["entity_links"] = entity_links != previous.get('entity_links')
+        snapshot['entity_links'] = entity_links
+        if previous and not (changed_fields or new_reviews or osint_changed or changes["audit"] or changes.get("entity_links")):
+            trust_score, breakdown = previous['trust_score'], previous['breakdown']
+        else:
+            trust_score, breakdown = calculate_trust_score(place_data, osint_data, audit, entity_links=entity_links)
+        snapshot['trust_score'] = trust_score
+        snapshot['breakdown'] = breakdown
+        snapshot['checked_at'] = int(time.time())
+
+        self.store.put(snapshot, query=query)
+        return {
+            "place_id": place_id,
+            "place_data": place_data,
+            "osint_data": osint_data,
+            "audit": audit,
+            "trust_score": trust_score,
+            "breakdown": breakdown,
+            "previous_score": previous.get('trust_score'),
+            "changes": changes,
+            "calls": calls,
+        }
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Nightly re-sweep of a monitored portfolio (fetches deltas only).")
+    parser.add_argument("portfolio", help="CSV with `place_id` and/or `query` columns")
+    parser.add_argument("output", help="JSONL file for the sweep results")
+    parser.add_argument("--snapshots", default=".cache/snapshots.sqlite")
+    args = parser.parse_args(argv)
+
+    investigator = OsintInvestigatorAgent(os.getenv("GOOGLE_MAPS_API_KEY"), os.getenv("SERPAPI_KEY"))
+    auditor = PolicyAuditorAgent(os.getenv("GEMINI_API_KEY"))
+    checker = IncrementalInvestigator(investigator, auditor, SnapshotStore(args.snapshots))
+
+    totals = {"text_search": 0, "details": 0, "serp": 0, "gemini": 0}
+    with open(args.portfolio, newline='', encoding='utf-8') as f, open(args.output, 'a', encoding='utf-8') as out:
+        for row in csv.DictReader(f):
+            try:
+                result = checker.check(query=row.get('query') or None, place_id=row.get('place_id') or None)
+            except Exception as e:
+                failed = dict(row)
+                record_failure(failed, e)
+                out.write(json.dumps(failed) + "\n")
+                continue
+            if result is None:
+                out.write(json.dumps({**row, "status": "not_found"}) + "\n")
+                continue
+            for name, n in result['calls'].items():
+                totals[name] += n
+            out.write(json.dumps({**row, "status": "ok", **result}, default=str) + "\n")
+            print(f"[{result['place_id']}] score {result['previous_score']} -> {result['trust_score']} changes={result['changes']}")
+    print(f"Sweep complete. Upstream calls: {totals}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""
+Headless investigation service.
+
+Runs the dashboard's pipeline (Investigator -> escalation -> Auditor -> Risk Engine)
+behind a small local HTTP/JSON API. Concurrent requests for the same listing share
+one in-flight computation (single-flight): the first request runs the pipeline,
+every later one replays and then follows the same event stream, and all of them
+get the same case. Distinct computations are admitted up to `max_in_flight`
+running plus `max_queued` waiting. Anything beyond that is refused with 503 and
+Retry-After, so a surge never becomes an unbounded thread pile.
+
+    python -m src.pipeline.service --port 8600
+
+    POST /investigate   {"query": "...", "place_id": null, "skip_conclusive": false, "stream": true}
+                        stream=true: NDJSON events (log/place/osint/investigated/token/...), last one
+                        {"type": "case"} or {"type": "error"}; otherwise only that last event as JSON
+    GET  /health        admission state
+    GET  /metrics       Prometheus text
+
+The dashboard talks to it when SENTINEL_SERVICE_URL is set (see CaseServiceClient),
+and otherwise runs the same CaseService in-process.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.agents.investigator import OsintInvestigatorAgent
+from src.agents.auditor import PolicyAuditorAgent
+from src.pipeline.batch import normalize_query
+from src.pipeline.escalation import EscalationScheduler
+from src.services.http_client import QuotaExceededError, UpstreamError
+from src.services.serp_api import is_error_results
+from src.utils.cache import ResponseCache, make_key
+from src.utils.metrics import trace, count, to_prometheus
+from src.utils.risk_engine import calculate_trust_score
+
+MAX_IN_FLIGHT = 4
+MAX_QUEUED = 16
+RETRY_AFTER = 5 # Seconds suggested to refused clients
+
+ERROR_STATUS = {"not_found": 404, "quota": 429, "bad_request": 400, "upstream": 502, "internal": 500}
+
+
+def cacheable_case(case):
+    """Only live results are shared: no fallback audit, no SerpApi error marker (as in ResponseCache)."""
+    return (case.get('audit') or {}).get('source') == "gemini" and not is_error_results(case.get('osint_data'))
+
+
+class Overloaded(Exception):
+    """Admission refused: every run slot and queue slot is taken."""
+
+    def __init__(self, retry_after=RETRY_AFTER):
+        super().__init__(f"Investigation service is at capacity, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def case_key(query, keys, skip_conclusive=False, place_id=None):
+    """Cache and single-flight key. Demo and live runs differ; whose API key was used doesn't."""
+    target = normalize_query(query) if not place_id else make_key("place_id", place_id)
+    return make_key(target, *(bool(k) for k in keys), skip_conclusive)
+
+
+class CasePipeline:
+    """The dashboard pipeline as a generator of JSON-safe events. No caching or admission here."""
+
+    def __init__(self, cache=None, entity_index=None, review_index=None, spatial_index=None):
+        self.cache = cache
+        self.entity_index = entity_index
+        self.review_index = review_index
+        self.spatial_index = spatial_index
+
+    def stream(self, query, place_id=None, skip_conclusive=False, keys=(None, None, None)):
+        with trace() as case_trace:
+            case = yield from self._stream(query, place_id, skip_conclusive, keys)
+        if case:
+            case['stage_ms'] = {stage: seconds * 1000 for stage, seconds in case_trace.stage_totals().items()}
+            case['wall_ms'] = case_trace.wall_seconds() * 1000
+            yield {"type": "case", "case": case}
+
+    def _stream(self, query, place_id, skip_conclusive, keys):
+        maps_key, serp_key, gemini_key = keys
+        investigator = OsintInvestigatorAgent(maps_key, serp_key, cache=self.cache, entity_index=self.entity_index)
+        auditor = PolicyAuditorAgent(gemini_key, cache=self.cache)
+
+        # Step 1: Investigation
+        place_data, osint_data = None, None
+        try:
+            for event in investigator.investigate_stream(query, place_id=place_id):
+                if event['type'] == "result":
+                    place_data, osint_data = event['place_data'], event['osint_data']
+                else:
+                    yield {**event, "agent": "investigator"}
+        except QuotaExceededError:
+            yield {"type": "error", "error": "quota", "message": "Maps/SerpApi quota exhausted on every key. Please re-run the investigation shortly."}
+            return None
+        except UpstreamError as e:
+            yield {"type": "error", "error": "upstream", "message": f"Google Maps is unavailable ({e}). Please retry."}
+            return None
+        if not place_data:
+            yield {"type": "error", "error": "not_found", "message": "Business not found on Google Maps. Please check the query."}
+            return None
+        yield {"type": "investigated", "place_data": place_data, "osint_data": osint_data}
+
+        entity_links = self.entity_index.links(place_data, osint_data) if self.entity_index else None
+        review_links = self.review_index.add_listing(place_data) if self.review_index else None
+        spatial_links = self.spatial_index.add_listing(place_data) if self.spatial_index else None
+
+        # Step 2: Audit (unless the heuristics already settled it)
+        audit = None
+        if skip_conclusive:
+            audit = EscalationScheduler().triage(
+                place_data, osint_data, entity_links=entity_links, review_links=review_links, spatial_links=spatial_links
+            )
+        if audit:
+            yield {"type": "audit_skipped"}
+        else:
+            try:
+                for event in auditor.audit_stream(place_data, osint_data):
+                    if event['type'] == "result":
+                        audit = event['audit']
+                    else:
+                        yield {**event, "agent": "auditor"}
+            except QuotaExceededError:
+                yield {"type": "error", "error": "quota", "message": "Gemini quota exhausted after retries. Please re-run the investigation shortly."}
+                return None
+
+        # Step 3: Score
+        trust_score, breakdown = calculate_trust_score(
+            place_data, osint_data, audit, entity_links=entity_links, review_links=review_links, spatial_links=spatial_links
+        )
+        return {
+            "query": query,
+            "analysis_id": int(time.time()),
+            "place_data": place_data,
+            "osint_data": osint_data,
+            "audit": audit,
+            "entity_links": entity_links,
+            "review_links": review_links,
+            "spatial_links": spatial_links,
+            "trust_score": trust_score,
+            "breakdown": breakdown,
+        }
+
+
+class _Flight:
+    """One in-flight computation: an append-only event log that any number of callers follow."""
+
+    def __init__(self):
+        self.events = []
+        self.done = False
+        self.cond = threading.Condition()
+
+    def publish(self, event):
+        with self.cond:
+            self.events.append(event)
+            self.cond.notify_all()
+
+    def finish(self):
+        with self.cond:
+            self.done = True
+            self.cond.notify_all()
+
+    def follow(self):
+        """Replays every event so far, then yields new ones until the flight finishes."""
+        seen = 0
+        while True:
+            with self.cond:
+                while seen >= len(self.events) and not self.done:
+                    self.cond.wait()
+                batch = self.events[seen:]
+                finished = self.done
+            seen += len(batch)
+            yield from batch
+            if finished and seen >= len(self.events):
+                return
+
+
+class CaseService:
+    """
+    Single-flight + admission control in front of a CasePipeline. Finished cases go
+    to the shared case cache (and the case store), so later requests for the same
+    listing don't even start a flight.
+    """
+
+    def __init__(self, pipeline, cache=None, case_store=None, max_in_flight=MAX_IN_FLIGHT, max_queued=MAX_QUEUED):
+        self.pipeline = pipeline
+        self.cache = cache
+        self.case_store = case_store
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="case")
+        self.lock = threading.Lock()
+        self.flights = {}   # case key -> _Flight
+        self.admitted = 0   # flights running or queued
+
+    def stream(self, query, place_id=None, skip_conclusive=False, keys=(None, None, None)):
+        """
+        Returns an iterator of pipeline events for this listing. Raises Overloaded
+        right away (before any event) when the request can't be admitted.
+        """
+        key = case_key(query, keys, skip_conclusive, place_id)
+        if self.cache:
+            hit, case = self.cache.get("case", key)
+            if hit and cacheable_case(case): # Also ignores degraded entries cached before this check existed
+                count("sentinel_service_requests_total", outcome="cached")
+                return iter([{"type": "case", "case": case, "cached": True}])
+
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight:
+                outcome = "coalesced"
+            elif self.admitted >= self.max_in_flight + self.max_queued:
+                outcome = "rejected"
+            else:
+                outcome = "started"
+                flight = self.flights[key] = _Flight()
+                self.admitted += 1
+        count("sentinel_service_requests_total", outcome=outcome)
+        if outcome == "rejected":
+            raise Overloaded()
+        if outcome == "started":
+            self.pool.submit(self._run, key, flight, query, place_id, skip_conclusive, keys)
+        return flight.follow()
+
+    def investigate(self, query, place_id=None, skip_conclusive=False, keys=(None, None, None)):
+        """Blocking variant: the final {"type": "case"} or {"type": "error"} event."""
+        event = None
+        for event in self.stream(query, place_id=place_id, skip_conclusive=skip_conclusive, keys=keys):
+            pass
+        return event
+
+    def _run(self, key, flight, query, place_id, skip_conclusive, keys):
+        try:
+            for event in self.pipeline.stream(query, place_id=place_id, skip_conclusive=skip_conclusive, keys=keys):
+                if event['type'] == "case":
+                    self._store(key, event['case'])
+                flight.publish(event)
+        except Exception as e:
+            print(f"Investigation Service Error: {e}")
+            flight.publish({"type": "error", "error": "internal", "message": f"{type(e).__name__}: {e}"})
+        finally:
+            # Unregister before waking followers: by now the cache answers repeats
+            with self.lock:
+                del self.flights[key]
+                self.admitted -= 1
+            flight.finish()
+
+    def _store(self, key, case):
+        if self.cache and cacheable_case(case):
+            self.cache.set("case", key, case)
+        if self.case_store:
+            self.case_store.append(case)
+
+    def status(self):
+        with self.lock:
+            return {
+                "flights": len(self.flights),
+                "running": min(self.admitted, self.max_in_flight),
+                "queued": max(0, self.admitted - self.max_in_flight),
+                "max_in_flight": self.max_in_flight,
+                "max_queued": self.max_queued,
+            }
+
+
+class CaseServiceClient:
+    """CaseService.stream() over HTTP, for a dashboard in front of `python -m src.pipeline.service`."""
+
+    def __init__(self, url, timeout=(3.05, 300)):
+        import requests
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def stream(self, query, place_id=None, skip_conclusive=False, keys=(None, None, None)):
+        maps_key, serp_key, gemini_key = keys
+        response = self.session.post(f"{self.url}/investigate", json={
+            "query": query, "place_id": place_id, "skip_conclusive": skip_conclusive, "stream": True,
+            "keys": {"maps": maps_key, "serp": serp_key, "gemini": gemini_key},
+        }, stream=True, timeout=self.timeout)
+        if response.status_code == 503:
+            response.close()
+            raise Overloaded(int(response.headers.get('Retry-After', RETRY_AFTER)))
+        if response.status_code != 200:
+            response.close()
+            return iter([{"type": "error", "error": "internal", "message": f"Investigation service HTTP {response.status_code}"}])
+        return self._events(response)
+
+    def _events(self, response):
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    yield json.loads(line)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    service = None           # CaseService, set by make_server()
+    default_keys = (None, None, None)
+
+    def do_GET(self):
+        if self.path.startswith("/health"):
+            self._json(200, {"status": "ok", **self.service.status()})
+        elif self.path.startswith("/metrics"):
+            self._send(200, to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            self._json(404, {"error": "not_found"})
+
+    def do_POST(self):
+        if not self.path.startswith("/investigate"):
+            self._json(404, {"error": "not_found"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b"{}")
+        except ValueError:
+            self._json(400, {"type": "error", "error": "bad_request", "message": "Body must be JSON"})
+            return
+        query = (request.get('query') or "").strip()
+        place_id = request.get('place_id') or None
+        if not query and not place_id:
+            self._json(400, {"type": "error", "error": "bad_request", "message": "`query` or `place_id` is required"})
+            return
+
+        # Keys sent by the caller (the dashboard's sidebar) win over the server's environment
+        sent = request.get('keys') or {}
+        keys = tuple(sent.get(name) or default for name, default in zip(("maps", "serp", "gemini"), self.default_keys))
+        try:
+            events = self.service.stream(query or place_id, place_id=place_id, skip_conclusive=bool(request.get('skip_conclusive')), keys=keys)
+        except Overloaded as e:
+            self._json(503, {"type": "error", "error": "overloaded", "message": str(e)}, {"Retry-After": str(e.retry_after)})
+            return
+
+        if request.get('stream'):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            try:
+                for event in events:
+                    self.wfile.write(json.dumps(event, default=str).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass # Client left; the flight carries on for everyone else
+            return
+
+        event = None
+        for event in events:
+            pass
+        status = 200 if event['type'] == "case" else ERROR_STATUS.get(event.get('error'), 500)
+        self._json(status, event, {"Retry-After": str(RETRY_AFTER)} if status == 429 else None)
+
+    def _json(self, status, payload, headers=None):
+        self._send(status, json.dumps(payload, default=str).encode("utf-8"), "application/json", headers)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(service, host="127.0.0.1", port=8600, default_keys=(None, None, None)):
+    """ThreadingHTTPServer serving `service`. Call serve_forever() on it."""
+    handler = type("Handler", (ServiceHandler,), {"service": service, "default_keys": default_keys})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+    load_dotenv()
+    from src.utils.case_store import CaseStore
+    from src.utils.entity_index import EntityIndex
+    from src.utils.review_similarity import ReviewSimilarityIndex
+    from src.utils.spatial_index import SpatialIndex
+
+    parser = argparse.ArgumentParser(description="Serve the SentinelMap pipeline over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1", help="bind address (the API accepts API keys, keep it local)")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT, help="distinct investigations running at once")
+    parser.add_argument("--max-queued", type=int, default=MAX_QUEUED, help="distinct investigations waiting; beyond this requests get 503")
+    parser.add_argument("--cache", default=os.getenv("SENTINEL_CACHE_PATH", ".cache/responses.sqlite"))
+    parser.add_argument("--case-ttl", type=int, default=3600, help="seconds a finished case answers repeat requests")
+    args = parser.parse_args(argv)
+
+    cache = ResponseCache(path=args.cache, ttls={"case": args.case_ttl})
+    pipeline = CasePipeline(
+        cache=cache,
+        entity_index=EntityIndex(os.getenv("SENTINEL_ENTITY_INDEX", ".cache/entities.sqlite")),
+        review_index=ReviewSimilarityIndex(os.getenv("SENTINEL_REVIEW_INDEX", ".cache/reviews.sqlite")),
+        spatial_index=SpatialIndex(os.getenv("SENTINEL_SPATIAL_INDEX", ".cache/places.sqlite")),
+    )
+    try:
+        case_store = CaseStore(os.getenv("SENTINEL_CASE_STORE", ".cache/cases"), flush_every=1)
+    except ImportError as e:
+        print(f"Case Store disabled: {e}")
+        case_store = None
+    service = CaseService(pipeline, cache=cache, case_store=case_store, max_in_flight=args.max_in_flight, max_queued=args.max_queued)
+    keys = (os.getenv("GOOGLE_MAPS_API_KEY"), os.getenv("SERPAPI_KEY"), os.getenv("GEMINI_API_KEY"))
+    server = make_server(service, args.host, args.port, default_keys=keys)
+    print(f"Investigation service on http://{args.host}:{args.port} (in flight {args.max_in_flight}, queued {args.max_queued})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if case_store:
+            case_store.close()
+
+
+if __name__ == "__main__":
+    main()
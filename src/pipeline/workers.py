@@ -0,0 +1,241 @@
+"""
+Multi-process batch runner: a pool of pre-forked worker processes that keep warm
+clients (googlemaps, pooled HTTP sessions, the response cache) for the whole run,
+so no case pays for imports or client setup.
+
+Workers do the per-case work: the Maps/SerpApi investigation and its parsing,
+review signatures, and the Gemini audit with its prompt compilation, verdict
+parsing and scoring. The parent owns what is shared across listings: the
+entity/review/spatial indexes and escalation. Cross-listing signals therefore
+still see every listing of the run, whichever worker fetched it. Workers read a
+copy of the entity index for the known-bad skip and --triage, refreshed between
+chunks, so a listing reaches them once the parent has indexed it.
+
+On Linux the workers fork from a forkserver that has already imported the
+pipeline. Per-service concurrency limits and the Gemini rpm cap are split across
+the processes, so the totals match a threaded run with the same flags.
+
+    python -m src.pipeline.batch queue.csv results.jsonl --processes 4 --workers 16
+"""
+import math
+import multiprocessing
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from src.pipeline.batch import BatchRunner, DEFAULT_LIMITS, STATUSES
+from src.services.http_client import get_shared_client
+from src.services.maps_api import get_shared_gmaps_client
+from src.utils.cache import ResponseCache
+from src.utils.entity_index import EntityIndex
+from src.utils.review_similarity import sign_reviews
+from src.utils.risk_engine import TRIAGE_ESCALATE_BELOW
+
+# Per-process state, set up once by _init_worker
+_runner = None
+_threads = None
+_sign_reviews = False
+
+
+def _context():
+    # forkserver: workers fork from a process that already imported the pipeline
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["src.pipeline.workers"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _init_worker(config):
+    global _runner, _threads, _sign_reviews
+    maps_key, serp_key, gemini_key = config['keys']
+    limits = config['limits']
+    # Warm the shared clients before the first case arrives
+    get_shared_client("maps", pool_size=limits['maps'])
+    get_shared_client("gemini", pool_size=limits['gemini'], requests_per_minute=config['gemini_rpm'])
+    if maps_key:
+        try:
+            get_shared_gmaps_client(maps_key)
+        except Exception:
+            pass # MapsService reports a bad key (and falls back to demo) per agent, as before
+    if serp_key:
+        import serpapi # noqa: F401
+    cache = ResponseCache(path=config['cache_path'], ttls=config['cache_ttls']) if config['cache_path'] else None
+    entity_index = _WorkerEntityIndex(**config['entity_index']) if config['entity_index'] is not None else None
+    _runner = BatchRunner(
+        maps_key, serp_key, gemini_key, workers=config['threads'], limits=limits, cache=cache, entity_index=entity_index,
+        audit_batch_size=config['audit_batch_size'], triage=config['triage'], escalate_below=config['escalate_below'],
+    )
+    _threads = ThreadPoolExecutor(max_workers=config['threads'])
+    _sign_reviews = config['sign_reviews']
+
+
+class _WorkerEntityIndex(EntityIndex):
+    """
+    A worker's read-only copy of the parent's EntityIndex, for the known-bad skip and
+    the triage links. The parent indexes every listing. A SQLite-backed index is read
+    from its file, and refresh() pulls in what the parent has written since; an
+    in-memory one is the snapshot taken when the pool started.
+    """
+
+    def __init__(self, path=None, index=None, bad=None):
+        super().__init__()
+        for entity, listing_ids in (index or {}).items():
+            self.index[entity] = set(listing_ids)
+        self.bad.update(bad or {})
+        self.reader = sqlite3.connect(path, check_same_thread=False) if path else None
+        self.last_rowid = 0
+        self.refresh()
+
+    def refresh(self):
+        if not self.reader:
+            return
+        with self.lock:
+            for rowid, kind, key, lid in self.reader.execute("SELECT rowid, kind, key, listing_id FROM entities WHERE rowid > ?", (self.last_rowid,)):
+                self.index[(kind, key)].add(lid)
+                self.last_rowid = max(self.last_rowid, rowid)
+            for kind, key, reason in self.reader.execute("SELECT kind, key, reason FROM bad_entities"):
+                self.bad[(kind, key)] = reason
+
+    def add_listing(self, place_data, osint_data=None):
+        return None
+
+
+def _ready(_):
+    return os.getpid()
+
+
+def _investigate(case):
+    record = _runner.investigate_case(case)
+    if _sign_reviews and record['status'] == "needs_audit":
+        record['review_signatures'] = sign_reviews(record['place_data'].get('reviews') or [])
+    return record
+
+
+def _investigate_chunk(cases):
+    if _runner.entity_index:
+        _runner.entity_index.refresh() # Between chunks, so no thread is mid-lookup
+    return list(_threads.map(_investigate, cases))
+
+
+def _audit_one(record):
+    _, auditor = _runner._agents()
+    return _runner._audit_records([record], lambda cases: [auditor.audit(*cases[0])])[0]
+
+
+def _audit_chunk(records):
+    """Audits + scores records the parent has already run through the indexes and escalation."""
+    size = _runner.audit_batch_size
+    if size > 1:
+        packs = [records[i:i + size] for i in range(0, len(records), size)]
+        return [record for pack in _threads.map(_runner.audit_batch, packs) for record in pack]
+    return list(_threads.map(_audit_one, records))
+
+
+def _entity_snapshot(entity_index):
+    """What a worker needs to rebuild `entity_index`: its SQLite path, or its contents when it only lives in memory."""
+    if entity_index is None:
+        return None
+    if entity_index.path:
+        return {"path": entity_index.path}
+    with entity_index.lock:
+        return {"index": {entity: set(ids) for entity, ids in entity_index.index.items()}, "bad": dict(entity_index.bad)}
+
+
+class ProcessBatchRunner(BatchRunner):
+    def __init__(self, maps_key=None, serp_key=None, gemini_key=None, processes=None, workers=8, limits=None, cache=None, audit_batch_size=1, entity_index=None, triage=False, escalate_below=TRIAGE_ESCALATE_BELOW, escalation=None, review_index=None, spatial_index=None, gemini_rpm=None):
+        super().__init__(
+            maps_key, serp_key, gemini_key, workers=workers, limits=limits, cache=cache, audit_batch_size=audit_batch_size,
+            entity_index=entity_index, triage=triage, escalate_below=escalate_below, escalation=escalation,
+            review_index=review_index, spatial_index=spatial_index,
+        )
+        self.processes = processes or os.cpu_count() or 1
+        limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.config = {
+            "keys": self.keys,
+            "threads": workers, # Threads per worker process
+            "limits": {name: max(1, math.ceil(n / self.processes)) for name, n in limits.items()},
+            "gemini_rpm": gemini_rpm / self.processes if gemini_rpm else None,
+            # Only a disk cache can be shared; an in-memory one stays in the parent
+            "cache_path": getattr(cache, 'path', None),
+            "cache_ttls": getattr(cache, 'ttls', None),
+            "audit_batch_size": audit_batch_size,
+            "triage": triage,
+            "escalate_below": escalate_below,
+            "sign_reviews": review_index is not None,
+            "entity_index": _entity_snapshot(entity_index),
+        }
+
+    def run(self, cases, sink, on_record=None):
+        """BatchRunner.run() across `processes` warm worker processes (`workers` threads each)."""
+        done = sink.finished_ids()
+        summary = dict.fromkeys(("skipped",) + STATUSES, 0)
+        in_flight = {} # future -> the chunk it carries
+        awaiting_audit = []
+        chunk_size = self.config['threads']
+        audit_chunk = max(chunk_size, self.audit_batch_size)
+
+        def finish(record):
+            sink.write(record)
+            summary[record['status']] += 1
+            if on_record:
+                on_record(record)
+
+        def drain(pool, finished):
+            for future in finished:
+                chunk = in_flight.pop(future)
+                try:
+                    records = future.result()
+                except Exception as e:
+                    # A worker died: fail its chunk (retried on resume), the rest of the run carries on
+                    error = f"{type(e).__name__}: {e}"
+                    records = [{"case_id": c['case_id'], "query": c['query'], "status": "error", "error": error, "elapsed": c.get('elapsed', 0.0)} for c in chunk]
+                for record in records:
+                    if record['status'] == "needs_audit":
+                        # Fresh from investigation (audited records come back ok/error): indexes and escalation live here
+                        signed = record.pop('review_signatures', None)
+                        if self.entity_index:
+                            # Workers only read the index, so the listing is indexed here
+                            self.entity_index.add_listing(record['place_data'], record['osint_data'])
+                        self._investigated(record, record['place_data'], record['osint_data'], signed)
+                    if record['status'] == "needs_audit":
+                        awaiting_audit.append(record)
+                    else:
+                        finish(record)
+            while len(awaiting_audit) >= audit_chunk:
+                submit(pool, _audit_chunk, awaiting_audit[:audit_chunk])
+                del awaiting_audit[:audit_chunk]
+
+        def submit(pool, task, chunk):
+            in_flight[pool.submit(task, chunk)] = chunk
+
+        try:
+            with ProcessPoolExecutor(self.processes, mp_context=_context(), initializer=_init_worker, initargs=(self.config,)) as pool:
+                # Pre-fork every worker (and warm it) before the queue starts
+                list(pool.map(_ready, range(self.processes)))
+                chunk = []
+                for case in cases:
+                    if case['case_id'] in done:
+                        summary['skipped'] += 1
+                        continue
+                    done.add(case['case_id'])
+                    chunk.append(case)
+                    if len(chunk) < chunk_size:
+                        continue
+                    submit(pool, _investigate_chunk, chunk)
+                    chunk = []
+                    while len(in_flight) >= self.processes * 2:
+                        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        drain(pool, finished)
+                if chunk:
+                    submit(pool, _investigate_chunk, chunk)
+                while in_flight or awaiting_audit:
+                    if not in_flight:
+                        submit(pool, _audit_chunk, awaiting_audit[:])
+                        awaiting_audit.clear()
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    drain(pool, finished)
+        finally:
+            sink.close()
+        if self.escalation:
+            summary['llm_calls_avoided'] = self.escalation.avoided()
+        return summary
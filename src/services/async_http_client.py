@@ -0,0 +1,176 @@
+"""
+Async counterpart of http_client.PooledHttpClient, for the async service variants.
+
+One aiohttp session per service and event loop. The connector caps connections
+per host, so a process with hundreds of cases in flight still opens a bounded
+number of sockets to each API. Retries, Retry-After handling and the
+UpstreamError / QuotaExceededError contract are the same as the sync client.
+
+Cancellation is never swallowed. If the task awaiting a request is cancelled,
+for example by a per-case `asyncio.timeout`, the request is cancelled too, and
+so is any backoff sleep it is in.
+
+    client = get_shared_async_client("maps", limit_per_host=20)
+    status, payload = await client.request_json("GET", url, params={...}, timeout=10)
+"""
+import asyncio
+import json
+import threading
+import time
+import weakref
+from src.services.http_client import RetryPolicy, UpstreamError, QuotaExceededError
+
+
+def _aiohttp():
+    # aiohttp is only needed by the async services, so import it lazily
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError("The async services require `aiohttp` (pip install aiohttp)")
+    return aiohttp
+
+
+class AsyncRateLimiter:
+    """Token bucket for coroutines: each call reserves a token, then sleeps until it is due."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock() # Several event loops (threads) may share one limiter
+
+    async def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class AsyncHttpClient:
+    def __init__(self, pool_size=100, limit_per_host=20, retry=None, rate_limiter=None, timeout=(3.05, 30)):
+        _aiohttp()
+        self.pool_size = pool_size
+        self.limit_per_host = limit_per_host
+        self.retry = retry or RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout # (connect, read), like the sync client
+        self.sessions = weakref.WeakKeyDictionary() # event loop -> ClientSession
+
+    def _session(self):
+        # aiohttp sessions are bound to the loop they were created on
+        aiohttp = _aiohttp()
+        loop = asyncio.get_running_loop()
+        session = self.sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.limit_per_host, ttl_dns_cache=300)
+            connect, read = self.timeout
+            session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+            )
+            self.sessions[loop] = session
+        return session
+
+    def _timeout(self, timeout):
+        if timeout is None:
+            return None
+        return _aiohttp().ClientTimeout(total=timeout)
+
+    async def request_json(self, method, url, timeout=None, **kwargs):
+        """
+        Returns (status, payload) for the first non-retryable response. The payload
+        is None when the body isn't JSON. `timeout` (seconds) bounds each attempt.
+        Raises QuotaExceededError / UpstreamError like PooledHttpClient.request.
+        """
+        async with _RetryingRequest(self, method, url, timeout, kwargs) as response:
+            body = await response.read()
+        try:
+            return response.status, json.loads(body) if body else None
+        except ValueError:
+            return response.status, None
+
+    async def stream_lines(self, method, url, timeout=None, **kwargs):
+        """
+        Async generator over the response body's lines (decoded, newline stripped),
+        for server-sent events. Yields ("status", code) first so callers can stop early.
+        """
+        async with _RetryingRequest(self, method, url, timeout, kwargs) as response:
+            yield "status", response.status
+            async for line in response.content:
+                yield "line", line.decode("utf-8").rstrip("\r\n")
+
+    async def close(self):
+        """Closes the session of the running loop (call before the loop shuts down)."""
+        session = self.sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+
+class _RetryingRequest:
+    """`async with` wrapper: retries retryable statuses and connection errors, then hands back the response."""
+
+    def __init__(self, client, method, url, timeout, kwargs):
+        self.client = client
+        self.method = method
+        self.url = url
+        self.timeout = timeout
+        self.kwargs = kwargs
+        self.response = None
+
+    async def __aenter__(self):
+        aiohttp = _aiohttp()
+        client = self.client
+        attempt = 0
+        while True:
+            if client.rate_limiter:
+                await client.rate_limiter.acquire()
+            response, error = None, None
+            try:
+                response = await client._session().request(self.method, self.url, timeout=client._timeout(self.timeout), **self.kwargs)
+                if response.status not in client.retry.statuses:
+                    self.response = response
+                    return response
+                response.release()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # Our own per-attempt timeout; an outer cancellation is CancelledError and passes straight through
+                error = e
+
+            if attempt >= client.retry.max_retries:
+                if response is not None and response.status == 429:
+                    raise QuotaExceededError(f"Rate limited after {attempt + 1} attempts", 429)
+                status = response.status if response is not None else None
+                raise UpstreamError(f"Request failed after {attempt + 1} attempts: {error or status}", status)
+
+            await asyncio.sleep(client.retry.delay(attempt, response))
+            attempt += 1
+
+    async def __aexit__(self, *exc):
+        self.response.release()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_shared_async_client(service, pool_size=100, limit_per_host=20, requests_per_minute=None, retry=None):
+    """
+    Process-wide async client for `service` (first caller's settings win), so
+    every coroutine shares one connection limit and one rate limit per service.
+    """
+    with _clients_lock:
+        if service not in _clients:
+            limiter = AsyncRateLimiter(requests_per_minute / 60.0) if requests_per_minute else None
+            _clients[service] = AsyncHttpClient(pool_size=pool_size, limit_per_host=limit_per_host, retry=retry, rate_limiter=limiter)
+        return _clients[service]
+
+
+async def close_async_clients():
+    """Closes every shared client's session on the running loop."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    for client in clients:
+        await client.close()
@@ -0,0 +1,144 @@
+"""
+Pooled HTTP client shared by the REST-based services.
+
+One keep-alive `requests.Session` per service (so TLS handshakes are paid once
+per connection, not once per call), retries with jittered exponential backoff
+that honors `Retry-After`, and a client-side token bucket so bursts are smoothed
+before they turn into 429s.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """The upstream API kept failing after all retries."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class QuotaExceededError(UpstreamError):
+    """Still rate limited (429) after all retries. Callers should defer, not fabricate a result."""
+
+
+class RateLimiter:
+    """Thread-safe token bucket. `rate` tokens per second, bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RetryPolicy:
+    def __init__(self, max_retries=4, base_delay=0.5, max_delay=30.0, statuses=RETRY_STATUSES):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.statuses = statuses
+
+    def delay(self, attempt, response=None):
+        """Seconds to wait before retry number `attempt` (0-based). Server hints win over backoff."""
+        retry_after = self._retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # Full jitter: spread synchronized clients apart
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _retry_after(self, response):
+        if response is None:
+            return None
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class PooledHttpClient:
+    def __init__(self, pool_size=10, retry=None, rate_limiter=None, timeout=(3.05, 30)):
+        self.retry = retry or RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout # (connect, read)
+        self.session = requests.Session()
+        # Retries are ours (Retry-After + jitter), so the adapter itself never retries
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """
+        Returns the first non-retryable response. Raises QuotaExceededError if the
+        last attempt was a 429, UpstreamError for other retryable failures.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            response, error = None, None
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if response.status_code not in self.retry.statuses:
+                    return response
+                response.close() # Hand the pooled connection back before sleeping or raising
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            if attempt >= self.retry.max_retries:
+                if response is not None and response.status_code == 429:
+                    raise QuotaExceededError(f"Rate limited after {attempt + 1} attempts", 429)
+                status = response.status_code if response is not None else None
+                raise UpstreamError(f"Request failed after {attempt + 1} attempts: {error or status}", status)
+
+            time.sleep(self.retry.delay(attempt, response))
+            attempt += 1
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_shared_client(service, pool_size=10, requests_per_minute=None, retry=None):
+    """
+    Process-wide client for `service`. The first caller's settings win, so every
+    thread shares one connection pool and one rate limit per service.
+    """
+    with _clients_lock:
+        if service not in _clients:
+            limiter = RateLimiter(requests_per_minute / 60.0) if requests_per_minute else None
+            _clients[service] = PooledHttpClient(pool_size=pool_size, retry=retry, rate_limiter=limiter)
+        return _clients[service]
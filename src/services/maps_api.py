@@ -1,9 +1,80 @@
-import googlemaps
+import asyncio
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from src.services.async_http_client import get_shared_async_client
+from src.services.http_client import get_shared_client, UpstreamError, QuotaExceededError
+from src.utils.cache import make_key
+from src.utils.metrics import span, count, submit
 from src.utils.mock_data import SCENARIOS
+from src.utils.quota import ApiKeys
+
+# Place Details field tiers, cheapest first. Places bills per field group
+# (Basic < Contact < Atmosphere), and reviews are the heaviest part of the payload.
+TIERS = ("contact", "rating", "full")
+TIER_FIELDS = {
+    "contact": ['name', 'formatted_address', 'formatted_phone_number', 'website', 'type', 'geometry'],
+    "rating": ['name', 'formatted_address', 'formatted_phone_number', 'website', 'type', 'geometry',
+               'rating', 'user_ratings_total'],
+    "full": ['name', 'formatted_address', 'formatted_phone_number', 'website', 'type', 'geometry',
+             'rating', 'user_ratings_total', 'reviews'],
+}
+
+
+def trim_to_tier(place_data, tier):
+    """Drops the fields a cheaper tier would not have fetched (used for demo data)."""
+    place_data = dict(place_data)
+    if 'reviews' in place_data:
+        place_data.setdefault('user_ratings_total', len(place_data['reviews']))
+    if tier != "full":
+        place_data.pop('reviews', None)
+    if tier == "contact":
+        place_data.pop('rating', None)
+        place_data.pop('user_ratings_total', None)
+    place_data['tier'] = tier
+    return place_data
+
+
+def format_place(place_id, result, tier="full"):
+    """A Place Details `result` formatted to our internal structure."""
+    place_data = {
+        "place_id": place_id,
+        "name": result.get('name'),
+        "address": result.get('formatted_address'),
+        "phone": result.get('formatted_phone_number'),
+        "website": result.get('website'),
+        "types": result.get('types', []),
+        "geometry": result.get('geometry', {}),
+        "tier": tier,
+    }
+    if tier != "contact":
+        place_data['rating'] = result.get('rating', 0)
+        place_data['user_ratings_total'] = result.get('user_ratings_total', 0)
+    if tier == "full":
+        place_data['reviews'] = result.get('reviews', [])
+    return place_data
+
+_gmaps_clients = {}
+_gmaps_lock = threading.Lock()
+
+
+def get_shared_gmaps_client(api_key):
+    """
+    Process-wide googlemaps.Client per API key, on the shared "maps" connection
+    pool, so agents don't each build a client (and its session) per instance.
+    """
+    import googlemaps # Only live Maps calls need the SDK; keeps it off the import path
+    with _gmaps_lock:
+        if api_key not in _gmaps_clients:
+            _gmaps_clients[api_key] = googlemaps.Client(key=api_key, requests_session=get_shared_client("maps").session)
+        return _gmaps_clients[api_key]
+
 
 class MapsService:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, cache=None):
         self.api_key = api_key
+        self.keys = ApiKeys("maps", api_key) # "key1,key2" rotates across both
+        self.cache = cache
         self.client = None
         self.is_demo = False
         
@@ -12,58 +83,256 @@ class MapsService:
             self.is_demo = True
         else:
             try:
-                self.client = googlemaps.Client(key=api_key)
+                self.client = get_shared_gmaps_client(self.keys.keys[0])
             except Exception as e:
                 print(f"Maps Client Error: {e}")
                 self.is_demo = True
 
-    def get_place_details(self, place_query):
+    def get_place_details(self, place_query=None, place_id=None, tier="full"):
         """
-        Fetches place details. 
+        Fetches place details at the given field tier ("contact", "rating" or "full").
+        With a known place_id the Text Search is skipped.
         In demo mode, returns a mock scenario if the query matches a key, 
         otherwise returns a generic mock.
         """
         if self.is_demo:
-            # Check if query matches a mock key
-            if "locksmith" in place_query.lower():
-                return SCENARIOS["suspicious_locksmith"]
-            elif "coffee" in place_query.lower():
-                return SCENARIOS["legit_coffee"]
-            else:
-                # Default fallback
-                return SCENARIOS["suspicious_locksmith"]
+            return trim_to_tier(self.get_demo_place(place_query or place_id or ""), tier)
 
         try:
             # Real API call
-            # 1. Text Search to get Place ID
-            places_result = self.client.places(query=place_query)
-            
-            if not places_result['results']:
-                return None
+            # 1. Text Search to get Place ID (unless the caller already has it)
+            if not place_id:
+                hit = self.search_place(place_query)
+                
+                if not hit:
+                    return None
+                place_id = hit['place_id']
                 
-            place_id = places_result['results'][0]['place_id']
-            
             # 2. Place Details
-            # Fetching fields: name, formatted_address, formatted_phone_number, website, reviews, type, geometry
-            details = self.client.place(
-                place_id=place_id, 
-                fields=['name', 'formatted_address', 'formatted_phone_number', 'website', 'reviews', 'type', 'geometry']
-            )
+            return self.get_place_details_by_id(place_id, tier=tier)
             
-            result = details.get('result', {})
-            
-            # Format to match our internal structure
-            return {
-                "name": result.get('name'),
-                "address": result.get('formatted_address'),
-                "phone": result.get('formatted_phone_number'),
-                "website": result.get('website'),
-                "rating": result.get('rating', 0), # Rating might not be in the fields requested specifically if not explicit, but usually is
-                "reviews": result.get('reviews', []),
-                "types": result.get('types', []),
-                "geometry": result.get('geometry', {})
-            }
+        except Exception as e:
+            raise self.upstream_error(e)
+
+    def get_demo_place(self, place_query):
+        # Check if query matches a mock key
+        if "locksmith" in place_query.lower():
+            return SCENARIOS["suspicious_locksmith"]
+        elif "coffee" in place_query.lower():
+            return SCENARIOS["legit_coffee"]
+        else:
+            # Default fallback
+            return SCENARIOS["suspicious_locksmith"]
+
+    def search_place(self, place_query):
+        """
+        Text Search only. Returns the top hit (place_id, name, formatted_address)
+        or None. Callers can start work off the hit while Details is in flight.
+        Raises on API errors.
+        """
+        if self.cache:
+            key = make_key("search", " ".join(place_query.lower().split()))
+            return self.cache.get_or_compute("maps", key, lambda: self._search_place(place_query))
+        return self._search_place(place_query)
+
+    def _client(self):
+        """(key, googlemaps client) for the next call. Rotates keys and draws from the quota ledger when configured."""
+        if not self.keys.managed:
+            return self.api_key, self.client
+        key = self.keys.next()
+        return key, get_shared_gmaps_client(key)
+
+    @contextmanager
+    def _quota(self, key):
+        # OVER_QUERY_LIMIT benches the key and defers the case instead of failing it
+        try:
+            yield
+        except Exception as e:
+            # googlemaps.ApiError renders as "<status> (<message>)"
+            if not str(e).startswith("OVER_QUERY_LIMIT"):
+                raise
+            self.keys.throttled(key)
+            raise QuotaExceededError(f"Places {e}", 429) from e
+
+    def _search_place(self, place_query):
+        key, client = self._client()
+        with span("maps", op="text_search"), self._quota(key):
+            places_result = client.places(query=place_query)
+        
+        if not places_result['results']:
+            return None
             
+        return places_result['results'][0]
+
+    def resolve_place_id(self, place_query):
+        """
+        Find Place asking for place_id only (the cheapest SKU). Returns the id or None.
+        Raises on API errors.
+        """
+        if self.cache:
+            key = make_key("place_id", " ".join(place_query.lower().split()))
+            return self.cache.get_or_compute("maps", key, lambda: self._resolve_place_id(place_query))
+        return self._resolve_place_id(place_query)
+
+    def _resolve_place_id(self, place_query):
+        key, client = self._client()
+        with span("maps", op="find_place"), self._quota(key):
+            found = client.find_place(place_query, "textquery", fields=['place_id'])
+        candidates = found.get('candidates', [])
+        return candidates[0]['place_id'] if candidates else None
+
+    def resolve_place_ids(self, place_queries, workers=8):
+        """Bulk resolve_place_id. Returns ids aligned with the queries (an Exception where one failed)."""
+        return self._bulk(self.resolve_place_id, place_queries, workers)
+
+    def get_places_by_ids(self, place_ids, tier="contact", workers=8):
+        """Bulk Place Details for known ids. Returns places aligned with the ids (an Exception where one failed)."""
+        return self._bulk(lambda place_id: self.get_place_details_by_id(place_id, tier=tier), place_ids, workers)
+
+    def _bulk(self, fn, items, workers):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [submit(pool, fn, item) for item in items]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def get_place_details_by_id(self, place_id, tier="full"):
+        """
+        Place Details for a known place_id at the given field tier, formatted to our
+        internal structure. Raises on API errors.
+        """
+        if self.cache:
+            # A cached fuller tier answers a cheaper request too
+            for cached_tier in TIERS[TIERS.index(tier):]:
+                hit, place_data = self.cache.get("maps", self._details_key(place_id, cached_tier))
+                if hit:
+                    return place_data if cached_tier == tier else trim_to_tier(place_data, tier)
+            place_data = self._get_place_details_by_id(place_id, tier)
+            self.cache.set("maps", self._details_key(place_id, tier), place_data)
+            return place_data
+        return self._get_place_details_by_id(place_id, tier)
+
+    def _details_key(self, place_id, tier):
+        # Full-tier entries keep the pre-tier key so existing caches stay warm
+        return make_key("details", place_id) if tier == "full" else make_key("details", tier, place_id)
+
+    def _get_place_details_by_id(self, place_id, tier="full"):
+        key, client = self._client()
+        with span("maps", op=f"details_{tier}"), self._quota(key):
+            details = client.place(place_id=place_id, fields=TIER_FIELDS[tier])
+        
+        return format_place(place_id, details.get('result', {}), tier)
+
+    def upstream_error(self, error):
+        """
+        The exception to raise for a failed live Maps call. It is never a mock place:
+        QuotaExceededError defers the case, anything else becomes an UpstreamError.
+        """
+        print(f"Maps API Error: {error}")
+        count("sentinel_upstream_errors_total", service="maps", reason="quota" if isinstance(error, QuotaExceededError) else "error")
+        if isinstance(error, UpstreamError):
+            return error
+        return UpstreamError(f"Maps {type(error).__name__}: {error}")
+
+
+PLACES_URL = "https://maps.googleapis.com/maps/api/place"
+
+
+class AsyncMapsService(MapsService):
+    """
+    MapsService with coroutine methods of the same names, calling the Places web
+    service over the shared async HTTP client instead of the googlemaps SDK.
+    Demo mode, caching, tiers, key rotation and errors behave exactly as in MapsService.
+    """
+
+    def __init__(self, api_key=None, cache=None, http_client=None, timeout=10):
+        self.api_key = api_key
+        self.keys = ApiKeys("maps", api_key)
+        self.cache = cache
+        self.client = None
+        self.is_demo = not api_key
+        self.timeout = timeout # Seconds per HTTP attempt
+        self.http = http_client
+        if not self.is_demo and self.http is None:
+            self.http = get_shared_async_client("maps")
+
+    async def get_place_details(self, place_query=None, place_id=None, tier="full"):
+        if self.is_demo:
+            return trim_to_tier(self.get_demo_place(place_query or place_id or ""), tier)
+
+        try:
+            if not place_id:
+                hit = await self.search_place(place_query)
+                if not hit:
+                    return None
+                place_id = hit['place_id']
+            return await self.get_place_details_by_id(place_id, tier=tier)
         except Exception as e:
-            print(f"Maps API Error: {e}")
-            return SCENARIOS["suspicious_locksmith"] # Fallback on error
+            raise self.upstream_error(e)
+
+    async def search_place(self, place_query):
+        if self.cache:
+            key = make_key("search", " ".join(place_query.lower().split()))
+            return await self.cache.aget_or_compute("maps", key, lambda: self._search_place(place_query))
+        return await self._search_place(place_query)
+
+    async def _search_place(self, place_query):
+        with span("maps", op="text_search"):
+            payload = await self._call("textsearch", query=place_query)
+        results = payload.get('results', [])
+        return results[0] if results else None
+
+    async def resolve_place_id(self, place_query):
+        if self.cache:
+            key = make_key("place_id", " ".join(place_query.lower().split()))
+            return await self.cache.aget_or_compute("maps", key, lambda: self._resolve_place_id(place_query))
+        return await self._resolve_place_id(place_query)
+
+    async def _resolve_place_id(self, place_query):
+        with span("maps", op="find_place"):
+            payload = await self._call("findplacefromtext", input=place_query, inputtype="textquery", fields="place_id")
+        candidates = payload.get('candidates', [])
+        return candidates[0]['place_id'] if candidates else None
+
+    async def resolve_place_ids(self, place_queries, workers=None):
+        """Bulk resolve_place_id; concurrency is bounded by the client's per-host limit, not `workers`."""
+        return await asyncio.gather(*(self.resolve_place_id(q) for q in place_queries), return_exceptions=True)
+
+    async def get_places_by_ids(self, place_ids, tier="contact", workers=None):
+        return await asyncio.gather(*(self.get_place_details_by_id(p, tier=tier) for p in place_ids), return_exceptions=True)
+
+    async def get_place_details_by_id(self, place_id, tier="full"):
+        if self.cache:
+            for cached_tier in TIERS[TIERS.index(tier):]:
+                hit, place_data = self.cache.get("maps", self._details_key(place_id, cached_tier))
+                if hit:
+                    return place_data if cached_tier == tier else trim_to_tier(place_data, tier)
+            place_data = await self._get_place_details_by_id(place_id, tier)
+            self.cache.set("maps", self._details_key(place_id, tier), place_data)
+            return place_data
+        return await self._get_place_details_by_id(place_id, tier)
+
+    async def _get_place_details_by_id(self, place_id, tier="full"):
+        with span("maps", op=f"details_{tier}"):
+            payload = await self._call("details", place_id=place_id, fields=",".join(TIER_FIELDS[tier]))
+        return format_place(place_id, payload.get('result', {}), tier)
+
+    async def _call(self, endpoint, **params):
+        """One Places web service call. Raises like the googlemaps SDK would (ApiError -> UpstreamError)."""
+        key = await self.keys.anext() if self.keys.managed else self.api_key
+        status, payload = await self.http.request_json(
+            "GET", f"{PLACES_URL}/{endpoint}/json", params={**params, "key": key}, timeout=self.timeout
+        )
+        if status != 200 or not isinstance(payload, dict):
+            raise UpstreamError(f"Places HTTP {status}", status)
+        api_status = payload.get('status')
+        if api_status == "OVER_QUERY_LIMIT":
+            self.keys.throttled(key)
+            raise QuotaExceededError(f"Places {api_status}", 429)
+        if api_status not in ("OK", "ZERO_RESULTS"):
+            raise UpstreamError(f"Places {api_status}: {payload.get('error_message', '')}", status)
+        return payload
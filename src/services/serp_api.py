@@ -1,49 +1,114 @@
-from serpapi import GoogleSearch
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import time
+from src.services.async_http_client import get_shared_async_client
+from src.services.http_client import UpstreamError, QuotaExceededError
+from src.utils.cache import make_key
+from src.utils.metrics import span, count, submit
 from src.utils.mock_data import SCENARIOS
+from src.utils.quota import ApiKeys
+
+# serpapi.GoogleSearch, imported on the first live search so the SDK stays off the import path
+GoogleSearch = None
+
+# SerpApi reports an exhausted plan or hourly cap as an 'error' payload, not an exception
+QUOTA_ERRORS = ("run out of searches", "searches for the month", "throughput limit")
+
+
+ERROR_TITLE = "Error fetching real-time data" # error_results() marker
+
+
+def is_error_results(osint_data):
+    """Whether a footprint is the error_results() marker rather than real search results."""
+    return any(r.get('title') == ERROR_TITLE for r in osint_data or [])
+
+
+def is_quota_error(payload):
+    return any(marker in str(payload.get('error', '')).lower() for marker in QUOTA_ERRORS)
+
 
 class SerpApiService:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, cache=None):
         self.api_key = api_key
+        self.keys = ApiKeys("serp", api_key) # "key1,key2" rotates across both
+        self.cache = cache
         self.is_demo = not api_key
 
     def search_business_footprint(self, business_name, phone, address):
         """
         Searches for the business footprint.
+        The name+address and phone queries are independent, so they run in parallel.
         """
         if self.is_demo:
-            # Simple heuristic to pick the right mock
-            if "locksmith" in business_name.lower():
-                return SCENARIOS["suspicious_locksmith"]["osint_findings"]["search_results"]
-            else:
-                return SCENARIOS["legit_coffee"]["osint_findings"]["search_results"]
+            return self.get_demo_footprint(business_name)
 
-        results = []
         try:
-            # query 1: Name + Address
-            params1 = {
-                "q": f"{business_name} {address}",
-                "api_key": self.api_key,
-                "num": 3
-            }
-            search1 = GoogleSearch(params1)
-            res1 = search1.get_dict()
-            if 'organic_results' in res1:
-                results.extend(res1['organic_results'])
-
-            # query 2: Phone Number (Reverse Lookup style)
-            params2 = {
-                "q": f"\"{phone}\"", # exact match
-                "api_key": self.api_key,
-                "num": 3
-            }
-            search2 = GoogleSearch(params2)
-            res2 = search2.get_dict()
-            if 'organic_results' in res2:
-                results.extend(res2['organic_results'])
-
-            # Normalize output
-            cleaned_results = []
-            seen_links = set()
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                name_future = submit(pool, self.search_name_address, business_name, address)
+                phone_future = submit(pool, self.search_phone, phone)
+                return self.merge_results(name_future.result(), phone_future.result())
+
+        except Exception as e:
+            return self.error_results(e)
+
+    def get_demo_footprint(self, business_name):
+        # Simple heuristic to pick the right mock
+        if "locksmith" in business_name.lower():
+            return SCENARIOS["suspicious_locksmith"]["osint_findings"]["search_results"]
+        else:
+            return SCENARIOS["legit_coffee"]["osint_findings"]["search_results"]
+
+    def search_name_address(self, business_name, address):
+        # query 1: Name + Address
+        return self._organic_results(f"{business_name} {address}")
+
+    def search_phone(self, phone):
+        # query 2: Phone Number (Reverse Lookup style)
+        return self._organic_results(f"\"{phone}\"") # exact match
+
+    def _organic_results(self, query):
+        params = {
+            "q": query,
+            "api_key": self.api_key,
+            "num": 3
+        }
+        if not self.cache:
+            return self._fetch(params).get('organic_results', [])
+
+        # Key on the search params only, never the api_key
+        key = make_key(query.strip().lower(), params['num'])
+        hit, organic = self.cache.get("serp", key)
+        if hit:
+            return organic
+        start = time.time()
+        res = self._fetch(params)
+        organic = res.get('organic_results', [])
+        # Don't cache quota/auth error payloads as "no results"
+        if 'error' not in res or "hasn't returned any results" in res['error']:
+            self.cache.set("serp", key, organic, elapsed=time.time() - start)
+        return organic
+
+    def _fetch(self, params):
+        global GoogleSearch
+        if GoogleSearch is None:
+            from serpapi import GoogleSearch
+        key = self.keys.next() if self.keys.managed else self.api_key
+        with span("serp", op="search"):
+            res = GoogleSearch({**params, "api_key": key}).get_dict()
+        return self._check_quota(res, key)
+
+    def _check_quota(self, res, key, status=None):
+        # An exhausted key is benched and the case deferred; "no results" stays a normal answer
+        if status == 429 or is_quota_error(res):
+            self.keys.throttled(key)
+            raise QuotaExceededError(f"SerpApi: {res.get('error', 'rate limited')}", 429)
+        return res
+
+    def merge_results(self, *result_lists):
+        # Normalize output
+        cleaned_results = []
+        seen_links = set()
+        for results in result_lists:
             for r in results:
                 if r.get('link') not in seen_links:
                     cleaned_results.append({
@@ -52,9 +117,77 @@ class SerpApiService:
                         "snippet": r.get('snippet', '')
                     })
                     seen_links.add(r.get('link'))
-            
-            return cleaned_results[:5] # Limit to 5 top relevant signals
+        
+        return cleaned_results[:5] # Limit to 5 top relevant signals
+
+    def error_results(self, error):
+        """The marker result for a failed footprint search. Quota errors re-raise so the case is deferred."""
+        print(f"SerpApi Error: {error}")
+        if isinstance(error, QuotaExceededError):
+            count("sentinel_upstream_errors_total", service="serp", reason="quota")
+            raise error
+        count("sentinel_fallbacks_total", service="serp")
+        return [{"title": ERROR_TITLE, "snippet": "Using fallback data due to API error."}]
+
+
+SERPAPI_URL = "https://serpapi.com/search.json"
+
+
+class AsyncSerpApiService(SerpApiService):
+    """
+    SerpApiService with coroutine methods of the same names, calling the SerpApi
+    JSON endpoint over the shared async HTTP client instead of GoogleSearch.
+    """
+
+    def __init__(self, api_key=None, cache=None, http_client=None, timeout=15):
+        super().__init__(api_key, cache=cache)
+        self.timeout = timeout # Seconds per HTTP attempt
+        self.http = http_client
+        if not self.is_demo and self.http is None:
+            self.http = get_shared_async_client("serp")
 
+    async def search_business_footprint(self, business_name, phone, address):
+        if self.is_demo:
+            return self.get_demo_footprint(business_name)
+
+        try:
+            name_results, phone_results = await asyncio.gather(
+                self.search_name_address(business_name, address), self.search_phone(phone)
+            )
+            return self.merge_results(name_results, phone_results)
         except Exception as e:
-            print(f"SerpApi Error: {e}")
-            return [{"title": "Error fetching real-time data", "snippet": "Using fallback data due to API error."}]
+            return self.error_results(e)
+
+    async def search_name_address(self, business_name, address):
+        return await self._organic_results(f"{business_name} {address}")
+
+    async def search_phone(self, phone):
+        return await self._organic_results(f"\"{phone}\"")
+
+    async def _organic_results(self, query):
+        params = {
+            "q": query,
+            "api_key": self.api_key,
+            "num": 3
+        }
+        if not self.cache:
+            return (await self._fetch(params)).get('organic_results', [])
+
+        key = make_key(query.strip().lower(), params['num'])
+        hit, organic = self.cache.get("serp", key)
+        if hit:
+            return organic
+        start = time.time()
+        res = await self._fetch(params)
+        organic = res.get('organic_results', [])
+        if 'error' not in res or "hasn't returned any results" in res['error']:
+            self.cache.set("serp", key, organic, elapsed=time.time() - start)
+        return organic
+
+    async def _fetch(self, params):
+        key = await self.keys.anext() if self.keys.managed else self.api_key
+        with span("serp", op="search"):
+            status, payload = await self.http.request_json("GET", SERPAPI_URL, params={"engine": "google", **params, "api_key": key}, timeout=self.timeout)
+        if not isinstance(payload, dict):
+            raise UpstreamError(f"SerpApi HTTP {status}", status)
+        return self._check_quota(payload, key, status) # Like GoogleSearch.get_dict(): API errors come back under 'error'
@@ -0,0 +1,144 @@
+"""
+Typed audit verdict shared by GeminiService, the Risk Engine and the UI.
+
+Gemini is asked for JSON matching AUDIT_RESPONSE_SCHEMA; parse_audit_verdict()
+validates it into a compact dict:
+
+    {"verdict": "High", "action": "Suspend Listing",
+     "vector_scores": {"ghost_business": 0.9, ...},
+     "evidence": [{"vector": "ghost_business", "finding": "..."}],
+     "discrepancies": ["..."], "source": "gemini", "audited_at": 1709251200}
+
+The markdown report is only rendered (render_audit_markdown) when a human looks at it.
+"""
+import time
+
+VERDICTS = ("Low", "Medium", "High")
+ACTIONS = ("No Action", "Video Verify", "Suspend Listing")
+
+VECTOR_LABELS = {
+    "ghost_business": "Ghost Business Analysis",
+    "lead_gen": "Lead-Gen Indicators",
+    "review_fraud": "Review Integrity",
+    "osint_gap": "Digital Footprint",
+}
+VECTORS = tuple(VECTOR_LABELS)
+
+VERDICT_PROPERTIES = {
+    "verdict": {"type": "STRING", "enum": list(VERDICTS)},
+    "action": {"type": "STRING", "enum": list(ACTIONS)},
+    "vector_scores": {
+        "type": "OBJECT",
+        "description": "Risk per threat vector, 0.0 (clean) to 1.0 (certain violation)",
+        "properties": {vector: {"type": "NUMBER"} for vector in VECTORS},
+        "required": list(VECTORS),
+    },
+    "evidence": {
+        "type": "ARRAY",
+        "items": {
+            "type": "OBJECT",
+            "properties": {
+                "vector": {"type": "STRING", "enum": list(VECTORS)},
+                "finding": {"type": "STRING"},
+            },
+            "required": ["vector", "finding"],
+        },
+    },
+    "discrepancies": {"type": "ARRAY", "items": {"type": "STRING"}},
+}
+
+AUDIT_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": VERDICT_PROPERTIES,
+    "required": ["verdict", "action", "vector_scores", "evidence"],
+}
+
+# Packed audits: one verdict object per listing, tagged with the listing id
+BATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {"id": {"type": "STRING"}, **VERDICT_PROPERTIES},
+        "required": ["id", "verdict", "action", "vector_scores", "evidence"],
+    },
+}
+
+
+def _match(value, allowed):
+    for option in allowed:
+        if str(value).strip().lower() == option.lower():
+            return option
+    raise ValueError(f"Unexpected value {value!r}, expected one of {allowed}")
+
+
+def parse_audit_verdict(data, source="gemini"):
+    """Validates and normalizes a decoded JSON verdict. Raises ValueError if it doesn't fit the schema."""
+    if not isinstance(data, dict):
+        raise ValueError("Verdict must be a JSON object")
+
+    scores = data.get('vector_scores') or {}
+    if not isinstance(scores, dict):
+        raise ValueError("vector_scores must be an object")
+
+    evidence = []
+    for item in data.get('evidence') or []:
+        if isinstance(item, dict) and item.get('vector') in VECTOR_LABELS and item.get('finding'):
+            evidence.append({"vector": item['vector'], "finding": str(item['finding'])})
+
+    return {
+        "verdict": _match(data.get('verdict'), VERDICTS),
+        "action": _match(data.get('action'), ACTIONS),
+        "vector_scores": {v: round(min(1.0, max(0.0, float(scores.get(v) or 0))), 3) for v in VECTORS},
+        "evidence": evidence,
+        "discrepancies": [str(d) for d in data.get('discrepancies') or []],
+        "source": source,
+        "audited_at": int(data.get('audited_at') or time.time()),
+    }
+
+
+def verdict_from_legacy_report(report):
+    """
+    Best-effort verdict for markdown reports produced before the structured schema
+    (e.g. old batch outputs being rescored). New audits never go through this.
+    """
+    normalized = report.lower()
+    if "high confidence" in normalized or "high risk" in normalized or "fraud" in normalized:
+        verdict, action = "High", "Suspend Listing"
+    elif "medium risk" in normalized:
+        verdict, action = "Medium", "Video Verify"
+    else:
+        verdict, action = "Low", "No Action"
+    return {"verdict": verdict, "action": action, "vector_scores": {}, "evidence": [], "discrepancies": [], "source": "legacy"}
+
+
+def render_audit_markdown(verdict, place_data):
+    """Analyst-facing report for the console. Pure formatting, no I/O."""
+    automated = {"fallback": " (Automated)", "heuristic": " (Heuristic, no LLM audit)", "prescreen": " (Local pre-screen, no LLM audit)"}.get(verdict.get('source'), "")
+    audited_at = time.strftime("%Y-%m-%d", time.localtime(verdict.get('audited_at') or time.time()))
+
+    lines = []
+    for n, (vector, label) in enumerate(VECTOR_LABELS.items(), start=1):
+        findings = [e['finding'] for e in verdict.get('evidence', []) if e['vector'] == vector]
+        if not findings and vector not in verdict.get('vector_scores', {}):
+            continue
+        score = verdict.get('vector_scores', {}).get(vector)
+        score_text = f" (risk {score:.2f})" if score is not None else ""
+        lines.append(f"{n}.  **{label}**{score_text}: {' '.join(findings) or 'No findings.'}")
+
+    discrepancies = "\n".join(f"*   {d}" for d in verdict.get('discrepancies', [])) or "*   None identified."
+
+    return f"""
+### 🛡️ Analyst Report{automated}
+
+**Mission**: Forensic Analysis of "{place_data.get('name')}"
+**Date**: {audited_at}
+
+**Threat Vector Analysis**:
+{chr(10).join(lines)}
+
+**Discrepancy Check**:
+{discrepancies}
+
+**Risk Verdict**: **{verdict.get('verdict')}**
+**Action**: **{verdict.get('action')}**
+"""
@@ -0,0 +1,216 @@
+"""
+Response cache for the external services (Maps, SerpApi, Gemini).
+
+Two layers: an in-process LRU in front of an optional on-disk SQLite store.
+Every entry lives in a namespace ("maps", "serp", "gemini") with its own TTL and
+size bound. Only successful upstream responses are cached; fallbacks never are.
+A "not found" answer (None) is kept for at most NOT_FOUND_TTL, so a listing added
+after the first lookup shows up within the hour.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from src.utils.metrics import count
+
+DAY = 86400
+NOT_FOUND_TTL = 3600
+
+DEFAULT_TTLS = {
+    "maps": 7 * DAY,     # Listings change slowly
+    "serp": 1 * DAY,     # Search results churn
+    "gemini": 30 * DAY,  # Same prompt -> same verdict
+}
+
+DEFAULT_MAX_ENTRIES = {
+    "maps": 50000,
+    "serp": 100000,
+    "gemini": 50000,
+}
+
+
+def make_key(*parts):
+    """Stable hash of a normalized request (dicts are key-sorted, strings trimmed+lowercased by callers)."""
+    raw = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, namespace, key):
+        with self.lock:
+            entry = self.entries.get((namespace, key))
+            if entry is None:
+                return False, None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self.entries[(namespace, key)]
+                return False, None
+            self.entries.move_to_end((namespace, key))
+            return True, value
+
+    def set(self, namespace, key, value, expires_at):
+        with self.lock:
+            self.entries[(namespace, key)] = (value, expires_at)
+            self.entries.move_to_end((namespace, key))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class SqliteCache:
+    """Disk layer. Eviction is least-recently-accessed per namespace once it exceeds its bound."""
+
+    EVICT_EVERY = 256 # Writes between size checks
+
+    def __init__(self, path, max_entries=None):
+        self.max_entries = {**DEFAULT_MAX_ENTRIES, **(max_entries or {})}
+        self.lock = threading.Lock()
+        self.writes = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (namespace, accessed_at)")
+
+    def get(self, namespace, key):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, expires_at FROM responses WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None:
+                return False, None, 0
+            if row[1] < now:
+                self.conn.execute("DELETE FROM responses WHERE namespace = ? AND key = ?", (namespace, key))
+                return False, None, 0
+            self.conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, namespace, key)
+            )
+        return True, json.loads(row[0]), row[1]
+
+    def set(self, namespace, key, value, expires_at):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, json.dumps(value, default=str), expires_at, time.time())
+            )
+            self.writes += 1
+            if self.writes % self.EVICT_EVERY == 0:
+                self._evict(namespace)
+
+    def _evict(self, namespace):
+        self.conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+        limit = self.max_entries.get(namespace)
+        if limit:
+            self.conn.execute("""
+                DELETE FROM responses WHERE namespace = ? AND key IN (
+                    SELECT key FROM responses WHERE namespace = ?
+                    ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (namespace, namespace, limit))
+
+
+class ResponseCache:
+    """
+    Memory LRU -> SQLite read-through cache with per-namespace TTLs and hit/miss counters.
+
+        cache = ResponseCache(path=".cache/responses.sqlite")
+        cache.get_or_compute("serp", make_key(params), lambda: GoogleSearch(params).get_dict())
+    """
+
+    def __init__(self, path=None, ttls=None, memory_entries=2048, max_entries=None):
+        self.path = path
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.memory = LRUCache(memory_entries)
+        self.disk = SqliteCache(path, max_entries) if path else None
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def _count(self, namespace, field, amount=1):
+        if field != "miss_seconds":
+            count(f"sentinel_cache_{field}_total", amount, namespace=namespace)
+        with self.lock:
+            stats = self.counters.setdefault(namespace, {
+                "memory_hits": 0, "disk_hits": 0, "misses": 0, "miss_seconds": 0.0
+            })
+            stats[field] += amount
+
+    def get(self, namespace, key):
+        hit, value = self.memory.get(namespace, key)
+        if hit:
+            self._count(namespace, "memory_hits")
+            return True, value
+        if self.disk:
+            hit, value, expires_at = self.disk.get(namespace, key)
+            if hit:
+                self.memory.set(namespace, key, value, expires_at)
+                self._count(namespace, "disk_hits")
+                return True, value
+        self._count(namespace, "misses")
+        return False, None
+
+    def set(self, namespace, key, value, elapsed=None):
+        """`elapsed` is the upstream latency of the miss that produced `value`, for stats()."""
+        if elapsed is not None:
+            self._count(namespace, "miss_seconds", elapsed)
+        ttl = self.ttls.get(namespace, DAY)
+        expires_at = time.time() + (min(ttl, NOT_FOUND_TTL) if value is None else ttl)
+        self.memory.set(namespace, key, value, expires_at)
+        if self.disk:
+            self.disk.set(namespace, key, value, expires_at)
+
+    def get_or_compute(self, namespace, key, compute):
+        """Returns the cached value or calls `compute()` and stores it. Exceptions are not cached."""
+        hit, value = self.get(namespace, key)
+        if hit:
+            return value
+        start = time.time()
+        value = compute()
+        self.set(namespace, key, value, elapsed=time.time() - start)
+        return value
+
+    async def aget_or_compute(self, namespace, key, compute):
+        """get_or_compute() for coroutine functions (the async services)."""
+        hit, value = self.get(namespace, key)
+        if hit:
+            return value
+        start = time.time()
+        value = await compute()
+        self.set(namespace, key, value, elapsed=time.time() - start)
+        return value
+
+    def stats(self):
+        """
+        Per-namespace counters. `saved_calls` is the number of upstream calls (and bills)
+        avoided; `saved_seconds` estimates latency saved using the mean miss latency.
+        """
+        report = {}
+        with self.lock:
+            for namespace, stats in self.counters.items():
+                hits = stats["memory_hits"] + stats["disk_hits"]
+                lookups = hits + stats["misses"]
+                mean_miss = stats["miss_seconds"] / stats["misses"] if stats["misses"] else 0.0
+                report[namespace] = {
+                    **stats,
+                    "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                    "saved_calls": hits,
+                    "saved_seconds": round(hits * mean_miss, 3),
+                }
+        return report
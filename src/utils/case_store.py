@@ -0,0 +1,357 @@
+"""
+Columnar case store: every finished investigation, kept for audit history and analytics.
+
+Layout (a directory of append-only Parquet parts, one pair per flush):
+
+    <path>/cases/part-<ns>-<pid>.parquet     one row per case: contact fields, verdict,
+                                             score, velocity summary, vector scores, breakdown
+    <path>/reviews/part-<ns>-<pid>.parquet   child table, one row per review, keyed by case_id
+
+Part names are unique per writer, so the dashboard service and a batch run can
+append to the same store. `recorded_at` is when the case was analysed;
+`audited_at` is when its verdict was produced (earlier for a cached verdict).
+
+Low-cardinality strings (verdict, action, source, primary type) are dictionary
+encoded, and reviews are flattened into their own table, so fleet queries only
+read the columns they filter on:
+
+    store = CaseStore(".cache/cases")
+    store.query(verdict="High", velocity_burst=True, since=time.time() - 7 * 86400)
+
+Reads go through pyarrow.dataset over a memory-mapped filesystem and return Arrow
+tables; nothing is turned into Python dicts unless you ask for it.
+
+    python -m src.utils.case_store .cache/cases --verdict High --burst --since 7d
+
+The Risk Engine's rule features are stored alongside, so a re-weighted RULESET
+re-scores the whole history in one vectorized pass, without touching any API:
+
+    store.rescore(RULESET)   # -> case_id, trust_score, rescored, rule_mask
+
+    python -m src.utils.case_store .cache/cases --rescore
+"""
+import argparse
+import os
+import threading
+import time
+from src.utils.audit_schema import VECTORS
+from src.utils.review_velocity import analyze_review_velocity
+from src.utils.risk_rules import RULESET, case_features
+
+# Rule features that aren't derivable from the other case columns
+RULE_FEATURES = (
+    "duplicate_reviews", "checked_reviews", "cross_listing_reviews", "linked_listings",
+    "known_bad_kinds", "shared_phone", "shared_address", "stacked", "same_type_nearby",
+)
+
+
+def _pa():
+    # pyarrow is an optional dependency, only needed once a store is opened
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("The case store requires `pyarrow` (pip install pyarrow)")
+    return pa
+
+
+def _schemas():
+    pa = _pa()
+    label = pa.dictionary(pa.int8(), pa.string())
+    cases = pa.schema([
+        ("case_id", pa.string()),
+        ("recorded_at", pa.timestamp("s")),
+        ("query", pa.string()),
+        ("place_id", pa.string()),
+        ("name", pa.string()),
+        ("address", pa.string()),
+        ("phone", pa.string()),
+        ("website", pa.string()),
+        ("primary_type", pa.dictionary(pa.int16(), pa.string())),
+        ("rating", pa.float32()),
+        ("review_count", pa.int32()),
+        ("osint_count", pa.int16()),
+        ("trust_score", pa.int16()),
+        ("verdict", label),
+        ("action", label),
+        ("audit_source", label),
+        ("audited_at", pa.timestamp("s")),
+        *[(f"vec_{v}", pa.float32()) for v in VECTORS],
+        ("velocity_burst", pa.bool_()),
+        ("max_in_1h", pa.int16()),
+        ("max_in_24h", pa.int16()),
+        ("max_in_7d", pa.int16()),
+        ("breakdown", pa.list_(pa.string())),
+        ("evidence", pa.list_(pa.struct([("vector", pa.string()), ("finding", pa.string())]))),
+        ("osint_links", pa.list_(pa.string())),
+        *[(f, pa.string() if f == "known_bad_kinds" else pa.int16()) for f in RULE_FEATURES],
+    ])
+    reviews = pa.schema([
+        ("case_id", pa.string()),
+        ("time", pa.timestamp("s")),
+        ("rating", pa.int8()),
+        ("author_name", pa.string()),
+        ("text", pa.string()),
+    ])
+    return cases, reviews
+
+
+def case_rows(case):
+    """Flattens one case (batch record or dashboard case dict) into (case_row, review_rows)."""
+    place = case.get('place_data') or {}
+    audit = case.get('audit') or {}
+    reviews = place.get('reviews') or []
+    velocity = analyze_review_velocity(reviews)
+    recorded_at = int(case.get('analysis_id') or time.time())
+    case_id = case.get('case_id') or f"{' '.join(str(case.get('query', '')).lower().split())}@{recorded_at}"
+    scores = audit.get('vector_scores') or {}
+
+    row = {
+        "case_id": case_id,
+        "recorded_at": recorded_at,
+        "query": case.get('query'),
+        "place_id": place.get('place_id'),
+        "name": place.get('name'),
+        "address": place.get('address'),
+        "phone": place.get('phone'),
+        "website": place.get('website'),
+        "primary_type": (place.get('types') or [None])[0],
+        "rating": place.get('rating'),
+        "review_count": place.get('user_ratings_total', len(reviews)),
+        "osint_count": len(case.get('osint_data') or []),
+        "trust_score": case.get('trust_score'),
+        "verdict": audit.get('verdict'),
+        "action": audit.get('action'),
+        "audit_source": audit.get('source'),
+        "audited_at": audit.get('audited_at'),
+        "velocity_burst": velocity['burst'],
+        "max_in_1h": velocity['max_in_window']['1h'],
+        "max_in_24h": velocity['max_in_window']['24h'],
+        "max_in_7d": velocity['max_in_window']['7d'],
+        "breakdown": case.get('breakdown') or [],
+        "evidence": audit.get('evidence') or [],
+        "osint_links": [r['link'] for r in case.get('osint_data') or [] if r.get('link')],
+    }
+    for v in VECTORS:
+        row[f"vec_{v}"] = scores.get(v)
+    features = case_features(
+        place, case.get('osint_data') or [], case.get('audit'), entity_links=case.get('entity_links'),
+        review_links=case.get('review_links'), spatial_links=case.get('spatial_links'),
+    )
+    for f in RULE_FEATURES:
+        row[f] = features[f]
+
+    review_rows = [{
+        "case_id": case_id,
+        "time": int(r['time']) if r.get('time') is not None else None,
+        "rating": r.get('rating'),
+        "author_name": r.get('author_name'),
+        "text": r.get('text'),
+    } for r in reviews]
+    return row, review_rows
+
+
+class CaseStore:
+    TABLES = ("cases", "reviews")
+
+    def __init__(self, path, flush_every=1000):
+        _pa()
+        self.path = path
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.review_buffer = []
+        for table in self.TABLES:
+            os.makedirs(os.path.join(path, table), exist_ok=True)
+
+    def _part_path(self, table):
+        # Unique per writer and sortable by time, so concurrent flushes never replace each other's parts
+        return os.path.join(self.path, table, f"part-{time.time_ns():020d}-{os.getpid()}.parquet")
+
+    def _parts(self, table):
+        folder = os.path.join(self.path, table)
+        return sorted(p for p in os.listdir(folder) if p.endswith('.parquet'))
+
+    def append(self, case):
+        """Buffers one finished case; a part file is written every `flush_every` cases."""
+        row, review_rows = case_rows(case)
+        with self.lock:
+            self.buffer.append(row)
+            self.review_buffer.extend(review_rows)
+            if len(self.buffer) >= self.flush_every:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        self.flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        pa = _pa()
+        import pyarrow.parquet as pq
+        cases_schema, reviews_schema = _schemas()
+        # Reviews first: a case row is never visible without its reviews
+        for table, rows, schema in (("reviews", self.review_buffer, reviews_schema), ("cases", self.buffer, cases_schema)):
+            part = self._part_path(table)
+            pq.write_table(pa.Table.from_pylist(rows, schema=schema), part + ".tmp", compression="zstd")
+            os.replace(part + ".tmp", part) # Atomic: a part is either complete or absent
+        self.buffer = []
+        self.review_buffer = []
+
+    def dataset(self, table="cases"):
+        """Memory-mapped pyarrow Dataset over every part of `table`."""
+        import pyarrow.dataset as ds
+        from pyarrow import fs
+        cases_schema, reviews_schema = _schemas()
+        schema = cases_schema if table == "cases" else reviews_schema
+        # Explicit part list, so a half-written .tmp from a concurrent flush is never read
+        files = [os.path.join(self.path, table, part) for part in self._parts(table)]
+        return ds.dataset(files, schema=schema, format="parquet", filesystem=fs.LocalFileSystem(use_mmap=True))
+
+    def query(self, verdict=None, velocity_burst=None, since=None, until=None, max_score=None, audit_source=None, columns=None):
+        """
+        Fleet query over the cases table, filtered before anything is materialized.
+        `since`/`until` are epoch seconds. Returns a pyarrow Table.
+        """
+        import pyarrow.dataset as ds
+        conditions = []
+        if verdict is not None:
+            conditions.append(ds.field("verdict") == verdict)
+        if audit_source is not None:
+            conditions.append(ds.field("audit_source") == audit_source)
+        if velocity_burst is not None:
+            conditions.append(ds.field("velocity_burst") == velocity_burst)
+        if since is not None:
+            conditions.append(ds.field("recorded_at") >= _timestamp(since))
+        if until is not None:
+            conditions.append(ds.field("recorded_at") < _timestamp(until))
+        if max_score is not None:
+            conditions.append(ds.field("trust_score") <= max_score)
+        condition = None
+        for c in conditions:
+            condition = c if condition is None else condition & c
+        return self.dataset("cases").to_table(columns=columns, filter=condition)
+
+    def reviews(self, case_ids, columns=None):
+        """Child-table rows for the given cases (e.g. the case_id column of a query() result)."""
+        import pyarrow.dataset as ds
+        pa = _pa()
+        return self.dataset("reviews").to_table(columns=columns, filter=ds.field("case_id").isin(pa.array(case_ids, pa.string())))
+
+    def rescore(self, ruleset=RULESET, **filters):
+        """
+        Re-scores stored cases (query() filters apply) with `ruleset`, vectorized.
+        Returns a Table: case_id, trust_score (as stored), rescored, rule_mask
+        (bit i = ruleset.rules[i] fired; see RuleSet.rule_ids). Cases written
+        before the rule features were stored count as having no links.
+        """
+        pa = _pa()
+        columns = ["case_id", "trust_score", "website", "phone", "osint_count", "velocity_burst", "verdict", "audit_source", *RULE_FEATURES]
+        table = self.query(columns=columns, **filters)
+        scores, masks = ruleset.score_frame(rule_frame(table))
+        return table.select(["case_id", "trust_score"]).append_column("rescored", pa.array(scores)).append_column("rule_mask", pa.array(masks))
+
+    def compact(self):
+        """Rewrites each table as a single part. Run while no writer is appending."""
+        import pyarrow.parquet as pq
+        with self.lock:
+            self._flush()
+            for table in self.TABLES:
+                parts = self._parts(table)
+                if len(parts) < 2:
+                    continue
+                folder = os.path.join(self.path, table)
+                merged = self.dataset(table).to_table()
+                target = self._part_path(table)
+                pq.write_table(merged, target + ".tmp", compression="zstd")
+                for part in parts:
+                    os.remove(os.path.join(folder, part))
+                os.replace(target + ".tmp", target)
+
+
+def rule_frame(table):
+    """{feature: numpy array} for RuleSet.score_frame from a cases Table."""
+    import pyarrow.compute as pc
+    pa = _pa()
+
+    def column(name, default):
+        values = table.column(name)
+        if pa.types.is_dictionary(values.type):
+            values = values.cast(pa.string())
+        return pc.fill_null(values, default)
+
+    def present(name):
+        return pc.fill_null(pc.greater(pc.utf8_length(table.column(name)), 0), False)
+
+    # A heuristic verdict only restates the other rules, as in calculate_trust_score
+    heuristic = pc.equal(column("audit_source", ""), "heuristic")
+    frame = {
+        "has_website": present("website"),
+        "has_phone": present("phone"),
+        "osint_count": column("osint_count", 0),
+        "velocity_burst": column("velocity_burst", False),
+        "audit_verdict": pc.if_else(heuristic, "", column("verdict", "")),
+    }
+    for f in RULE_FEATURES:
+        frame[f] = column(f, "" if f == "known_bad_kinds" else 0)
+    return {name: values.to_numpy(zero_copy_only=False) for name, values in frame.items()}
+
+
+def _timestamp(seconds):
+    pa = _pa()
+    return pa.scalar(int(seconds), type=pa.timestamp("s"))
+
+
+def parse_age(text):
+    """'7d' / '24h' / '30m' -> seconds."""
+    units = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+    return float(text[:-1]) * units[text[-1]] if text[-1] in units else float(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the SentinelMap case store.")
+    parser.add_argument("path", nargs="?", default=os.getenv("SENTINEL_CASE_STORE", ".cache/cases"))
+    parser.add_argument("--verdict", choices=["Low", "Medium", "High"])
+    parser.add_argument("--burst", action="store_true", help="only cases with a review velocity spike")
+    parser.add_argument("--since", help="age window, e.g. 7d or 24h")
+    parser.add_argument("--max-score", type=int)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--compact", action="store_true", help="merge part files first")
+    parser.add_argument("--rescore", action="store_true", help="re-score the matching cases with the current rules")
+    args = parser.parse_args(argv)
+
+    store = CaseStore(args.path)
+    if args.compact:
+        store.compact()
+    since = time.time() - parse_age(args.since) if args.since else None
+    if args.rescore:
+        rescore(store, verdict=args.verdict, velocity_burst=True if args.burst else None, since=since, max_score=args.max_score)
+        return
+    table = store.query(
+        verdict=args.verdict, velocity_burst=True if args.burst else None, since=since, max_score=args.max_score,
+        columns=["case_id", "recorded_at", "name", "trust_score", "verdict", "action", "max_in_24h"],
+    )
+    print(f"{table.num_rows} matching cases")
+    for row in table.slice(0, args.limit).to_pylist():
+        print(f"  {row['recorded_at']:%Y-%m-%d %H:%M} {row['verdict']:<6} score={row['trust_score']:<3} "
+              f"24h-peak={row['max_in_24h']:<3} {row['name']} [{row['case_id']}]")
+
+
+def rescore(store, **filters):
+    import numpy as np
+    start = time.time()
+    table = store.rescore(RULESET, **filters)
+    stored = table.column("trust_score").to_numpy(zero_copy_only=False)
+    rescored = table.column("rescored").to_numpy()
+    masks = table.column("rule_mask").to_numpy()
+    changed = np.flatnonzero(stored != rescored)
+    print(f"Rules {RULESET.version}: re-scored {table.num_rows} cases in {time.time() - start:.2f}s, {len(changed)} scores changed")
+    for bit, rule in enumerate(RULESET.rules):
+        print(f"  {rule.rule_id:<20} -{rule.penalty:<3} fired on {int(np.count_nonzero(masks >> bit & 1))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Cross-listing entity index.
+
+Lead-gen rings reuse burner phones, residential addresses and websites across many
+listings. Every processed listing is indexed under its normalized phone (E.164),
+normalized address and registrable domain, plus the OSINT links found for it, so
+"how many other listings share this phone?" is a dict lookup with no API calls.
+Entities can be flagged as known-bad to short-circuit further lookups.
+
+    python -m src.utils.entity_index flag phone "+1 555-019-9999" "Confirmed lead-gen burner"
+"""
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+KINDS = ("phone", "address", "domain", "link")
+
+ADDRESS_ABBREVIATIONS = {
+    "street": "st", "avenue": "ave", "road": "rd", "boulevard": "blvd", "drive": "dr",
+    "lane": "ln", "court": "ct", "place": "pl", "suite": "ste", "apartment": "apt",
+    "north": "n", "south": "s", "east": "e", "west": "w", "highway": "hwy",
+}
+ADDRESS_DROP = {"usa", "us", "united", "states", "of", "america"}
+
+# Two-label public suffixes we see in practice. Not the full PSL, on purpose.
+MULTI_PART_SUFFIXES = {
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "com.au", "net.au", "org.au", "co.in", "co.nz",
+    "com.br", "com.mx", "co.jp", "co.za", "com.sg", "com.cn",
+}
+
+
+def normalize_phone(phone, default_country_code="1"):
+    """'+1 555-019-9999' / '(555) 019-9999' -> '+15550199999'. None if it doesn't look like a phone."""
+    if not phone:
+        return None
+    raw = str(phone).strip()
+    digits = re.sub(r"\D", "", raw)
+    if raw.startswith("+"):
+        e164 = digits
+    elif digits.startswith("00"):
+        e164 = digits[2:]
+    elif len(digits) == 10:
+        e164 = default_country_code + digits
+    elif len(digits) == 11 and digits.startswith(default_country_code):
+        e164 = digits
+    else:
+        return None
+    return f"+{e164}" if 8 <= len(e164) <= 15 else None
+
+
+def normalize_address(address):
+    """Lowercased, punctuation-free, common suffixes abbreviated, country dropped."""
+    if not address:
+        return None
+    tokens = re.sub(r"[^\w\s]", " ", str(address).lower()).split()
+    tokens = [ADDRESS_ABBREVIATIONS.get(t, t) for t in tokens if t not in ADDRESS_DROP]
+    return " ".join(tokens) or None
+
+
+def registrable_domain(url):
+    """'https://www.ace-lock-fast.com/x' -> 'ace-lock-fast.com'; 'shop.example.co.uk' -> 'example.co.uk'."""
+    if not url:
+        return None
+    url = str(url).strip().lower()
+    host = urlparse(url if "//" in url else f"//{url}").hostname
+    if not host or "." not in host:
+        return None
+    labels = host.split(".")
+    if len(labels) >= 3 and ".".join(labels[-2:]) in MULTI_PART_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def normalize_link(url):
+    if not url:
+        return None
+    parsed = urlparse(str(url).strip().lower())
+    if not parsed.hostname:
+        return None
+    return f"{parsed.hostname.removeprefix('www.')}{parsed.path.rstrip('/')}"
+
+
+def listing_id(place_data):
+    return place_data.get('place_id') or f"{place_data.get('name')}|{normalize_address(place_data.get('address'))}"
+
+
+def listing_entities(place_data, osint_data=None):
+    """{kind: set(keys)} for one listing."""
+    entities = {
+        "phone": {normalize_phone(place_data.get('phone'))},
+        "address": {normalize_address(place_data.get('address'))},
+        "domain": {registrable_domain(place_data.get('website'))},
+        "link": {normalize_link(r.get('link')) for r in osint_data or []},
+    }
+    return {kind: {key for key in keys if key} for kind, keys in entities.items()}
+
+
+class EntityIndex:
+    """
+    Inverted index kind -> key -> listing ids, mirrored in memory for O(1) lookups
+    and persisted to SQLite (when `path` is given) so it grows across runs.
+    """
+
+    def __init__(self, path=None):
+        self.lock = threading.Lock()
+        self.index = defaultdict(set)   # (kind, key) -> {listing_id}
+        self.bad = {}                   # (kind, key) -> reason
+        self.path = path
+        self.conn = None
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS entities (
+                    kind TEXT NOT NULL, key TEXT NOT NULL, listing_id TEXT NOT NULL, first_seen REAL NOT NULL,
+                    PRIMARY KEY (kind, key, listing_id)
+                )
+            """)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS bad_entities (kind TEXT NOT NULL, key TEXT NOT NULL, reason TEXT, flagged_at REAL, PRIMARY KEY (kind, key))")
+            for kind, key, lid in self.conn.execute("SELECT kind, key, listing_id FROM entities"):
+                self.index[(kind, key)].add(lid)
+            for kind, key, reason in self.conn.execute("SELECT kind, key, reason FROM bad_entities"):
+                self.bad[(kind, key)] = reason
+
+    def add_listing(self, place_data, osint_data=None):
+        lid = listing_id(place_data)
+        rows = []
+        with self.lock:
+            for kind, keys in listing_entities(place_data, osint_data).items():
+                for key in keys:
+                    if lid not in self.index[(kind, key)]:
+                        self.index[(kind, key)].add(lid)
+                        rows.append((kind, key, lid, time.time()))
+            if self.conn and rows:
+                self.conn.executemany("INSERT OR IGNORE INTO entities VALUES (?, ?, ?, ?)", rows)
+        return lid
+
+    def lookup(self, kind, key):
+        """Listing ids indexed under an already-normalized key."""
+        return set(self.index.get((kind, key), ()))
+
+    def flag(self, kind, key, reason=""):
+        """Marks a normalized entity as known-bad."""
+        with self.lock:
+            self.bad[(kind, key)] = reason
+            if self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO bad_entities VALUES (?, ?, ?, ?)", (kind, key, reason, time.time()))
+
+    def known_bad(self, place_data, osint_data=None):
+        """[{"kind", "key", "reason"}] for every flagged entity this listing touches."""
+        hits = []
+        for kind, keys in listing_entities(place_data, osint_data).items():
+            for key in keys:
+                if (kind, key) in self.bad:
+                    hits.append({"kind": kind, "key": key, "reason": self.bad[(kind, key)]})
+        return hits
+
+    def links(self, place_data, osint_data=None):
+        """
+        Signals for the risk engine: how many *other* listings share each contact entity,
+        plus any known-bad hits. {"phone": n, "address": n, "domain": n, "link": n, "known_bad": [...]}
+        """
+        lid = listing_id(place_data)
+        entities = listing_entities(place_data, osint_data)
+        shared = {}
+        for kind in KINDS:
+            others = set()
+            for key in entities[kind]:
+                others |= self.index.get((kind, key), set())
+            others.discard(lid)
+            shared[kind] = len(others)
+        shared["known_bad"] = self.known_bad(place_data, osint_data)
+        return shared
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    path = os.getenv("SENTINEL_ENTITY_INDEX", ".cache/entities.sqlite")
+    normalizers = {"phone": normalize_phone, "address": normalize_address, "domain": registrable_domain, "link": normalize_link}
+    if len(argv) < 3 or argv[0] not in ("flag", "lookup") or argv[1] not in normalizers:
+        print("usage: python -m src.utils.entity_index (flag|lookup) (phone|address|domain|link) VALUE [REASON]")
+        return
+    index = EntityIndex(path)
+    key = normalizers[argv[1]](argv[2])
+    if argv[0] == "flag":
+        index.flag(argv[1], key, " ".join(argv[3:]))
+        print(f"Flagged {argv[1]} {key}")
+    else:
+        print(f"{argv[1]} {key}: {sorted(index.lookup(argv[1], key))} bad={index.bad.get((argv[1], key))}")
+
+
+if __name__ == "__main__":
+    main()
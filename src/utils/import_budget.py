@@ -0,0 +1,81 @@
+"""
+Import-time budget for the headless entry points.
+
+Batch workers, the investigation service and scripts import the pipeline without
+the dashboard. Two things keep that cold start cheap: UI libraries (streamlit,
+plotly, pandas) never load, and the vendor SDKs (googlemaps, serpapi) and
+optional backends (pyarrow, aiohttp) load on first use. This check imports each
+entry point in a fresh interpreter under `-X importtime`, then fails if a module
+leaks in or the cumulative import time exceeds the budget.
+
+    python -m src.utils.import_budget                 # exit status 1 on a violation
+    python -m src.utils.import_budget --budget-ms 200 --top 10
+"""
+import argparse
+import subprocess
+import sys
+
+HEADLESS_MODULES = ("src.pipeline.batch", "src.pipeline.service", "src.pipeline.workers", "src.utils.risk_engine")
+# Never on the headless import path
+UI_MODULES = ("streamlit", "plotly", "pandas")
+# Loaded on first use only
+LAZY_MODULES = ("googlemaps", "serpapi", "pyarrow", "aiohttp")
+IMPORT_BUDGET_MS = 300
+RUNS = 3 # Best of N, to keep scheduler noise out of the number
+
+
+def profile_import(module):
+    """
+    Imports `module` in a fresh interpreter. Returns (cumulative_ms, {module: self_ms}, loaded)
+    where `loaded` is every top-level package in sys.modules afterwards.
+    """
+    code = f"import sys, {module}; print(','.join(sorted({{m.split('.')[0] for m in sys.modules}})))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+    cumulative_ms, self_ms = 0.0, {}
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, total, name = line[len("import time:"):].split("|")
+        if not own.strip().isdigit():
+            continue # Header row
+        self_ms[name.strip()] = int(own) / 1000
+        if name.strip() == module:
+            cumulative_ms = int(total) / 1000
+    return cumulative_ms, self_ms, set(result.stdout.strip().split(","))
+
+
+def check(modules=HEADLESS_MODULES, budget_ms=IMPORT_BUDGET_MS, runs=RUNS, top=5):
+    """Prints one report per module. Returns the list of violations (empty when within budget)."""
+    violations = []
+    for module in modules:
+        profiles = [profile_import(module) for _ in range(runs)]
+        cumulative_ms, self_ms, loaded = min(profiles, key=lambda p: p[0])
+        leaked = sorted(loaded & set(UI_MODULES + LAZY_MODULES))
+        status = "OK" if cumulative_ms <= budget_ms and not leaked else "OVER"
+        print(f"[{status}] {module}: {cumulative_ms:.0f} ms (budget {budget_ms} ms)")
+        for name, ms in sorted(self_ms.items(), key=lambda item: -item[1])[:top]:
+            print(f"        {ms:7.1f} ms  {name}")
+        if cumulative_ms > budget_ms:
+            violations.append(f"{module} imports in {cumulative_ms:.0f} ms (budget {budget_ms} ms)")
+        if leaked:
+            violations.append(f"{module} loads {', '.join(leaked)} at import time")
+    return violations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the headless import path stays fast and UI-free.")
+    parser.add_argument("modules", nargs="*", default=list(HEADLESS_MODULES))
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--top", type=int, default=5, help="slowest imports to list per module")
+    args = parser.parse_args(argv)
+
+    violations = check(args.modules, args.budget_ms, args.runs, args.top)
+    for violation in violations:
+        print(f"Import budget violation: {violation}")
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Lightweight instrumentation: stage spans, counters and a Prometheus text export.
+
+    with span("maps", op="details"):
+        ...                                  # latency histogram + call/error counters
+    count("sentinel_fallbacks_total", service="gemini", reason="http_error")
+
+    with trace() as case_trace:              # collect the spans of one case
+        investigator.investigate(query)
+    case_trace.stage_totals()                # {"maps": 0.21, "serp": 0.44, ...} seconds
+
+Spans created in worker threads are attributed to the case only if the work was
+submitted with submit(), which carries the caller's context across.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_trace = contextvars.ContextVar("sentinel_trace", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+
+    def count(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    hist[i] += 1
+            hist[-2] += value
+            hist[-1] += 1
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (0.0.4)."""
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self.lock:
+            seen = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE {name} counter")
+                    seen.add(name)
+                lines.append(f"{name}{fmt(labels)} {value}")
+            for (name, labels), hist in sorted(self.histograms.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE {name} histogram")
+                    seen.add(name)
+                for bound, n in zip(BUCKETS, hist):
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {n}")
+                lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {hist[-1]}")
+                lines.append(f"{name}_sum{fmt(labels)} {hist[-2]:.6f}")
+                lines.append(f"{name}_count{fmt(labels)} {hist[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class CaseTrace:
+    """Spans recorded for a single case (shared by every thread the case fans out to)."""
+
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+
+    def add(self, stage, op, seconds, error):
+        with self.lock:
+            self.spans.append({"stage": stage, "op": op, "seconds": seconds, "error": error})
+
+    def stage_totals(self):
+        """Seconds per stage, summed over calls (parallel calls can add up to more than wall time)."""
+        totals = {}
+        with self.lock:
+            for s in self.spans:
+                totals[s['stage']] = totals.get(s['stage'], 0.0) + s['seconds']
+        return totals
+
+    def wall_seconds(self):
+        return time.perf_counter() - self.started
+
+
+@contextmanager
+def span(stage, op="call"):
+    """Times one call to a stage ("maps", "serp", "gemini", "scoring")."""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        REGISTRY.observe("sentinel_stage_seconds", seconds, stage=stage, op=op)
+        REGISTRY.count("sentinel_calls_total", stage=stage, op=op)
+        if error:
+            REGISTRY.count("sentinel_errors_total", stage=stage, op=op)
+        case_trace = _current_trace.get()
+        if case_trace is not None:
+            case_trace.add(stage, op, seconds, error)
+
+
+def count(name, amount=1, **labels):
+    REGISTRY.count(name, amount, **labels)
+
+
+@contextmanager
+def trace():
+    case_trace = CaseTrace()
+    token = _current_trace.set(case_trace)
+    try:
+        yield case_trace
+    finally:
+        _current_trace.reset(token)
+
+
+def submit(pool, fn, *args, **kwargs):
+    """executor.submit that keeps the caller's trace, so worker-thread spans land in the same case."""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def to_prometheus():
+    return REGISTRY.to_prometheus()
+
+
+def write_prometheus(path):
+    """Writes the current metrics for node_exporter's textfile collector (atomic replace)."""
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(to_prometheus())
+    os.replace(path + ".tmp", path)
+
+
+def serve_metrics(port, host="0.0.0.0"):
+    """Starts a background /metrics endpoint for Prometheus to scrape. Returns the server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = to_prometheus().encode("utf-8")
+            self.send_response(200 if self.path.startswith("/metrics") else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,400 @@
+"""
+Local pre-screen: a CPU-only linear model that predicts the Gemini auditor's verdict.
+
+Features are hashed word n-grams of the listing's name, category, address and
+reviews, plus the Risk Engine's rule features (contact gaps, footprint,
+velocity, shared entities, pin density). A softmax regression over them scores
+thousands of listings per second with NumPy alone. Temperature scaling
+calibrates its probabilities on a calibration split. Each verdict then gets its own
+confidence threshold: the lowest one at which calibration predictions of that verdict
+still reach the target precision. Only cases below their verdict's threshold
+still go to Gemini. The published report comes from a third, untouched test split.
+
+Training data is the case store: every case with a real Gemini verdict
+(audit_source "gemini") is a labelled example.
+
+    python -m src.utils.prescreen train .cache/cases --out .cache/prescreen.npz --target-precision 0.95
+    python -m src.utils.prescreen report .cache/prescreen.npz
+    python -m src.pipeline.batch queue.csv results.jsonl --prescreen .cache/prescreen.npz
+
+    model = PreScreen.load(".cache/prescreen.npz")
+    verdict, confidence = model.predict(place_data, osint_data, entity_links=..., spatial_links=...)
+    model.confident(verdict, confidence)   # True -> no Gemini call needed
+"""
+import argparse
+import json
+import math
+import re
+import time
+import zlib
+import numpy as np
+from src.utils.audit_schema import VERDICTS
+from src.utils.risk_rules import case_features
+
+HASH_BITS = 18
+REVIEWS_USED = 10           # Reviews hashed per listing (in listing order)
+TARGET_PRECISION = 0.95
+MIN_SUPPORT = 20            # Held-out predictions a per-verdict threshold must rest on
+TOKEN = re.compile(r"[a-z0-9']+")
+
+# Structured features (from the Risk Engine's rule features) and their transforms
+STRUCTURED = (
+    ("has_website", float),
+    ("has_phone", float),
+    ("osint_count", math.log1p),
+    ("velocity_burst", float),
+    ("duplicate_reviews", math.log1p),
+    ("cross_listing_reviews", math.log1p),
+    ("known_bad", float),
+    ("shared_phone", math.log1p),
+    ("shared_address", math.log1p),
+    ("stacked", math.log1p),
+    ("same_type_nearby", math.log1p),
+    ("rating", lambda r: r / 5.0),
+    ("review_count", math.log1p),
+)
+
+
+def _hash(token, mask):
+    return zlib.crc32(token.encode("utf-8")) & mask
+
+
+def listing_document(name, primary_type, address, review_texts, structured):
+    """Raw inputs of one listing, in the same shape for live cases and stored ones."""
+    return {
+        "name": name or "", "primary_type": primary_type or "", "address": address or "",
+        "reviews": [t for t in review_texts if t][:REVIEWS_USED],
+        "structured": structured,
+    }
+
+
+def case_document(place_data, osint_data, entity_links=None, review_links=None, spatial_links=None):
+    """listing_document() for a live case (arguments as for calculate_trust_score)."""
+    features = case_features(place_data, osint_data, None, entity_links, review_links, spatial_links)
+    reviews = place_data.get('reviews') or []
+    structured = {
+        **features,
+        "known_bad": features['known_bad_kinds'] != "",
+        "rating": place_data.get('rating') or 0.0,
+        "review_count": place_data.get('user_ratings_total', len(reviews)) or 0,
+    }
+    return listing_document(
+        place_data.get('name'), (place_data.get('types') or [None])[0], place_data.get('address'),
+        [r.get('text') for r in reviews], structured,
+    )
+
+
+def store_documents(store, **filters):
+    """(documents, verdicts) for every stored case with a Gemini verdict. `filters` as for CaseStore.query()."""
+    from src.utils.case_store import RULE_FEATURES, rule_frame
+    columns = ["case_id", "name", "primary_type", "address", "rating", "review_count", "verdict", "audit_source",
+               "website", "phone", "osint_count", "velocity_burst", *RULE_FEATURES]
+    table = store.query(audit_source="gemini", columns=columns, **filters)
+    frame = rule_frame(table)
+    rows = table.select(["case_id", "name", "primary_type", "address", "rating", "review_count", "verdict"]).to_pylist()
+
+    texts = {}
+    for review in store.reviews([r['case_id'] for r in rows], columns=["case_id", "text"]).to_pylist():
+        texts.setdefault(review['case_id'], []).append(review['text'])
+
+    documents, verdicts = [], []
+    for i, row in enumerate(rows):
+        structured = {name: frame[name][i] for name, _ in STRUCTURED if name in frame}
+        structured.update({
+            "known_bad": frame['known_bad_kinds'][i] != "",
+            "rating": row['rating'] or 0.0,
+            "review_count": row['review_count'] or 0,
+        })
+        documents.append(listing_document(row['name'], row['primary_type'], row['address'], texts.get(row['case_id'], []), structured))
+        verdicts.append(row['verdict'])
+    return documents, verdicts
+
+
+class PreScreen:
+    def __init__(self, weights, bias, temperature=1.0, min_confidence=None, bits=HASH_BITS, report=None):
+        self.weights = weights               # (2**bits + len(STRUCTURED), len(VERDICTS))
+        self.bias = bias
+        self.temperature = temperature
+        self.min_confidence = min_confidence or {v: 1.0 for v in VERDICTS}   # verdict -> threshold (1.0: never local)
+        self.bits = bits
+        self.report = report or {}
+
+    # --- Features ---
+
+    def _vectorize(self, document):
+        """(indices, values) of one document: L2-normalized n-gram counts, then the structured features."""
+        mask = (1 << self.bits) - 1
+        counts = {}
+        fields = [("n", document['name']), ("t", document['primary_type']), ("a", document['address'])]
+        fields += [("r", text) for text in document['reviews']]
+        for prefix, text in fields:
+            tokens = TOKEN.findall(text.lower())
+            for i, token in enumerate(tokens):
+                h = _hash(f"{prefix}:{token}", mask)
+                counts[h] = counts.get(h, 0) + 1
+                if i:
+                    h = _hash(f"{prefix}:{tokens[i - 1]} {token}", mask)
+                    counts[h] = counts.get(h, 0) + 1
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        norm = np.sqrt(np.dot(values, values))
+        if norm:
+            values /= norm
+        structured = document['structured']
+        extra = np.array([transform(float(structured.get(name) or 0)) for name, transform in STRUCTURED], dtype=np.float32)
+        return np.concatenate([indices, np.arange(1 << self.bits, (1 << self.bits) + len(STRUCTURED))]), np.concatenate([values, extra])
+
+    def _matrix(self, documents):
+        """Sparse rows as (row_ids, indices, values)."""
+        rows = [self._vectorize(d) for d in documents]
+        row_ids = np.concatenate([np.full(len(idx), i, dtype=np.int64) for i, (idx, _) in enumerate(rows)])
+        return row_ids, np.concatenate([idx for idx, _ in rows]), np.concatenate([val for _, val in rows])
+
+    # --- Scoring ---
+
+    def _logits(self, matrix, n, weights=None, bias=None):
+        row_ids, indices, values = matrix
+        weights = self.weights if weights is None else weights
+        bias = self.bias if bias is None else bias
+        return np.stack([np.bincount(row_ids, weights=values * weights[indices, k], minlength=n) for k in range(weights.shape[1])], axis=1) + bias
+
+    def probabilities(self, documents):
+        """(n, 3) calibrated probabilities over VERDICTS."""
+        documents = list(documents)
+        if not documents:
+            return np.zeros((0, len(VERDICTS)))
+        return _softmax(self._logits(self._matrix(documents), len(documents)) / self.temperature)
+
+    def predict(self, place_data, osint_data, entity_links=None, review_links=None, spatial_links=None):
+        """(verdict, calibrated confidence) for one live case."""
+        probs = self.probabilities([case_document(place_data, osint_data, entity_links, review_links, spatial_links)])[0]
+        best = int(np.argmax(probs))
+        return VERDICTS[best], float(probs[best])
+
+    def confident(self, verdict, confidence):
+        return confidence >= self.min_confidence[verdict]
+
+    # --- Training ---
+
+    @classmethod
+    def train(cls, documents, verdicts, holdout=0.2, calibration=0.2, target_precision=TARGET_PRECISION, epochs=200, l2=1e-5, bits=HASH_BITS, seed=0):
+        """
+        Three random splits: fits the weights on the train share, the temperature and
+        min_confidence on the `calibration` share, and writes the precision/recall
+        report on the `holdout` share, which nothing was fitted on.
+        """
+        labels = np.array([VERDICTS.index(v) for v in verdicts])
+        order = np.random.default_rng(seed).permutation(len(labels))
+        test_cut = int(len(labels) * (1 - holdout))
+        calibration_cut = int(len(labels) * (1 - holdout - calibration))
+        train_idx, calibration_idx, test_idx = order[:calibration_cut], order[calibration_cut:test_cut], order[test_cut:]
+        if len(train_idx) == 0 or len(calibration_idx) == 0 or len(test_idx) == 0:
+            raise ValueError(f"Need more labelled cases to train, calibrate and hold out ({len(labels)} found)")
+
+        model = cls(None, None, bits=bits)
+        train_docs = [documents[i] for i in train_idx]
+        matrix = model._matrix(train_docs)
+        model.weights, model.bias = _fit_softmax(model, matrix, labels[train_idx], (1 << bits) + len(STRUCTURED), epochs, l2)
+
+        # Step 1: Calibrate the temperature and the per-verdict thresholds
+        calibration_docs = [documents[i] for i in calibration_idx]
+        logits = model._logits(model._matrix(calibration_docs), len(calibration_docs))
+        model.temperature = _fit_temperature(logits, labels[calibration_idx])
+        model.min_confidence = _min_confidence(_softmax(logits / model.temperature), labels[calibration_idx], target_precision)
+
+        # Step 2: Report on cases neither the weights nor the thresholds have seen
+        test_docs = [documents[i] for i in test_idx]
+        probs = model.probabilities(test_docs)
+        model.report = evaluate(probs, labels[test_idx], model.min_confidence)
+        model.report.update({
+            "trained_at": int(time.time()), "train_cases": len(train_idx), "calibration_cases": len(calibration_idx),
+            "target_precision": target_precision, "temperature": round(model.temperature, 3),
+        })
+        return model
+
+    def save(self, path):
+        np.savez_compressed(
+            path, weights=self.weights.astype(np.float32), bias=self.bias, temperature=self.temperature,
+            min_confidence=json.dumps(self.min_confidence), bits=self.bits, report=json.dumps(self.report),
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(
+            data['weights'], data['bias'], temperature=float(data['temperature']), min_confidence=json.loads(str(data['min_confidence'])),
+            bits=int(data['bits']), report=json.loads(str(data['report'])),
+        )
+
+
+def _softmax(logits):
+    z = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return z / z.sum(axis=1, keepdims=True)
+
+
+def _fit_softmax(model, matrix, labels, dims, epochs, l2, lr=0.05):
+    """Full-batch Adam on the mean cross-entropy + L2. Returns (weights, bias)."""
+    row_ids, indices, values = matrix
+    n, k = len(labels), len(VERDICTS)
+    weights, bias = np.zeros((dims, k)), np.zeros(k)
+    onehot = np.eye(k)[labels]
+    moments = [np.zeros_like(weights), np.zeros_like(weights), np.zeros(k), np.zeros(k)]
+    for step in range(1, epochs + 1):
+        error = (_softmax(model._logits(matrix, n, weights, bias)) - onehot) / n
+        grad_w = np.stack([np.bincount(indices, weights=values * error[row_ids, c], minlength=dims) for c in range(k)], axis=1) + l2 * weights
+        grad_b = error.sum(axis=0)
+        for i, (param, grad) in enumerate(((weights, grad_w), (bias, grad_b))):
+            m, v = moments[2 * i], moments[2 * i + 1]
+            m *= 0.9
+            m += 0.1 * grad
+            v *= 0.999
+            v += 0.001 * grad * grad
+            param -= lr * (m / (1 - 0.9 ** step)) / (np.sqrt(v / (1 - 0.999 ** step)) + 1e-8)
+    return weights, bias
+
+
+def _fit_temperature(logits, labels):
+    """Temperature minimizing held-out negative log-likelihood (grid search)."""
+    best, best_nll = 1.0, float("inf")
+    for t in np.exp(np.linspace(math.log(0.1), math.log(10), 81)):
+        nll = -np.log(_softmax(logits / t)[np.arange(len(labels)), labels] + 1e-12).mean()
+        if nll < best_nll:
+            best, best_nll = float(t), nll
+    return best
+
+
+def _min_confidence(probs, labels, target_precision):
+    """
+    Per verdict: the lowest confidence at which predictions of that verdict at or
+    above it are still `target_precision` correct, over at least MIN_SUPPORT
+    held-out cases (1.0: never decided locally).
+    """
+    predicted = probs.argmax(axis=1)
+    thresholds = {}
+    for c, verdict in enumerate(VERDICTS):
+        confidence = probs[predicted == c, c]
+        order = np.argsort(-confidence)
+        correct = (labels[predicted == c] == c)[order]
+        precision = np.cumsum(correct) / np.arange(1, len(correct) + 1)
+        thresholds[verdict] = 1.0
+        # Ties share a threshold, so only cut where the next confidence is strictly lower
+        for i in np.flatnonzero(precision >= target_precision)[::-1]:
+            if i + 1 < MIN_SUPPORT:
+                break
+            if i + 1 == len(order) or confidence[order[i + 1]] < confidence[order[i]]:
+                thresholds[verdict] = float(confidence[order[i]])
+                break
+    return thresholds
+
+
+def evaluate(probs, labels, min_confidence, bins=10):
+    """Calibration, precision/recall and coverage report for held-out predictions."""
+    labels = np.asarray(labels)
+    predicted = probs.argmax(axis=1)
+    confidence = probs.max(axis=1)
+    decided = confidence >= np.array([min_confidence[v] for v in VERDICTS])[predicted]
+
+    def per_class(mask):
+        result = {}
+        for c, verdict in enumerate(VERDICTS):
+            tp = int(np.sum((predicted == c) & (labels == c) & mask))
+            predicted_c = int(np.sum((predicted == c) & mask))
+            actual_c = int(np.sum((labels == c) & mask))
+            result[verdict] = {
+                "precision": round(tp / predicted_c, 3) if predicted_c else None,
+                "recall": round(tp / actual_c, 3) if actual_c else None,
+                "support": actual_c,
+            }
+        return result
+
+    reliability, ece = [], 0.0
+    edges = np.linspace(0, 1, bins + 1)
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        in_bin = (confidence > lo) & (confidence <= hi)
+        if in_bin.any():
+            accuracy = float(np.mean(predicted[in_bin] == labels[in_bin]))
+            mean_confidence = float(np.mean(confidence[in_bin]))
+            ece += in_bin.mean() * abs(accuracy - mean_confidence)
+            reliability.append({"bin": f"{lo:.1f}-{hi:.1f}", "cases": int(in_bin.sum()), "confidence": round(mean_confidence, 3), "accuracy": round(accuracy, 3)})
+
+    # "Risky" (Medium or High) vs Low, ranked by P(Medium) + P(High)
+    risky = labels > 0
+    risk = probs[:, 1:].sum(axis=1)
+    order = np.argsort(-risk)
+    hits = np.cumsum(risky[order])
+    precision = hits / np.arange(1, len(order) + 1)
+    average_precision = float(np.sum(precision * risky[order]) / max(1, risky.sum()))
+    pr_curve = []
+    for threshold in (0.1, 0.25, 0.5, 0.75, 0.9):
+        flagged = risk >= threshold
+        tp = int(np.sum(flagged & risky))
+        pr_curve.append({
+            "threshold": threshold,
+            "precision": round(tp / flagged.sum(), 3) if flagged.any() else None,
+            "recall": round(tp / risky.sum(), 3) if risky.any() else None,
+        })
+
+    return {
+        "holdout_cases": int(len(labels)),
+        "accuracy": round(float(np.mean(predicted == labels)), 3),
+        "per_class": per_class(np.ones(len(labels), dtype=bool)),
+        "expected_calibration_error": round(float(ece), 4),
+        "reliability": reliability,
+        "risky_average_precision": round(average_precision, 3),
+        "risky_pr_curve": pr_curve,
+        "min_confidence": {v: round(t, 4) for v, t in min_confidence.items()},
+        "coverage": round(float(decided.mean()), 3),   # Share decided locally, without Gemini
+        "decided_accuracy": round(float(np.mean(predicted[decided] == labels[decided])), 3) if decided.any() else None,
+        "decided_per_class": per_class(decided),
+        "risky_cleared_locally": int(np.sum(decided & (predicted == 0) & risky)),
+    }
+
+
+def print_report(report):
+    print(f"Held-out cases: {report['holdout_cases']}  accuracy={report['accuracy']}  ECE={report['expected_calibration_error']}  "
+          f"risky AP={report['risky_average_precision']}")
+    for verdict, stats in report['per_class'].items():
+        print(f"  {verdict:<6} precision={stats['precision']}  recall={stats['recall']}  support={stats['support']}")
+    print("Reliability (confidence -> accuracy):")
+    for row in report['reliability']:
+        print(f"  {row['bin']}  {row['cases']:>6} cases  conf={row['confidence']}  acc={row['accuracy']}")
+    print("Risky (Medium/High) precision/recall:")
+    for row in report['risky_pr_curve']:
+        print(f"  P(risky) >= {row['threshold']:<4}  precision={row['precision']}  recall={row['recall']}")
+    print(f"Local decisions (confidence thresholds {report['min_confidence']}):")
+    print(f"  coverage={report['coverage']}  accuracy={report['decided_accuracy']}  risky cleared as Low={report['risky_cleared_locally']}")
+    for verdict, stats in report['decided_per_class'].items():
+        print(f"  {verdict:<6} precision={stats['precision']}  recall={stats['recall']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train or inspect the local verdict pre-screen.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="fit on the case store's Gemini verdicts")
+    train.add_argument("store", help="case store directory")
+    train.add_argument("--out", default=".cache/prescreen.npz")
+    train.add_argument("--target-precision", type=float, default=TARGET_PRECISION, help="precision required of each locally decided verdict")
+    train.add_argument("--holdout", type=float, default=0.2, help="share of cases kept for the report only")
+    train.add_argument("--calibration", type=float, default=0.2, help="share of cases for the temperature and thresholds")
+    train.add_argument("--epochs", type=int, default=200)
+    report = commands.add_parser("report", help="print a saved model's held-out report")
+    report.add_argument("model")
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        print_report(PreScreen.load(args.model).report)
+        return
+
+    from src.utils.case_store import CaseStore
+    documents, verdicts = store_documents(CaseStore(args.store))
+    print(f"Training on {len(documents)} Gemini-audited cases...")
+    start = time.time()
+    model = PreScreen.train(documents, verdicts, holdout=args.holdout, calibration=args.calibration, target_precision=args.target_precision, epochs=args.epochs)
+    print(f"Trained in {time.time() - start:.1f}s")
+    model.save(args.out)
+    print_report(model.report)
+    print(f"Saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
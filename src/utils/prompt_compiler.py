@@ -0,0 +1,153 @@
+"""
+Token-budgeted evidence compiler for the Gemini audit prompt.
+
+Instead of Python reprs (quotes, dict keys, a blind 1000-char slice), each listing
+is rendered as a few compact pipe-separated tables, and evidence is picked by relevance until the
+budget is spent:
+
+    LISTING | Ace 24/7 Locksmith | 123 Residential Ave, Anytown, CA | (555) 019-9999 | ace-lock-fast.com | locksmith | 4.8★ (5)
+    REVIEWS n=5 mean=4.2 | peak/1h=1 peak/24h=4 burst@2024-03-01 | near-duplicates=0
+    date|★|x|text
+    2024-03-01|5|1|Fastest service ever! arrived in 5 mins.
+    OSINT n=2 (of 3, deduplicated)
+    source|title|snippet
+    yelp.com|Ace Locksmith - Yelp|...
+
+Near-duplicate reviews are collapsed into one row with a count ("x" column), and
+reviews inside the burst window, at the rating extremes or in a duplicate cluster
+come first. estimate_tokens() is a local, dependency-free approximation of the
+SentencePiece count (about 4 characters per token on English text, never less than
+one token per word or symbol), so the budget holds without a count_tokens round trip.
+"""
+import math
+import re
+import time
+from src.utils.entity_index import registrable_domain, normalize_link
+from src.utils.review_similarity import sign_reviews, similarity, SIMILARITY, normalize_text
+from src.utils.review_velocity import analyze_review_velocity, DAY
+
+EVIDENCE_TOKENS = 900        # Per listing, header and policies excluded
+REVIEW_SHARE = 0.6           # Of what's left after the listing line, for reviews (OSINT gets the rest)
+REVIEW_CHARS = 220
+SNIPPET_CHARS = 160
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    """Local token estimate: ~4 chars per token for words, 1 per symbol."""
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _TOKEN_RE.findall(text or ""))
+
+
+def _cell(value, limit=None):
+    text = " ".join(str(value if value is not None else "-").split()).replace("|", "/")
+    if limit and len(text) > limit:
+        text = text[:limit].rsplit(" ", 1)[0] + "…"
+    return text or "-"
+
+
+def review_clusters(reviews):
+    """Groups near-duplicate reviews: [(representative, members)], biggest clusters first."""
+    signed = sign_reviews(reviews)
+    signature_of = {id(r): s for r, s in signed}
+    clusters = []
+    for review in reviews:
+        signature = signature_of.get(id(review))
+        for cluster in clusters:
+            rep_signature = signature_of.get(id(cluster[0]))
+            if signature is not None and rep_signature is not None and similarity(signature, rep_signature) >= SIMILARITY:
+                cluster[1].append(review)
+                break
+            if signature is None and normalize_text(review.get('text')) == normalize_text(cluster[0].get('text')):
+                cluster[1].append(review) # Short identical texts ("Great!") still collapse
+                break
+        else:
+            clusters.append((review, [review]))
+    return sorted(clusters, key=lambda c: -len(c[1]))
+
+
+def _review_relevance(cluster, burst_start):
+    rep, members = cluster
+    in_burst = burst_start is not None and any(burst_start <= (r.get('time') or 0) < burst_start + DAY for r in members)
+    extreme = (rep.get('rating') or 0) in (1, 5)
+    return (len(members) > 1, in_burst, extreme, rep.get('time') or 0)
+
+
+def compile_reviews(reviews, budget):
+    """Review summary line + as many relevant review rows as fit in `budget` tokens."""
+    if not reviews:
+        return "REVIEWS n=0"
+    velocity = analyze_review_velocity(reviews)
+    clusters = review_clusters(reviews)
+    duplicates = sum(len(members) for _, members in clusters if len(members) > 1)
+    burst = ""
+    if velocity['burst']:
+        burst = f" burst@{time.strftime('%Y-%m-%d', time.gmtime(velocity['burst_start']))}"
+    lines = [
+        f"REVIEWS n={len(reviews)} mean={velocity['overall_mean_rating']:.1f} | "
+        f"peak/1h={velocity['max_in_window']['1h']} peak/24h={velocity['max_in_window']['24h']}{burst} | "
+        f"near-duplicates={duplicates}",
+        "date|★|x|text",
+    ]
+    used = estimate_tokens("\n".join(lines))
+    ranked = sorted(clusters, key=lambda c: _review_relevance(c, velocity['burst_start']), reverse=True)
+    shown = 0
+    for rep, members in ranked:
+        when = time.strftime("%Y-%m-%d", time.gmtime(rep['time'])) if rep.get('time') else "-"
+        row = f"{when}|{_cell(rep.get('rating'))}|{len(members)}|{_cell(rep.get('text'), REVIEW_CHARS)}"
+        cost = estimate_tokens(row) + 1
+        if used + cost > budget:
+            break
+        lines.append(row)
+        used += cost
+        shown += 1
+    if shown < len(ranked):
+        lines.append(f"(+{len(ranked) - shown} more review groups omitted)")
+    return "\n".join(lines)
+
+
+def dedupe_osint(osint_data):
+    """Drops repeated links and repeated (domain, snippet) pairs, keeping search order."""
+    seen, kept = set(), []
+    for result in osint_data or []:
+        keys = {("link", normalize_link(result.get('link')))} if result.get('link') else set()
+        keys.add(("text", registrable_domain(result.get('link')), normalize_text(result.get('snippet') or result.get('title'))))
+        if keys & seen:
+            continue
+        seen |= keys
+        kept.append(result)
+    return kept
+
+
+def compile_osint(osint_data, budget):
+    results = dedupe_osint(osint_data)
+    lines = [f"OSINT n={len(results)}" + (f" (of {len(osint_data)}, deduplicated)" if len(results) < len(osint_data or []) else "")]
+    if not results:
+        return lines[0]
+    lines.append("source|title|snippet")
+    used = estimate_tokens("\n".join(lines))
+    for n, result in enumerate(results):
+        source = registrable_domain(result.get('link')) or result.get('source') or "-"
+        row = f"{_cell(source)}|{_cell(result.get('title'), 80)}|{_cell(result.get('snippet'), SNIPPET_CHARS)}"
+        cost = estimate_tokens(row) + 1
+        if used + cost > budget:
+            lines.append(f"(+{len(results) - n} more results omitted)")
+            break
+        lines.append(row)
+        used += cost
+    return "\n".join(lines)
+
+
+def compile_evidence(place_data, osint_data, budget=EVIDENCE_TOKENS):
+    """The DATA ARTIFACTS block for one listing, kept within `budget` estimated tokens."""
+    rating = place_data.get('rating')
+    rating_text = f"{rating}★ ({place_data.get('user_ratings_total', len(place_data.get('reviews') or []))})" if rating else "-"
+    listing = "LISTING | " + " | ".join(_cell(v) for v in (
+        place_data.get('name'), place_data.get('address'), place_data.get('phone'),
+        registrable_domain(place_data.get('website')) or place_data.get('website'),
+        ", ".join(place_data.get('types') or []) or None, rating_text,
+    ))
+    remaining = max(0, budget - estimate_tokens(listing))
+    reviews = compile_reviews(place_data.get('reviews') or [], int(remaining * REVIEW_SHARE))
+    osint = compile_osint(osint_data, remaining - estimate_tokens(reviews))
+    return "\n".join((listing, reviews, osint))
@@ -0,0 +1,278 @@
+"""
+Cross-process quota ledger and API key rotation.
+
+Every live call to Maps, SerpApi or Gemini first takes a token from a per-key
+token bucket kept in one SQLite file. Every thread, process and worker pool on
+the host shares it, so together they stay inside each key's quota instead of
+each discovering the limit through 429s. A service configured with several keys
+("key1,key2" in its env var) always draws from the key with the most headroom. A
+key that still gets rate limited is cooled down and skipped for a while.
+
+When every key's budget is spent, the caller waits up to `max_wait` for a
+token. After that it gets QuotaDeferred (a QuotaExceededError), never a
+fabricated result. Batch runs record such cases as "deferred" and retry them on
+resume.
+
+    export SENTINEL_QUOTA_LEDGER=.cache/quota.sqlite    # or: batch --quota-ledger PATH
+    python -m src.utils.quota set gemini --per-minute 1000 --per-day 0
+    python -m src.utils.quota status
+
+Raw keys are never written to the ledger, only a short hash of each.
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from src.services.http_client import QuotaExceededError
+
+# Per key. per_day 0/None = no daily cap. Days roll over at midnight UTC.
+DEFAULT_QUOTAS = {
+    "maps": {"per_minute": 600, "per_day": None},
+    "serp": {"per_minute": 60, "per_day": None},
+    "gemini": {"per_minute": 15, "per_day": 1500},
+}
+MAX_WAIT = 30.0        # Seconds a caller waits for a token before deferring
+COOLDOWN = 60.0        # Seconds a key sits out after a 429 / OVER_QUERY_LIMIT
+
+
+class QuotaDeferred(QuotaExceededError):
+    """Every key's budget is spent for now. Retry after `retry_after` seconds."""
+
+    def __init__(self, service, retry_after):
+        super().__init__(f"{service} quota exhausted on every key; retry in {retry_after:.0f}s", 429)
+        self.service = service
+        self.retry_after = retry_after
+
+
+def split_keys(api_key):
+    """'k1, k2' -> ['k1', 'k2']; None -> []."""
+    return [k.strip() for k in (api_key or "").split(",") if k.strip()]
+
+
+def key_id(key):
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+
+
+def _today(now):
+    return time.strftime("%Y-%m-%d", time.gmtime(now))
+
+
+def _seconds_to_midnight(now):
+    return 86400 - now % 86400
+
+
+class QuotaLedger:
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS quotas (
+                service TEXT PRIMARY KEY, per_minute REAL NOT NULL, per_day INTEGER
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                service TEXT NOT NULL, key_id TEXT NOT NULL,
+                tokens REAL NOT NULL, updated REAL NOT NULL, cooldown_until REAL NOT NULL,
+                day TEXT NOT NULL, spent INTEGER NOT NULL,
+                PRIMARY KEY (service, key_id)
+            )
+        """)
+
+    def set_quota(self, service, per_minute, per_day=None):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO quotas VALUES (?, ?, ?)", (service, per_minute, per_day or None))
+
+    def _quota(self, service):
+        row = self.conn.execute("SELECT per_minute, per_day FROM quotas WHERE service = ?", (service,)).fetchone()
+        if row:
+            return row
+        default = DEFAULT_QUOTAS.get(service, {"per_minute": 60, "per_day": None})
+        self.conn.execute("INSERT OR IGNORE INTO quotas VALUES (?, ?, ?)", (service, default['per_minute'], default['per_day']))
+        return default['per_minute'], default['per_day']
+
+    def try_acquire(self, service, keys):
+        """
+        One atomic pass over the ledger. Returns (key, 0) with a token taken, or
+        (None, seconds) until one is due. Raises QuotaDeferred once every key has
+        spent its daily budget.
+        """
+        ids = {key_id(k): k for k in keys}
+        now = time.time()
+        today = _today(now)
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE") # Serializes every process on the host
+            try:
+                per_minute, per_day = self._quota(service)
+                rate = per_minute / 60.0
+                capacity = max(1.0, rate) # About one second's worth of burst
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO buckets VALUES (?, ?, ?, ?, 0, ?, 0)",
+                    [(service, kid, capacity, now, today) for kid in ids],
+                )
+                marks = ",".join("?" * len(ids))
+                rows = self.conn.execute(
+                    f"SELECT key_id, tokens, updated, cooldown_until, day, spent FROM buckets WHERE service = ? AND key_id IN ({marks})",
+                    (service, *ids),
+                ).fetchall()
+
+                best, wait, buckets = None, None, []
+                for kid, tokens, updated, cooldown_until, day, spent in rows:
+                    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+                    spent = spent if day == today else 0
+                    buckets.append([kid, tokens, cooldown_until, spent])
+                    if per_day and spent >= per_day:
+                        continue
+                    due = max(cooldown_until - now, 0.0 if tokens >= 1 else (1 - tokens) / rate)
+                    if due == 0 and (best is None or tokens > best[1]):
+                        best = buckets[-1]
+                    wait = due if wait is None else min(wait, due)
+
+                if best:
+                    best[1] -= 1
+                    best[3] += 1
+                for kid, tokens, cooldown_until, spent in buckets:
+                    self.conn.execute(
+                        "UPDATE buckets SET tokens = ?, updated = ?, cooldown_until = ?, day = ?, spent = ? WHERE service = ? AND key_id = ?",
+                        (tokens, now, cooldown_until, today, spent, service, kid),
+                    )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        if best:
+            return ids[best[0]], 0.0
+        if wait is None:
+            raise QuotaDeferred(service, _seconds_to_midnight(now))
+        return None, wait
+
+    def acquire(self, service, keys, max_wait=MAX_WAIT):
+        """The key to call with, once a token is taken. Raises QuotaDeferred rather than wait past `max_wait`."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            key, wait = self.try_acquire(service, keys)
+            if key:
+                return key
+            if time.monotonic() + wait > deadline:
+                raise QuotaDeferred(service, wait)
+            time.sleep(wait)
+
+    async def acquire_async(self, service, keys, max_wait=MAX_WAIT):
+        """acquire() for coroutines: the SQLite transaction runs in a thread and the wait is an asyncio.sleep, so the loop keeps running."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            key, wait = await asyncio.to_thread(self.try_acquire, service, keys)
+            if key:
+                return key
+            if time.monotonic() + wait > deadline:
+                raise QuotaDeferred(service, wait)
+            await asyncio.sleep(wait)
+
+    def cooldown(self, service, key, seconds=COOLDOWN):
+        """Benches `key` for `seconds` (the upstream rate limited it despite the ledger)."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE buckets SET cooldown_until = MAX(cooldown_until, ?) WHERE service = ? AND key_id = ?",
+                (time.time() + seconds, service, key_id(key)),
+            )
+
+    def status(self):
+        """[{service, key_id, per_minute, per_day, tokens, spent_today, cooling_for}]"""
+        now = time.time()
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT b.service, b.key_id, q.per_minute, q.per_day, b.tokens, b.day, b.spent, b.cooldown_until
+                FROM buckets b LEFT JOIN quotas q ON q.service = b.service ORDER BY b.service, b.key_id
+            """).fetchall()
+        return [{
+            "service": service, "key_id": kid, "per_minute": per_minute, "per_day": per_day, "tokens": round(tokens, 2),
+            "spent_today": spent if day == _today(now) else 0, "cooling_for": round(max(0.0, cooldown_until - now), 1),
+        } for service, kid, per_minute, per_day, tokens, day, spent, cooldown_until in rows]
+
+
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+
+def get_quota_ledger():
+    """The process-wide ledger at $SENTINEL_QUOTA_LEDGER, or None when quotas aren't managed."""
+    path = os.getenv("SENTINEL_QUOTA_LEDGER")
+    if not path:
+        return None
+    with _ledgers_lock:
+        if path not in _ledgers:
+            _ledgers[path] = QuotaLedger(path)
+        return _ledgers[path]
+
+
+class ApiKeys:
+    """
+    The key pool of one service. next() picks the key for the next call: through
+    the ledger when one is configured, otherwise round-robin.
+    """
+
+    def __init__(self, service, api_key, ledger=None):
+        self.service = service
+        self.keys = split_keys(api_key)
+        self.ledger = ledger if ledger is not None else get_quota_ledger()
+        self.cycle = itertools.cycle(self.keys)
+        self.lock = threading.Lock()
+
+    @property
+    def managed(self):
+        """Whether calls need next() at all (a single unmanaged key never changes)."""
+        return bool(self.ledger) or len(self.keys) > 1
+
+    def next(self):
+        if self.ledger:
+            return self.ledger.acquire(self.service, self.keys)
+        with self.lock:
+            return next(self.cycle)
+
+    async def anext(self):
+        if self.ledger:
+            return await self.ledger.acquire_async(self.service, self.keys)
+        with self.lock:
+            return next(self.cycle)
+
+    def throttled(self, key, seconds=COOLDOWN):
+        """The upstream rate limited `key`: bench it so the others take the load."""
+        if self.ledger:
+            self.ledger.cooldown(self.service, key, seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or configure the shared API quota ledger.")
+    parser.add_argument("--ledger", default=os.getenv("SENTINEL_QUOTA_LEDGER", ".cache/quota.sqlite"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="tokens, daily spend and cooldowns per key")
+    quota = commands.add_parser("set", help="per-key quota for a service")
+    quota.add_argument("service", choices=sorted(DEFAULT_QUOTAS))
+    quota.add_argument("--per-minute", type=float, required=True)
+    quota.add_argument("--per-day", type=int, default=0, help="0 = no daily cap")
+    args = parser.parse_args(argv)
+
+    ledger = QuotaLedger(args.ledger)
+    if args.command == "set":
+        ledger.set_quota(args.service, args.per_minute, args.per_day)
+        print(f"{args.service}: {args.per_minute:g}/min, {args.per_day or 'no'} daily cap per key")
+        return
+    rows = ledger.status()
+    if not rows:
+        print("No keys have drawn from this ledger yet.")
+    for row in rows:
+        cap = f"{row['spent_today']}/{row['per_day']}" if row['per_day'] else f"{row['spent_today']}"
+        cooling = f"  cooling {row['cooling_for']}s" if row['cooling_for'] else ""
+        print(f"  {row['service']:<7} key {row['key_id']}  {row['per_minute']:g}/min  tokens={row['tokens']:<6} today={cap}{cooling}")
+
+
+if __name__ == "__main__":
+    main()
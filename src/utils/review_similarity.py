@@ -0,0 +1,185 @@
+"""
+Near-duplicate review text detection ("Template Review" detector).
+
+Review farms reuse copy-paste or lightly edited templates, within one listing and
+across the listings they sell to. Each review is reduced to character shingles,
+then to a MinHash signature. Signatures go into an LSH index (banded buckets), so
+a new review is only compared against reviews that share a bucket with it. That
+keeps lookups sub-linear in the number of reviews ever ingested, with no LLM calls.
+
+    index = ReviewSimilarityIndex(".cache/reviews.sqlite")
+    index.add_listing(place_data)   # -> {"duplicate_reviews": 2, "cross_listing_reviews": 1, ...}
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import defaultdict
+import numpy as np
+from src.utils.entity_index import listing_id
+
+SHINGLE_SIZE = 5
+MIN_CHARS = 25          # Shorter reviews ("Great service!") repeat innocently
+NUM_PERM = 64
+BANDS = 16              # 16 bands x 4 rows: pairs above ~0.5 Jaccard usually collide
+ROWS = NUM_PERM // BANDS
+SIMILARITY = 0.7        # Estimated Jaccard needed to call two reviews near-duplicates
+MAX_EXAMPLES = 3
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(20240301)
+_A = _rng.randint(1, _PRIME, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, _PRIME, size=NUM_PERM).astype(np.uint64)
+
+
+def normalize_text(text):
+    return " ".join(re.sub(r"[^\w\s]", " ", str(text or "").lower()).split())
+
+
+def shingle_hashes(text):
+    """Hashed character shingles of the normalized text, or None if it's too short to judge."""
+    text = normalize_text(text)
+    if len(text) < MIN_CHARS:
+        return None
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(s.encode()) % _PRIME for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+def minhash(hashes):
+    """NUM_PERM-long uint32 signature: the min of each universal hash over the shingles."""
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def review_signature(review):
+    hashes = shingle_hashes(review.get('text'))
+    return None if hashes is None else minhash(hashes)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return float(np.mean(sig_a == sig_b))
+
+
+def band_keys(signature):
+    return [(band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+
+def review_key(review):
+    return f"{review.get('author_name')}|{review.get('time')}"
+
+
+def _duplicate_positions(signatures):
+    """Positions (into `signatures`) of reviews with a near-duplicate among the others."""
+    buckets = defaultdict(list)
+    for pos, sig in enumerate(signatures):
+        for key in band_keys(sig):
+            buckets[key].append(pos)
+    found = set()
+    for members in buckets.values():
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if (a not in found or b not in found) and similarity(signatures[a], signatures[b]) >= SIMILARITY:
+                    found.update((a, b))
+    return found
+
+
+def sign_reviews(reviews):
+    """[(review, signature)] for the reviews long enough to compare."""
+    return [(r, s) for r, s in ((r, review_signature(r)) for r in reviews) if s is not None]
+
+
+def analyze_review_similarity(reviews, signed=None):
+    """
+    Within-listing check only (no index needed). Returns:
+        checked: reviews long enough to compare
+        duplicate_reviews: reviews with a near-duplicate elsewhere in the same listing
+        cross_listing_reviews / linked_listings: always 0 here, see ReviewSimilarityIndex
+    """
+    signed = sign_reviews(reviews) if signed is None else signed
+    duplicates = _duplicate_positions([s for _, s in signed])
+    return {
+        "checked": len(signed),
+        "duplicate_reviews": len(duplicates),
+        "cross_listing_reviews": 0,
+        "linked_listings": 0,
+        "examples": [normalize_text(signed[pos][0].get('text'))[:80] for pos in sorted(duplicates)[:MAX_EXAMPLES]],
+    }
+
+
+class ReviewSimilarityIndex:
+    """
+    LSH index over every review ever ingested, mirrored in memory and persisted to
+    SQLite (when `path` is given) so cross-listing matches accumulate across runs.
+    """
+
+    def __init__(self, path=None):
+        self.lock = threading.Lock()
+        self.buckets = defaultdict(list)   # (band, bytes) -> [(listing_id, review_key)]
+        self.signatures = {}               # (listing_id, review_key) -> signature
+        self.conn = None
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS review_signatures (
+                    listing_id TEXT NOT NULL, review_key TEXT NOT NULL, signature BLOB NOT NULL, first_seen REAL NOT NULL,
+                    PRIMARY KEY (listing_id, review_key)
+                )
+            """)
+            for lid, rkey, blob in self.conn.execute("SELECT listing_id, review_key, signature FROM review_signatures"):
+                self._insert(lid, rkey, np.frombuffer(blob, dtype=np.uint32))
+
+    def _insert(self, lid, rkey, signature):
+        self.signatures[(lid, rkey)] = signature
+        for key in band_keys(signature):
+            self.buckets[key].append((lid, rkey))
+
+    def _matches(self, signature, exclude):
+        """Indexed reviews that are near-duplicates of `signature` (bucket candidates only)."""
+        candidates = set()
+        for key in band_keys(signature):
+            candidates.update(self.buckets.get(key, ()))
+        candidates.discard(exclude)
+        return [c for c in candidates if similarity(signature, self.signatures[c]) >= SIMILARITY]
+
+    def links(self, place_data, signed=None):
+        """analyze_review_similarity() plus matches against reviews of *other* indexed listings."""
+        lid = listing_id(place_data)
+        signed = sign_reviews(place_data.get('reviews') or []) if signed is None else signed
+        result = analyze_review_similarity(None, signed)
+        cross_reviews, other_listings, examples = 0, set(), []
+        with self.lock:
+            for review, signature in signed:
+                others = {match_lid for match_lid, _ in self._matches(signature, (lid, review_key(review))) if match_lid != lid}
+                if others:
+                    cross_reviews += 1
+                    other_listings |= others
+                    examples.append(normalize_text(review.get('text'))[:80])
+        result['cross_listing_reviews'] = cross_reviews
+        result['linked_listings'] = len(other_listings)
+        result['examples'] = list(dict.fromkeys(examples + result['examples']))[:MAX_EXAMPLES]
+        return result
+
+    def add_listing(self, place_data, signed=None):
+        """
+        Checks the listing's reviews against the index (see links()), then indexes them.
+        `signed` is sign_reviews() output computed elsewhere (e.g. in a worker process).
+        """
+        signed = sign_reviews(place_data.get('reviews') or []) if signed is None else signed
+        result = self.links(place_data, signed)
+        lid = listing_id(place_data)
+        rows = []
+        with self.lock:
+            for review, signature in signed:
+                rkey = review_key(review)
+                if (lid, rkey) in self.signatures:
+                    continue
+                self._insert(lid, rkey, signature)
+                rows.append((lid, rkey, signature.tobytes(), time.time()))
+            if self.conn and rows:
+                self.conn.executemany("INSERT OR IGNORE INTO review_signatures VALUES (?, ?, ?, ?)", rows)
+        return result
@@ -0,0 +1,95 @@
+"""
+Review velocity analysis ("Bot Farm" detector).
+
+Everything is computed in one vectorized pass over the sorted timestamp/rating
+arrays, so a listing with thousands of reviews is scored in well under a millisecond.
+A burst anywhere in the history counts, not just among the latest reviews.
+"""
+import numpy as np
+
+HOUR = 3600
+DAY = 86400
+
+WINDOWS = {"1h": HOUR, "24h": DAY, "7d": 7 * DAY}
+
+# Reviews inside one window that count as a burst
+BURST_MIN_REVIEWS = 3
+BURST_WINDOW = "24h"
+
+
+def review_arrays(reviews):
+    """Sorted (times, ratings) float arrays. Missing timestamps count as 0, like the legacy check."""
+    times = np.fromiter((r.get('time') or 0 for r in reviews), dtype=np.float64, count=len(reviews))
+    ratings = np.fromiter((r.get('rating') or 0 for r in reviews), dtype=np.float64, count=len(reviews))
+    order = np.argsort(times, kind='stable')
+    return times[order], ratings[order]
+
+
+def window_counts(times, window):
+    """counts[i] = number of reviews in [times[i], times[i] + window). `times` must be sorted."""
+    ends = np.searchsorted(times, times + window, side='left')
+    return ends - np.arange(len(times))
+
+
+def analyze_review_velocity(reviews, windows=WINDOWS):
+    """
+    Returns a dict with:
+        count, burst (bool), burst_start (unix time of densest burst window or None)
+        max_in_window: {label: max reviews in any window of that size}
+        inter_arrival: {min, median, p10, mean} seconds between consecutive reviews
+        burst_mean_rating / overall_mean_rating: rating inside the densest burst window vs all
+        same_rating_run_share: share of <24h consecutive gaps that repeat the same star rating
+    """
+    if not reviews:
+        return analyze_velocity_arrays(np.empty(0), np.empty(0), windows)
+    times, ratings = review_arrays(reviews)
+    return analyze_velocity_arrays(times, ratings, windows)
+
+
+def analyze_velocity_arrays(times, ratings, windows=WINDOWS):
+    """Same as analyze_review_velocity, for pre-extracted arrays already sorted by time."""
+    count = len(times)
+    result = {
+        "count": count,
+        "burst": False,
+        "burst_start": None,
+        "max_in_window": {label: min(count, 1) for label in windows},
+        "inter_arrival": None,
+        "burst_mean_rating": None,
+        "overall_mean_rating": None,
+        "same_rating_run_share": 0.0,
+    }
+    if not count:
+        return result
+
+    result["overall_mean_rating"] = float(ratings.mean())
+
+    densest = None
+    for label, window in windows.items():
+        counts = window_counts(times, window)
+        result["max_in_window"][label] = int(counts.max())
+        if label == BURST_WINDOW:
+            densest = counts
+
+    if densest is not None and densest.max() >= BURST_MIN_REVIEWS:
+        start = int(densest.argmax())
+        end = start + int(densest[start])
+        result["burst"] = True
+        result["burst_start"] = float(times[start])
+        result["burst_mean_rating"] = float(ratings[start:end].mean())
+
+    if count >= 2:
+        gaps = np.diff(times)
+        p10, median = np.quantile(gaps, [0.1, 0.5])
+        result["inter_arrival"] = {
+            "min": float(gaps.min()),
+            "median": float(median),
+            "p10": float(p10),
+            "mean": float(gaps.mean()),
+        }
+        close = gaps < DAY
+        if close.any():
+            same = ratings[1:] == ratings[:-1]
+            result["same_rating_run_share"] = float((same & close).sum() / close.sum())
+
+    return result
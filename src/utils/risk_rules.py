@@ -0,0 +1,156 @@
+"""
+Declarative, versioned Risk Engine rules.
+
+Each heuristic is a Rule: a penalty, a predicate over named features and a label
+template. The same predicates run on one case's scalar features and on whole
+NumPy/pandas columns. A weight change can therefore re-score millions of stored
+cases in one vectorized pass, while calculate_trust_score() keeps producing
+exactly the breakdown strings it always did.
+
+    features = case_features(place_data, osint_data, audit, entity_links=...)
+    RULESET.score_case(features)                 # -> (score, ["-10: No Website listed", ...])
+    scores, masks = RULESET.score_frame(frame)   # frame: {feature: array} or a DataFrame
+    RULESET.breakdown(masks[i], row)             # labels for one row, on demand
+
+Bit i of a mask is rule i of the ruleset that produced it, so masks are only
+comparable within one RULESET.version.
+"""
+import numpy as np
+from src.utils.audit_schema import verdict_from_legacy_report
+from src.utils.review_similarity import analyze_review_similarity
+from src.utils.review_velocity import analyze_review_velocity
+
+# Feature name -> value when absent (also the dtype of the column)
+FEATURES = {
+    "has_website": False,
+    "has_phone": False,
+    "osint_count": 0,
+    "velocity_burst": False,
+    "duplicate_reviews": 0,
+    "checked_reviews": 0,
+    "cross_listing_reviews": 0,
+    "linked_listings": 0,
+    "audit_verdict": "",        # "" when there is no (non-heuristic) audit
+    "known_bad_kinds": "",      # comma-joined, sorted
+    "shared_phone": 0,
+    "shared_address": 0,
+    "stacked": 0,
+    "same_type_nearby": 0,
+}
+
+
+class Rule:
+    def __init__(self, rule_id, penalty, predicate, label):
+        self.rule_id = rule_id
+        self.penalty = penalty
+        self.predicate = predicate   # features (scalars or columns) -> bool (or bool array)
+        self.label = label           # str.format template over the features
+
+    def describe(self, features):
+        return f"-{self.penalty}: {self.label.format(**features)}"
+
+
+class RuleSet:
+    def __init__(self, version, rules, base=100):
+        if len(rules) > 32:
+            raise ValueError("Breakdown masks are uint32: at most 32 rules per ruleset")
+        self.version = version
+        self.rules = tuple(rules)
+        self.base = base
+
+    def score_case(self, features):
+        """(score, breakdown) for one case's scalar features."""
+        score, breakdown = self.base, []
+        for rule in self.rules:
+            if rule.predicate(features):
+                score -= rule.penalty
+                breakdown.append(rule.describe(features))
+        return max(0, min(self.base, score)), breakdown
+
+    def score_frame(self, frame):
+        """
+        Vectorized scoring over feature columns. Returns (scores int16[n], masks uint32[n]).
+        Missing columns take their FEATURES default.
+        """
+        n = len(next(iter(frame.values())) if isinstance(frame, dict) else frame)
+        columns = {}
+        for name, default in FEATURES.items():
+            columns[name] = np.asarray(frame[name]) if name in frame else np.full(n, default, dtype=object if isinstance(default, str) else type(default))
+        scores = np.full(n, self.base, dtype=np.int32)
+        masks = np.zeros(n, dtype=np.uint32)
+        for bit, rule in enumerate(self.rules):
+            fired = np.broadcast_to(np.asarray(rule.predicate(columns), dtype=bool), (n,))
+            scores -= np.where(fired, rule.penalty, 0).astype(np.int32)
+            masks |= fired.astype(np.uint32) << np.uint32(bit)
+        return np.clip(scores, 0, self.base).astype(np.int16), masks
+
+    def breakdown(self, mask, features):
+        """Breakdown strings for one row's mask (features: that row's values)."""
+        return [rule.describe(features) for bit, rule in enumerate(self.rules) if int(mask) >> bit & 1]
+
+    def rule_ids(self, mask):
+        return [rule.rule_id for bit, rule in enumerate(self.rules) if int(mask) >> bit & 1]
+
+
+# Predicates only use operators that work on scalars and NumPy arrays alike
+RULESET = RuleSet("2024.1", [
+    # Heuristic 1: Missing Data Penalties
+    Rule("no_website", 10, lambda f: np.logical_not(f['has_website']), "No Website listed"),
+    Rule("no_phone", 20, lambda f: np.logical_not(f['has_phone']), "No Phone Number"),
+    # Heuristic 2: OSINT Signals
+    Rule("weak_footprint", 15, lambda f: f['osint_count'] < 2, "Weak Digital Footprint (< 2 external sources)"),
+    # Heuristic 3: Review Velocity (The "Bot Farm" Detector)
+    Rule("velocity_spike", 30, lambda f: f['velocity_burst'], "Review Velocity Spike (Potential Bot Farm)"),
+    # Heuristic 3b: Template Reviews
+    Rule("duplicate_reviews", 20, lambda f: f['duplicate_reviews'] >= 2,
+         "Near-Duplicate Review Text ({duplicate_reviews} of {checked_reviews} reviews)"),
+    Rule("reused_reviews", 20, lambda f: f['cross_listing_reviews'] >= 1,
+         "Review Text Reused on {linked_listings} Other Listing(s)"),
+    # Heuristic 4: Auditor Verdict
+    Rule("audit_high", 50, lambda f: f['audit_verdict'] == "High", "Policy Auditor detected High Risk/Violation"),
+    Rule("audit_medium", 25, lambda f: f['audit_verdict'] == "Medium", "Policy Auditor detected Medium Risk"),
+    # Heuristic 5: Shared Entities (The "Lead-Gen Ring" Detector)
+    Rule("known_bad", 40, lambda f: f['known_bad_kinds'] != "", "Linked to Known-Bad Entity ({known_bad_kinds})"),
+    Rule("shared_phone", 15, lambda f: f['shared_phone'] >= 1, "Phone shared with {shared_phone} other listing(s)"),
+    Rule("shared_address", 10, lambda f: f['shared_address'] >= 3, "Address shared with {shared_address} other listings"),
+    # Heuristic 6: Pin Density (The "Ghost Cluster" Detector)
+    Rule("stacked_pin", 10, lambda f: f['stacked'] >= 2, "Pin Stacked on Identical Coordinates with {stacked} other listings"),
+    Rule("same_type_cluster", 15, lambda f: f['same_type_nearby'] >= 2, "{same_type_nearby} Same-Category Listings within 50 m"),
+])
+
+
+def case_features(place_data, osint_data, audit, entity_links=None, review_links=None, spatial_links=None):
+    """Flat scalar features of one case (see calculate_trust_score for the arguments)."""
+    reviews = place_data.get('reviews', [])
+    similar = review_links if review_links is not None else analyze_review_similarity(reviews)
+    if isinstance(audit, str):
+        audit = verdict_from_legacy_report(audit)
+    # No audit yet on a triage pass; a heuristic verdict only restates the other rules
+    verdict = audit['verdict'] if audit and audit.get('source') != "heuristic" else None
+    entity_links = entity_links or {}
+    spatial_links = spatial_links or {}
+    return {
+        "has_website": bool(place_data.get('website')),
+        "has_phone": bool(place_data.get('phone')),
+        "osint_count": len(osint_data),
+        "velocity_burst": bool(reviews) and analyze_review_velocity(reviews)['burst'],
+        "duplicate_reviews": similar['duplicate_reviews'],
+        "checked_reviews": similar['checked'],
+        "cross_listing_reviews": similar['cross_listing_reviews'],
+        "linked_listings": similar['linked_listings'],
+        "audit_verdict": verdict or "",
+        "known_bad_kinds": ", ".join(sorted({hit['kind'] for hit in entity_links.get('known_bad') or []})),
+        "shared_phone": entity_links.get('phone', 0),
+        "shared_address": entity_links.get('address', 0),
+        "stacked": spatial_links.get('stacked', 0),
+        "same_type_nearby": spatial_links.get('same_type_nearby', 0),
+    }
+
+
+def features_frame(rows):
+    """{feature: array} from an iterable of case_features() dicts."""
+    rows = list(rows)
+    return {
+        name: np.array([row.get(name, default) for row in rows], dtype=object if isinstance(default, str) else type(default))
+        for name, default in FEATURES.items()
+    }
@@ -0,0 +1,159 @@
+"""
+Spatial index over listing pins (Place Details `geometry.location`).
+
+Ghost-business rings drop many same-category pins on one spot: a dozen "locksmiths"
+on one residential block, or several listings stacked on the exact same coordinates.
+Every investigated listing is bucketed into a ~50 m grid. Columns widen in degrees
+toward the poles, so a cell is about 50 m across at any latitude. A radius query
+reads only the few cells around the pin, and exact-coordinate stacks are a dict
+lookup. Both stay sub-millisecond with millions of points and need no API calls.
+
+    index = SpatialIndex(".cache/places.sqlite")
+    index.add_listing(place_data)   # -> {"stacked": 2, "nearby": 5, "same_type_nearby": 3}
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from src.utils.entity_index import listing_id
+
+CELL_M = 50.0               # Grid cell edge; also the default co-location radius
+STACK_DECIMALS = 6          # ~0.1 m: pins this close are "the same coordinates"
+EARTH_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_M / 180
+
+# Types every listing carries; sharing them says nothing about the business
+GENERIC_TYPES = {"point_of_interest", "establishment", "store", "premise", "food", "health"}
+
+
+def listing_location(place_data):
+    """(lat, lng) from Place Details geometry, or None."""
+    location = (place_data.get('geometry') or {}).get('location') or {}
+    lat, lng = location.get('lat'), location.get('lng')
+    if lat is None or lng is None:
+        return None
+    return float(lat), float(lng)
+
+
+def listing_types(place_data):
+    return frozenset(t for t in place_data.get('types') or [] if t not in GENERIC_TYPES)
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    """Equirectangular distance in meters (accurate to well under 1% at these ranges)."""
+    x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return EARTH_M * math.hypot(x, y)
+
+
+def _row(lat):
+    return math.floor(lat * METERS_PER_DEGREE / CELL_M)
+
+
+def _col(row, lng):
+    # Column width in degrees grows toward the poles so every cell is ~CELL_M wide
+    lat = (row + 0.5) * CELL_M / METERS_PER_DEGREE
+    scale = max(0.01, math.cos(math.radians(lat)))
+    return math.floor(lng * METERS_PER_DEGREE * scale / CELL_M)
+
+
+def grid_cell(lat, lng):
+    row = _row(lat)
+    return row, _col(row, lng)
+
+
+def stack_key(lat, lng):
+    return round(lat, STACK_DECIMALS), round(lng, STACK_DECIMALS)
+
+
+class SpatialIndex:
+    """
+    Grid of listing pins, mirrored in memory and persisted to SQLite (when `path`
+    is given) so density signals accumulate across runs.
+    """
+
+    def __init__(self, path=None):
+        self.lock = threading.Lock()
+        self.cells = defaultdict(list)     # (row, col) -> [(listing_id, lat, lng, types)]
+        self.stacks = defaultdict(set)     # rounded (lat, lng) -> {listing_id}
+        self.locations = {}                # listing_id -> (lat, lng)
+        self.conn = None
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS listing_locations (
+                    listing_id TEXT PRIMARY KEY, lat REAL NOT NULL, lng REAL NOT NULL, types TEXT NOT NULL, first_seen REAL NOT NULL
+                )
+            """)
+            for lid, lat, lng, types in self.conn.execute("SELECT listing_id, lat, lng, types FROM listing_locations"):
+                self._insert(lid, lat, lng, frozenset(t for t in types.split(",") if t))
+
+    def _insert(self, lid, lat, lng, types):
+        self.locations[lid] = (lat, lng)
+        self.cells[grid_cell(lat, lng)].append((lid, lat, lng, types))
+        self.stacks[stack_key(lat, lng)].add(lid)
+
+    def add_listing(self, place_data):
+        """Checks the listing's pin against the index (see links()), then indexes it."""
+        result = self.links(place_data)
+        location = listing_location(place_data)
+        if location is None:
+            return result
+        lid = listing_id(place_data)
+        types = listing_types(place_data)
+        with self.lock:
+            if lid not in self.locations:
+                self._insert(lid, *location, types)
+                if self.conn:
+                    self.conn.execute(
+                        "INSERT OR IGNORE INTO listing_locations VALUES (?, ?, ?, ?, ?)",
+                        (lid, *location, ",".join(sorted(types)), time.time()),
+                    )
+        return result
+
+    def _within(self, lat, lng, radius_m):
+        """(listing_id, distance_m, types) for every pin within `radius_m`."""
+        span = math.ceil(radius_m / CELL_M)
+        row = _row(lat)
+        for r in range(row - span, row + span + 1):
+            col = _col(r, lng)
+            for c in range(col - span, col + span + 1):
+                for lid, plat, plng, ptypes in self.cells.get((r, c), ()):
+                    d = distance_m(lat, lng, plat, plng)
+                    if d <= radius_m:
+                        yield lid, d, ptypes
+
+    def nearby(self, lat, lng, radius_m=CELL_M, types=None):
+        """[(listing_id, distance_m)] within `radius_m`; with `types`, only listings sharing one of them."""
+        return [(lid, d) for lid, d, ptypes in self._within(lat, lng, radius_m) if types is None or types & ptypes]
+
+    def stacked(self, lat, lng):
+        """Listing ids pinned on these exact coordinates."""
+        return set(self.stacks.get(stack_key(lat, lng), ()))
+
+    def links(self, place_data, radius_m=CELL_M):
+        """
+        Signals for the risk engine, counting *other* listings only:
+            stacked            pins on identical coordinates
+            nearby             any listing within radius_m
+            same_type_nearby   listings sharing a (non-generic) type within radius_m
+        All zero when the listing has no geometry.
+        """
+        location = listing_location(place_data)
+        if location is None:
+            return {"stacked": 0, "nearby": 0, "same_type_nearby": 0}
+        lid = listing_id(place_data)
+        types = listing_types(place_data)
+        nearby, same_type = 0, 0
+        for other, _, other_types in self._within(*location, radius_m):
+            if other != lid:
+                nearby += 1
+                same_type += bool(types & other_types)
+        stacked = self.stacked(*location)
+        stacked.discard(lid)
+        return {"stacked": len(stacked), "nearby": nearby, "same_type_nearby": same_type}